@@ -0,0 +1,171 @@
+"""
+Performance Analytics
+Equity, drawdown, risk-adjusted return and trade statistics computed with array operations
+"""
+import math
+
+import numpy as np
+
+TRADING_DAYS_PER_YEAR = 252
+SESSION_MINUTES = 375  # NSE cash session 09:15-15:30
+
+
+def _trade_arrays(trades, timestamp_dtype):
+    """Columns of a trades list as arrays: (is_buy, timestamps, prices, qtys, costs)."""
+    actions, times, prices, qtys = (np.asarray(col) for col in zip(*(t[:4] for t in trades)))
+    costs = np.array([t[4] if len(t) > 4 else 0.0 for t in trades], dtype=np.float64)
+    return (actions == "BUY", times.astype(timestamp_dtype), prices.astype(np.float64),
+            qtys.astype(np.int64), costs)
+
+
+def equity_curve(df, trades, capital):
+    """
+    Per-bar account value and exposure for a single-symbol backtest.
+
+    Args:
+        df: Candle DataFrame the backtest ran on
+        trades: backtest_strategy trades [(action, timestamp, price, qty[, cost])]
+        capital: Starting capital
+
+    Returns:
+        tuple: (equity, exposure, position) float64/float64/int64 arrays, where
+        exposure is the position's market value as a fraction of equity
+        (negative while short) and position is signed
+    """
+    close = df["close"].to_numpy(dtype=np.float64)
+    shares = np.zeros(len(close), dtype=np.int64)
+    cash_flow = np.zeros(len(close), dtype=np.float64)
+    if trades:
+        ts = df["timestamp"].to_numpy()
+        is_buy, times, prices, qtys, costs = _trade_arrays(trades, ts.dtype)
+        rows = np.searchsorted(ts, times)
+        signed = np.where(is_buy, qtys, -qtys)
+        np.add.at(shares, rows, signed)
+        np.add.at(cash_flow, rows, -signed * prices - costs)
+    position = np.cumsum(shares)
+    holdings = position * close
+    equity = capital + np.cumsum(cash_flow) + holdings
+    exposure = np.divide(holdings, equity, out=np.zeros_like(equity), where=equity != 0)
+    return equity, exposure, position
+
+
+def periods_per_year(timestamps):
+    """Bars per year implied by the median bar spacing (daily bars -> 252)."""
+    if len(timestamps) < 2:
+        return TRADING_DAYS_PER_YEAR
+    spacing = np.median(np.diff(timestamps.to_numpy()).astype("timedelta64[s]").astype(np.float64))
+    minutes = spacing / 60
+    if minutes >= 24 * 60:
+        return TRADING_DAYS_PER_YEAR * (24 * 60) / minutes
+    return TRADING_DAYS_PER_YEAR * SESSION_MINUTES / minutes
+
+
+def drawdown(equity):
+    """
+    Drawdown series and its worst point.
+
+    Returns:
+        tuple: (drawdown array (<= 0), max drawdown, longest underwater stretch in bars)
+    """
+    peaks = np.maximum.accumulate(equity)
+    dd = equity / peaks - 1
+    bars = np.arange(len(equity))
+    last_peak = np.maximum.accumulate(np.where(equity >= peaks, bars, 0))
+    duration = bars - last_peak
+    return dd, float(dd.min()) if len(dd) else 0.0, int(duration.max()) if len(duration) else 0
+
+
+def round_trips(trades, timestamps):
+    """
+    Pair each order that opens a position with the one that closes it.
+
+    Works for longs and shorts: a trade opens when the position before it
+    is flat and closes when the position after it is flat.
+
+    Returns:
+        dict of arrays: pnl (net of charges), holding_bars, holding_days (closed trades only)
+    """
+    empty = np.empty(0)
+    if not trades:
+        return {"pnl": empty, "holding_bars": empty, "holding_days": empty}
+    ts = timestamps.to_numpy()
+    is_buy, times, prices, qtys, costs = _trade_arrays(trades, ts.dtype)
+    signed = np.where(is_buy, qtys, -qtys)
+    after = np.cumsum(signed)
+    exit_ = np.flatnonzero(after == 0)
+    # A trailing entry is still open
+    entry = np.flatnonzero(after - signed == 0)[:len(exit_)]
+    pnl = (prices[exit_] - prices[entry]) * signed[entry] - costs[entry] - costs[exit_]
+    entry_rows = np.searchsorted(ts, times[entry])
+    exit_rows = np.searchsorted(ts, times[exit_])
+    holding_days = (times[exit_] - times[entry]).astype("timedelta64[s]").astype(np.float64) / 86400
+    return {"pnl": pnl, "holding_bars": (exit_rows - entry_rows).astype(np.float64), "holding_days": holding_days}
+
+
+def _finite(value, digits=4):
+    """Round, mapping NaN/inf to None so the result is valid JSON."""
+    if value is None or not math.isfinite(value):
+        return None
+    return round(float(value), digits)
+
+
+def compute_analytics(df, trades, capital, equity=None, exposure=None):
+    """
+    Performance statistics for one backtest.
+
+    Args:
+        df: Candle DataFrame the backtest ran on (needs timestamp and close)
+        trades: backtest_strategy trades
+        capital: Starting capital
+        equity, exposure: Per-bar arrays from equity_curve (computed if omitted)
+
+    Returns:
+        dict with total_return_pct, cagr_pct, sharpe, sortino, volatility_pct,
+        max_drawdown_pct, max_drawdown_bars, win_rate_pct, profit_factor,
+        avg_trade_pnl, avg_holding_bars, avg_holding_days, closed_trades,
+        exposure_pct, turnover (None where undefined)
+    """
+    if equity is None or exposure is None:
+        equity, exposure, _ = equity_curve(df, trades, capital)
+    timestamps = df["timestamp"]
+    ppy = periods_per_year(timestamps)
+
+    returns = np.diff(equity) / equity[:-1] if len(equity) > 1 else np.empty(0)
+    mean = returns.mean() if len(returns) else math.nan
+    std = returns.std(ddof=1) if len(returns) > 1 else math.nan
+    downside = math.sqrt(np.mean(np.minimum(returns, 0) ** 2)) if len(returns) else math.nan
+    sharpe = mean / std * math.sqrt(ppy) if std else math.nan
+    sortino = mean / downside * math.sqrt(ppy) if downside else math.nan
+
+    _, max_dd, max_dd_bars = drawdown(equity)
+    final = equity[-1] if len(equity) else capital
+    years = (timestamps.iloc[-1] - timestamps.iloc[0]).total_seconds() / (365.25 * 86400) if len(df) > 1 else 0
+    cagr = (final / capital) ** (1 / years) - 1 if years > 0 and final > 0 else math.nan
+
+    trips = round_trips(trades, timestamps)
+    pnl = trips["pnl"]
+    gross_profit = pnl[pnl > 0].sum()
+    gross_loss = -pnl[pnl < 0].sum()
+    notional = 0.0
+    if trades:
+        _, _, prices, qtys, _ = _trade_arrays(trades, timestamps.dtype)
+        notional = float(np.abs(prices * qtys).sum())
+
+    return {
+        "total_return_pct": _finite((final / capital - 1) * 100, 2),
+        "cagr_pct": _finite(cagr * 100, 2),
+        "sharpe": _finite(sharpe, 2),
+        "sortino": _finite(sortino, 2),
+        "volatility_pct": _finite(std * math.sqrt(ppy) * 100, 2),
+        "max_drawdown_pct": _finite(max_dd * 100, 2),
+        "max_drawdown_bars": max_dd_bars,
+        "win_rate_pct": _finite((pnl > 0).mean() * 100, 2) if len(pnl) else None,
+        "profit_factor": _finite(gross_profit / gross_loss, 2) if gross_loss else None,
+        "avg_trade_pnl": _finite(pnl.mean(), 2) if len(pnl) else None,
+        "avg_holding_bars": _finite(trips["holding_bars"].mean(), 1) if len(pnl) else None,
+        "avg_holding_days": _finite(trips["holding_days"].mean(), 2) if len(pnl) else None,
+        "closed_trades": int(len(pnl)),
+        "exposure_pct": _finite((exposure != 0).mean() * 100, 2) if len(exposure) else None,
+        "turnover": _finite(notional / equity.mean(), 2) if len(equity) else None,
+    }
+
@@ -1,4 +1,4 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, Response, stream_with_context, g
 from config import (
     INITIAL_CAPITAL,
     DEFAULT_SYMBOL,
@@ -6,18 +6,118 @@ from config import (
     STRATEGIES,
     DEFAULT_STRATEGY,
     AVAILABLE_STOCKS,
+    STOP_LOSS_PCT,
+    ALLOW_REQUEST_PROFILING,
+    PROFILE_DIR,
+    PROFILE_MAX_FILES,
+    PROFILE_TOP_N,
+    DEFAULT_INTERVAL,
+    RESAMPLE_BASE_INTERVAL,
+    RESAMPLE_DERIVED_INTERVALS,
+    SCREENER_LIMIT,
 )
-from data_fetcher import fetch_historical_data
-import strategy as strategy_module
+from data_fetcher import fetch_interval_data
+from pipeline import resolve_leverage, compute_strategy_indicators, generate_strategy_signals
 from backtest import backtest_strategy
-from custom_strategy import compute_all_indicators, execute_custom_strategy
-from utils import prepare_trade_markers, prepare_chart_data, format_trades_for_display
+from universe import iter_universe_backtest, summarize_results
+from screener import screen
+from utils import prepare_trade_markers, prepare_chart_data, format_trades_for_display, timestamp_format
+from groww_client import get_provider
+from analytics import compute_analytics, equity_curve
+from jobs import JobManager, QueueFull
+from execution import ExecutionModel
+from backtest_stream import iter_backtest_events, format_sse, STAGE_HISTOGRAM, STAGE_HISTOGRAM_HELP
+from chart_payload import (
+    BINARY_MIMETYPE,
+    COMPRESS_MIN_BYTES,
+    DOWNSAMPLE_METHODS,
+    compress,
+    downsample_indices,
+    encode_chart_binary,
+    negotiate_encoding,
+    parse_width,
+    trade_indices,
+)
+import cProfile
+import io
+import os
+import pstats
 import socket
+import threading
+import time
 import traceback
 import json
 
+import metrics
+
 app = Flask(__name__)
 
+# Request metrics are keyed by route pattern, not raw path, to keep label sets small
+REQUEST_LATENCY = "http_request_seconds"
+REQUEST_COUNT = "http_requests_total"
+
+# cProfile allows one active profiler per process
+_profile_lock = threading.Lock()
+
+
+@app.before_request
+def _start_request():
+    g.request_started = time.perf_counter()
+    if ALLOW_REQUEST_PROFILING and request.args.get("profile") and _profile_lock.acquire(blocking=False):
+        profiler = cProfile.Profile()
+        profiler.enable()
+        g.profiler = profiler
+
+
+@app.after_request
+def _finish_request(response):
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    elapsed = time.perf_counter() - g.get("request_started", time.perf_counter())
+    metrics.histogram(REQUEST_LATENCY, "Time to build each HTTP response (streams: until headers)",
+                      labels={"route": route}).observe(elapsed)
+    metrics.counter(REQUEST_COUNT, "HTTP requests by route, method and status",
+                    labels={"route": route, "method": request.method, "status": str(response.status_code)}).inc()
+
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        try:
+            profiler.disable()
+            response = _profile_response(profiler, response, route)
+        finally:
+            _profile_lock.release()
+    return response
+
+
+def _prune_profiles(max_files=PROFILE_MAX_FILES):
+    """Delete the oldest .prof files so PROFILE_DIR keeps at most max_files."""
+    paths = [os.path.join(PROFILE_DIR, name) for name in os.listdir(PROFILE_DIR) if name.endswith(".prof")]
+    paths.sort(key=os.path.getmtime)
+    for path in paths[:max(0, len(paths) - max_files)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _profile_response(profiler, response, route):
+    """
+    Save a request's profile under PROFILE_DIR; profile=text returns the report instead of the response.
+
+    Streaming responses are profiled only up to their headers.
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{route.strip('/').replace('/', '_') or 'index'}.prof"
+    path = os.path.join(PROFILE_DIR, name)
+    profiler.dump_stats(path)
+    _prune_profiles()
+    response.headers['X-Profile-File'] = path
+    if request.args.get("profile") != "text":
+        return response
+    report = io.StringIO()
+    pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+    return Response(report.getvalue(), mimetype='text/plain', headers={'X-Profile-File': path})
+
+
 def find_free_port(start_port=5000, max_attempts=10):
     """Find a free port starting from start_port"""
     for port in range(start_port, start_port + max_attempts):
@@ -29,60 +129,120 @@ def find_free_port(start_port=5000, max_attempts=10):
             continue
     raise RuntimeError(f"Could not find a free port in range {start_port}-{start_port + max_attempts}")
 
-LEVERAGE_MAP = {"1x": 1, "2x": 2, "5x": 5, "10x": 10}
-STOP_LOSS_PCT = 0.10
+def run_backtest(symbol=None, strategy_id=None, margin=None, custom_strategy=None, progress=None,
+                 width=None, downsample="lttb", chart_format="json", execution=None, interval=None):
+    """
+    Run the backtest and return results. margin: '1x'|'2x'|'5x'|'10x' -> leverage 1|2|5|10.
 
+    progress, when given, is called with the name of each stage as it starts
+    (background jobs use it to report progress and to abort on cancellation).
+    width (viewport pixels) downsamples the chart with the given method,
+    always keeping bars that have trades. chart_format='binary' returns the
+    encode_chart_binary bytes instead of the JSON-ready dict. execution is
+    a dict of ExecutionModel.from_options options (None: close fills, no costs).
+    interval picks the candle timeframe (default config.DEFAULT_INTERVAL);
+    derived timeframes come from the stored base candles without an API call.
 
-def run_backtest(symbol=None, strategy_id=None, margin=None, custom_strategy=None):
-    """Run the backtest and return results. margin: '1x'|'2x'|'5x'|'10x' -> leverage 1|2|5|10."""
+    Each stage is timed into the backtest_stage_seconds histogram and the
+    timings are returned as stage_seconds.
+    """
+    progress = progress or (lambda stage: None)
     symbol = symbol or DEFAULT_SYMBOL
-    leverage = LEVERAGE_MAP.get((margin or "").strip(), 1)
-
-    df = fetch_historical_data(symbol, use_mock=USE_MOCK_DATA)
-    
-    if custom_strategy:
-        # Custom strategy: compute all indicators and execute user conditions
-        df = compute_all_indicators(df)
-        df = execute_custom_strategy(
-            df,
-            buy_conditions=custom_strategy.get("buy_conditions", []),
-            sell_conditions=custom_strategy.get("sell_conditions", []),
-            buy_logic=custom_strategy.get("buy_logic", "AND"),
-            sell_logic=custom_strategy.get("sell_logic", "AND")
+    interval = interval or DEFAULT_INTERVAL
+    leverage = resolve_leverage(margin)
+    spans = metrics.SpanRecorder(STAGE_HISTOGRAM, STAGE_HISTOGRAM_HELP)
+
+    progress("fetching")
+    with spans.span("fetch"):
+        df = fetch_interval_data(symbol, interval, use_mock=USE_MOCK_DATA)
+    progress("backtesting")
+    with spans.span("indicators"):
+        df = compute_strategy_indicators(df, strategy_id, custom_strategy)
+    with spans.span("signals"):
+        df, exit_rules, strategy_name = generate_strategy_signals(df, strategy_id, custom_strategy)
+    with spans.span("simulation"):
+        final_value, pnl, trades = backtest_strategy(
+            df, INITIAL_CAPITAL, exit_rules=exit_rules, leverage=leverage, stop_loss_pct=STOP_LOSS_PCT,
+            execution=ExecutionModel.from_options(execution),
         )
-        exit_rules = None
-    else:
-        # Predefined strategy
-        if strategy_id is None or strategy_id not in STRATEGIES:
-            strategy_id = DEFAULT_STRATEGY
-        cfg = STRATEGIES[strategy_id]
-        calc_fn = getattr(strategy_module, cfg["indicators"])
-        signal_fn = getattr(strategy_module, cfg["signals"])
-        df = calc_fn(df)
-        df = signal_fn(df)
-        exit_rules = cfg.get("exit_rules")
-
-    final_value, pnl, trades = backtest_strategy(
-        df, INITIAL_CAPITAL, exit_rules=exit_rules, leverage=leverage, stop_loss_pct=STOP_LOSS_PCT
-    )
-    
+    with spans.span("analytics"):
+        equity, exposure, _ = equity_curve(df, trades, INITIAL_CAPITAL)
+        analytics = compute_analytics(df, trades, INITIAL_CAPITAL, equity, exposure)
+
     # Prepare data for visualization
-    buy_markers, sell_markers = prepare_trade_markers(trades)
-    chart_data = prepare_chart_data(df, buy_markers, sell_markers)
-    formatted_trades = format_trades_for_display(trades)
-    
-    return {
-        'final_value': round(final_value, 2),
-        'pnl': round(pnl, 2),
-        'pnl_percent': round((pnl / INITIAL_CAPITAL) * 100, 2),
-        'initial_capital': INITIAL_CAPITAL,
-        'total_trades': len(trades),
-        'trades': formatted_trades,
-        'chart_data': chart_data,
-        'symbol': symbol,
-        'strategy': 'Custom Strategy' if custom_strategy else strategy_id,
-        'margin': f"{leverage}x",
-    }
+    progress("preparing_chart")
+    with spans.span("serialization"):
+        chart_df = df
+        if width:
+            rows = downsample_indices(df["close"].to_numpy(), width, downsample, keep=trade_indices(df, trades))
+            chart_df = df.iloc[rows]
+        fmt = timestamp_format(df)
+        buy_markers, sell_markers = prepare_trade_markers(trades, fmt)
+        formatted_trades = format_trades_for_display(trades, fmt)
+
+        results = {
+            'final_value': round(final_value, 2),
+            'pnl': round(pnl, 2),
+            'pnl_percent': round((pnl / INITIAL_CAPITAL) * 100, 2),
+            'initial_capital': INITIAL_CAPITAL,
+            'total_trades': len(trades),
+            'trades': formatted_trades,
+            'symbol': symbol,
+            'strategy': strategy_name,
+            'margin': f"{leverage}x",
+            'interval': interval,
+            'analytics': analytics,
+            'stage_seconds': spans.timings,
+        }
+        if chart_format == "binary":
+            return encode_chart_binary(chart_df, {**results, 'buy_markers': buy_markers, 'sell_markers': sell_markers})
+        results['chart_data'] = prepare_chart_data(chart_df, buy_markers, sell_markers)
+    return results
+
+
+def _parse_chart_options(args):
+    """(width, downsample, chart_format) from request args. Raises ValueError on an unknown option."""
+    downsample = args.get("downsample", "lttb")
+    if downsample not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"downsample must be one of {', '.join(DOWNSAMPLE_METHODS)}")
+    chart_format = args.get("format", "json")
+    if chart_format not in ("json", "binary"):
+        raise ValueError("format must be 'json' or 'binary'")
+    return parse_width(args.get("width")), downsample, chart_format
+
+
+INTERVALS = tuple(dict.fromkeys((DEFAULT_INTERVAL, RESAMPLE_BASE_INTERVAL) + tuple(RESAMPLE_DERIVED_INTERVALS)))
+
+
+def _parse_interval(args):
+    """Candle interval from request args (None for the default). Raises ValueError if unsupported."""
+    interval = args.get("interval")
+    if interval and interval not in INTERVALS:
+        raise ValueError(f"interval must be one of {', '.join(INTERVALS)}")
+    return interval or None
+
+
+EXECUTION_ARGS = ("fill", "intrabar", "slippage_bps", "costs", "shorts")
+
+
+def _parse_execution_options(args):
+    """Execution model options from request args (None if none given). Raises ValueError if invalid."""
+    options = {key: args[key] for key in EXECUTION_ARGS if args.get(key)}
+    if not options:
+        return None
+    ExecutionModel.from_options(options)
+    return options
+
+
+def _negotiate_compression(response):
+    """gzip/brotli-encode a response body when the client accepts it."""
+    response.headers['Vary'] = 'Accept-Encoding'
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    body = response.get_data()
+    if encoding and len(body) >= COMPRESS_MIN_BYTES:
+        response.set_data(compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
 
 @app.route('/')
 def index():
@@ -104,34 +264,103 @@ def api_stocks():
     return jsonify({"stocks": AVAILABLE_STOCKS, "default": DEFAULT_SYMBOL})
 
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """Counters, gauges (cache hit ratios) and latency histograms in Prometheus text format"""
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/api/groww/stats')
+def api_groww_stats():
+    """Return Groww token refresh and auth latency metrics"""
+    return jsonify(get_provider().stats())
+
+
+def _parse_custom_strategy(args):
+    """Build a custom strategy dict from request args (None unless custom=true). Raises ValueError on bad JSON."""
+    if args.get("custom") != "true":
+        return None
+    try:
+        buy_conditions = json.loads(args.get("buy_conditions", "[]"))
+        sell_conditions = json.loads(args.get("sell_conditions", "[]"))
+    except (json.JSONDecodeError, TypeError) as e:
+        raise ValueError(str(e))
+    return {
+        "buy_conditions": buy_conditions,
+        "sell_conditions": sell_conditions,
+        "buy_logic": args.get("buy_logic", "AND"),
+        "sell_logic": args.get("sell_logic", "AND")
+    }
+
+
+def _parse_backtest_options(args):
+    """
+    Options shared by the backtest endpoints, parsed from request args.
+
+    Returns:
+        (options, None) with custom_strategy, width, downsample, chart_format,
+        execution and interval, or (None, (response, 400)) naming the bad option
+    """
+    try:
+        custom_strategy = _parse_custom_strategy(args)
+    except ValueError as e:
+        return None, _bad_request('Invalid custom strategy format', e)
+    try:
+        width, downsample, chart_format = _parse_chart_options(args)
+    except ValueError as e:
+        return None, _bad_request('Invalid chart options', e)
+    try:
+        execution = _parse_execution_options(args)
+    except ValueError as e:
+        return None, _bad_request('Invalid execution options', e)
+    try:
+        interval = _parse_interval(args)
+    except ValueError as e:
+        return None, _bad_request('Invalid interval', e)
+    return {
+        'custom_strategy': custom_strategy,
+        'width': width,
+        'downsample': downsample,
+        'chart_format': chart_format,
+        'execution': execution,
+        'interval': interval,
+    }, None
+
+
+def _bad_request(error, exc):
+    """400 response naming the invalid option group."""
+    return jsonify({'error': error, 'message': str(exc)}), 400
+
+
 @app.route('/api/backtest')
 def api_backtest():
-    """API endpoint to run backtest"""
+    """
+    API endpoint to run backtest.
+
+    Optional chart args: width=<viewport px> downsamples the chart
+    (downsample=lttb|minmax), format=binary returns typed arrays instead
+    of JSON lists. Responses are gzip/brotli encoded when accepted.
+
+    Optional execution args: fill=close|open, intrabar=1 (stops and
+    take-profits against high/low), slippage_bps=<n>, costs=delivery|intraday,
+    shorts=1. Without them fills are at the close with no costs.
+
+    Optional interval=1m|5m|15m|30m|1h|1d (default 1d); intraday timeframes
+    are aggregated from the stored base candles.
+    """
     try:
         strategy_id = request.args.get("strategy")
         margin = request.args.get("margin")
         symbol = request.args.get("symbol")
-        is_custom = request.args.get("custom") == "true"
-        
-        custom_strategy = None
-        if is_custom:
-            try:
-                buy_conditions = json.loads(request.args.get("buy_conditions", "[]"))
-                sell_conditions = json.loads(request.args.get("sell_conditions", "[]"))
-                custom_strategy = {
-                    "buy_conditions": buy_conditions,
-                    "sell_conditions": sell_conditions,
-                    "buy_logic": request.args.get("buy_logic", "AND"),
-                    "sell_logic": request.args.get("sell_logic", "AND")
-                }
-            except (json.JSONDecodeError, TypeError) as e:
-                return jsonify({
-                    'error': 'Invalid custom strategy format',
-                    'message': str(e)
-                }), 400
         
-        results = run_backtest(symbol=symbol, strategy_id=strategy_id, margin=margin, custom_strategy=custom_strategy)
-        return jsonify(results)
+        options, error = _parse_backtest_options(request.args)
+        if error:
+            return error
+
+        results = run_backtest(symbol=symbol, strategy_id=strategy_id, margin=margin, **options)
+        if options['chart_format'] == "binary":
+            return _negotiate_compression(Response(results, mimetype=BINARY_MIMETYPE))
+        return _negotiate_compression(jsonify(results))
     except ValueError as e:
         print(f"Configuration Error: {traceback.format_exc()}")
         return jsonify({
@@ -145,6 +374,178 @@ def api_backtest():
             'message': 'An unexpected error occurred. Check console for details.'
         }), 500
 
+
+@app.route('/api/backtest/stream')
+def api_backtest_stream():
+    """
+    Same parameters as /api/backtest, streamed as Server-Sent Events.
+
+    Emits stage timings, price chunks right after the fetch, trades and
+    indicator chunks as they are ready, then a final 'result' event.
+    """
+    options, error = _parse_backtest_options(request.args)
+    if error:
+        return error
+    options.pop('chart_format')
+
+    events = iter_backtest_events(
+        symbol=request.args.get("symbol"),
+        strategy_id=request.args.get("strategy"),
+        margin=request.args.get("margin"),
+        **options,
+    )
+
+    def generate():
+        for event, data in events:
+            yield format_sse(event, data)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+jobs = JobManager(lambda progress, **params: run_backtest(progress=progress, **params))
+
+# Longest a poll may block waiting for a job to finish
+MAX_POLL_WAIT_SECONDS = 30
+
+
+@app.route('/api/jobs', methods=['POST'])
+def api_submit_job():
+    """
+    Queue a backtest (same parameters as /api/backtest, as query args or form fields).
+
+    Returns 202 with the job id; identical parameters join the existing job.
+    """
+    args = request.values
+    options, error = _parse_backtest_options(args)
+    if error:
+        return error
+    options.pop('chart_format')
+    params = {
+        'symbol': args.get("symbol"),
+        'strategy_id': None if options['custom_strategy'] else args.get("strategy"),
+        'margin': args.get("margin"),
+        **options,
+    }
+    try:
+        job, created, token = jobs.submit(params)
+    except QueueFull as e:
+        return jsonify({'error': str(e), 'message': 'Server is busy, try again shortly'}), 503
+    data = job.to_dict(include_result=False)
+    data['deduplicated'] = not created
+    data['cancel_token'] = token
+    return jsonify(data), 202
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def api_job_status(job_id):
+    """Job status; with ?wait=N blocks up to N seconds for the job to finish (long poll)."""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job', 'message': 'Job not found or expired'}), 404
+    try:
+        wait = min(float(request.args.get("wait", 0)), MAX_POLL_WAIT_SECONDS)
+    except ValueError:
+        wait = 0
+    if wait > 0:
+        job.wait(wait)
+    return jsonify(job.to_dict())
+
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def api_cancel_job(job_id):
+    """Withdraw one submission (?token=<cancel_token>); the job is cancelled once no submitter is left."""
+    token = request.args.get("token")
+    if not token:
+        return jsonify({'error': 'Missing token', 'message': 'Pass the cancel_token returned on submission'}), 400
+    job = jobs.cancel(job_id, token)
+    if job is None:
+        return jsonify({'error': 'Unknown job', 'message': 'Job not found or expired'}), 404
+    return jsonify(job.to_dict(include_result=False))
+
+
+@app.route('/api/jobs/stats')
+def api_job_stats():
+    """Queue depth, de-duplication and latency metrics for background jobs"""
+    return jsonify(jobs.stats())
+
+
+@app.route('/api/universe')
+def api_universe():
+    """
+    Backtest one strategy across many symbols.
+
+    Streams newline-delimited JSON: one line per symbol as it finishes,
+    then a final {"summary": [...]} line ranked by pnl_percent.
+    """
+    symbols = request.args.get("symbols")
+    symbols = [s.strip() for s in symbols.split(",") if s.strip()] if symbols else None
+    strategy_id = request.args.get("strategy")
+    margin = request.args.get("margin")
+    try:
+        custom_strategy = _parse_custom_strategy(request.args)
+    except ValueError as e:
+        return jsonify({
+            'error': 'Invalid custom strategy format',
+            'message': str(e)
+        }), 400
+
+    def generate():
+        results = []
+        for result in iter_universe_backtest(
+            symbols, strategy_id=strategy_id, custom_strategy=custom_strategy, margin=margin
+        ):
+            results.append(result)
+            yield json.dumps(result) + "\n"
+        summary = summarize_results(results)
+        yield json.dumps({"summary": summary.to_dict(orient="records")}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@app.route('/api/screener')
+def api_screener():
+    """
+    Symbols whose latest bar fires a strategy's signal, from stored candles.
+
+    Args: symbols (comma-separated, default AVAILABLE_STOCKS), strategy or
+    custom=true with conditions (as /api/backtest), side=buy|sell,
+    rank_by=<indicator>, order=asc|desc, new_only=1, limit=<n>,
+    interval=<interval>, fetch_missing=1 to fetch symbols with nothing stored.
+    """
+    symbols = request.args.get("symbols")
+    symbols = [s.strip() for s in symbols.split(",") if s.strip()] if symbols else None
+    try:
+        custom_strategy = _parse_custom_strategy(request.args)
+    except ValueError as e:
+        return jsonify({
+            'error': 'Invalid custom strategy format',
+            'message': str(e)
+        }), 400
+    try:
+        limit = int(request.args.get("limit") or SCREENER_LIMIT)
+        result = screen(
+            symbols,
+            strategy_id=request.args.get("strategy"),
+            custom_strategy=custom_strategy,
+            side=request.args.get("side", "buy"),
+            rank_by=request.args.get("rank_by") or None,
+            ascending=request.args.get("order", "desc") == "asc",
+            new_only=request.args.get("new_only") in ("1", "true"),
+            limit=max(1, limit),
+            interval=_parse_interval(request.args) or DEFAULT_INTERVAL,
+            fetch_missing=request.args.get("fetch_missing") in ("1", "true"),
+        )
+    except ValueError as e:
+        return jsonify({
+            'error': 'Invalid screener options',
+            'message': str(e)
+        }), 400
+    return _negotiate_compression(jsonify(result))
+
 if __name__ == '__main__':
     port = find_free_port(5000)
     print(f"🌐 Server starting on http://localhost:{port}")
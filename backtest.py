@@ -1,28 +1,327 @@
-def backtest_strategy(df, capital, exit_rules=None, leverage=1, stop_loss_pct=0.10):
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    # numba not installed, the array engine falls back to pure NumPy
+    njit = None
+
+BUY = 1
+SELL = -1
+
+
+def backtest_strategy(df, capital, exit_rules=None, leverage=1, stop_loss_pct=0.10, engine="array",
+                      execution=None):
     """
     Run backtest with optional leverage and stop-loss.
-    
+
     Args:
         df: DataFrame with 'close', 'timestamp', 'position' columns
         capital: Initial capital
         exit_rules: Dict with 'take_profit_rs' and 'hold_max_days' (optional)
         leverage: 1, 2, 5, or 10. Buying power = leverage * capital
         stop_loss_pct: Exit when position value < this fraction of entry value
-    
+        engine: "array" runs the state machine over NumPy arrays (JIT-compiled
+            when numba is installed), "loop" is the reference per-row version
+        execution: Optional execution.ExecutionModel (needs 'open', 'high',
+            'low' columns too); None keeps close fills without costs
+
+    Returns:
+        tuple: (final_value, pnl, trades), trades as (action, timestamp, price, qty),
+        with the order's charges appended as a fifth item under an execution model
+    """
+    if execution is not None:
+        final_value, pnl, fills = execution.simulate(
+            *(df[col].to_numpy(dtype=np.float64) for col in ("open", "high", "low", "close")),
+            df["position"].to_numpy(dtype=np.float64, na_value=np.nan),
+            capital, exit_rules, leverage, stop_loss_pct,
+        )
+        timestamps = df["timestamp"]
+        trades = [
+            ("BUY" if side == BUY else "SELL", timestamps.iloc[i], price, qty, cost)
+            for i, side, price, qty, cost in fills
+        ]
+        return final_value, pnl, trades
+    if engine == "loop":
+        return _backtest_loop(df, capital, exit_rules, leverage, stop_loss_pct)
+    if engine != "array":
+        raise ValueError(f"Unknown backtest engine: {engine}")
+
+    close = df["close"].to_numpy(dtype=np.float64)
+    position_signal = df["position"].to_numpy(dtype=np.float64, na_value=np.nan)
+    final_value, pnl, fills = backtest_arrays(
+        close, position_signal, capital, exit_rules, leverage, stop_loss_pct
+    )
+    timestamps = df["timestamp"]
+    trades = [
+        ("BUY" if side == BUY else "SELL", timestamps.iloc[i], price, qty)
+        for i, side, price, qty in fills
+    ]
+    return final_value, pnl, trades
+
+
+def backtest_arrays(close, position_signal, capital, exit_rules=None, leverage=1, stop_loss_pct=0.10):
+    """
+    Array-level backtest behind backtest_strategy.
+
+    Args:
+        close: float64 array of close prices
+        position_signal: float64 array of positions (1 buy, -1 sell, NaN/0 none)
+        capital, exit_rules, leverage, stop_loss_pct: As for backtest_strategy
+
+    Returns:
+        tuple: (final_value, pnl, fills) with fills as (bar_index, side, price, qty)
+    """
+    exit_rules = exit_rules or {}
+    take_profit = exit_rules.get("take_profit_rs")
+    hold_max_days = exit_rules.get("hold_max_days")
+    leverage = max(1, int(leverage))
+
+    events = simulate_events(
+        close, position_signal, leverage * capital, leverage,
+        stop_loss_pct, take_profit, hold_max_days,
+    )
+
+    # Replay the (few) fills in Python so cash follows the exact same
+    # arithmetic as the reference loop.
+    cash = capital
+    position = 0
+    fills = []
+    for i, side, qty in events:
+        price = close[i]
+        if side == BUY:
+            cash -= qty * price
+            position = qty
+            fills.append((i, BUY, price, qty))
+        else:
+            cash += position * price
+            fills.append((i, SELL, price, position))
+            position = 0
+
+    final_value = cash + (position * close[-1] if position > 0 else 0)
+    return final_value, final_value - capital, fills
+
+
+def equity_from_fills(close, fills, capital):
+    """
+    Mark-to-market account value at every bar from backtest_arrays or
+    ExecutionModel.simulate fills (signed positions, charges deducted).
+
+    Returns:
+        tuple: (equity float64 array, position int64 array of shares held)
+    """
+    n = len(close)
+    share_steps = np.zeros(n, dtype=np.int64)
+    cash_steps = np.zeros(n, dtype=np.float64)
+    for i, side, price, qty, *cost in fills:
+        signed = qty if side == BUY else -qty
+        share_steps[i] += signed
+        cash_steps[i] -= signed * price + sum(cost)
+    position = np.cumsum(share_steps)
+    cash = capital + np.cumsum(cash_steps)
+    return cash + position * close, position
+
+
+def simulate_events(close, position_signal, buying_power, leverage, stop_loss_pct,
+                    take_profit=None, hold_max_days=None):
+    """
+    Run the entry/exit state machine over typed arrays.
+
+    Args:
+        close: float64 array of close prices
+        position_signal: float64 array of positions (1 buy, -1 sell, NaN/0 none)
+        buying_power: leverage * capital
+        leverage: Max quantity per entry
+        stop_loss_pct: Exit when position value < this fraction of entry value
+        take_profit: Exit once price >= entry + take_profit (₹), with hold_max_days
+        hold_max_days: 1 exits on the bar after entry, with take_profit
+
+    Returns:
+        list of (bar_index, side, qty) fills, side is BUY or SELL
+    """
+    use_exit_rules = take_profit is not None and hold_max_days is not None
+    if _simulate_jit is not None:
+        index, side, qty, count = _simulate_jit(
+            close, position_signal, float(buying_power), int(leverage), float(stop_loss_pct),
+            use_exit_rules, float(take_profit) if use_exit_rules else 0.0,
+            use_exit_rules and hold_max_days == 1,
+        )
+        return [(int(index[k]), int(side[k]), int(qty[k])) for k in range(count)]
+    return _simulate_numpy(
+        close, position_signal, buying_power, leverage, stop_loss_pct,
+        use_exit_rules, take_profit, use_exit_rules and hold_max_days == 1,
+    )
+
+
+def entry_quantity(price, buying_power, leverage):
+    """Shares bought on an entry: up to leverage, limited by buying power (0 if unaffordable)."""
+    max_qty_by_power = int(buying_power / price) if price > 0 else 0
+    return min(leverage, max(0, max_qty_by_power))
+
+
+def bar_step(price, pos_signal, position, buy_price, buying_power, leverage, stop_loss_pct,
+             use_exit_rules, take_profit, exit_next_bar):
+    """
+    One bar of the long-only entry/stop/exit state machine.
+
+    Shared by the array kernel and the live PaperAccount so they cannot
+    drift apart; _backtest_loop keeps its own copy as the independent
+    reference. Compiled with numba when available.
+
+    Args:
+        price: Fill price of this bar (the close)
+        pos_signal: Position signal for this bar (1 buy, -1 sell, NaN/0 none)
+        position: Shares currently held (0 when flat)
+        buy_price: Entry price of the open position (ignored when flat)
+        buying_power, leverage, stop_loss_pct: As for simulate_events
+        use_exit_rules: Exit on take_profit/exit_next_bar instead of the sell signal
+        take_profit: Exit once price >= buy_price + take_profit (₹)
+        exit_next_bar: Exit on any bar after the entry (hold_max_days == 1)
+
     Returns:
-        tuple: (final_value, pnl, trades)
+        tuple: (side, qty) with side BUY or SELL, or (0, 0) when no order is placed
+    """
+    if pos_signal == 1 and position == 0:
+        qty = entry_quantity(price, buying_power, leverage)
+        if qty < 1:
+            return 0, 0
+        return BUY, qty
+
+    if position > 0:
+        # Stop-loss check (priority)
+        if position * price < stop_loss_pct * (position * buy_price):
+            should_sell = True
+        # Strategy-specific exit rules
+        elif use_exit_rules:
+            should_sell = price >= buy_price + take_profit or exit_next_bar
+        # Default: sell on strategy signal
+        else:
+            should_sell = pos_signal == -1
+        if should_sell:
+            return SELL, position
+    return 0, 0
+
+
+if njit is not None:
+    entry_quantity = njit(cache=True)(entry_quantity)
+    bar_step = njit(cache=True)(bar_step)
+
+
+def _simulate_kernel(close, position_signal, buying_power, leverage, stop_loss_pct,
+                     use_exit_rules, take_profit, exit_next_bar):
+    """Bar-by-bar state machine over arrays; compiled with numba when available."""
+    n = close.shape[0]
+    index = np.empty(n, np.int64)
+    side = np.empty(n, np.int64)
+    qty_out = np.empty(n, np.int64)
+    count = 0
+    position = 0
+    buy_price = 0.0
+
+    for i in range(1, n):
+        price = close[i]
+        order, qty = bar_step(price, position_signal[i], position, buy_price, buying_power, leverage,
+                              stop_loss_pct, use_exit_rules, take_profit, exit_next_bar)
+        if order == 0:
+            continue
+        index[count] = i
+        side[count] = order
+        qty_out[count] = qty
+        count += 1
+        if order == BUY:
+            position = qty
+            buy_price = price
+        else:
+            position = 0
+
+    return index, side, qty_out, count
+
+
+_simulate_jit = njit(cache=True)(_simulate_kernel) if njit is not None else None
+
+_SCAN_CHUNK = 256
+
+
+def _first_true(predicate, start, stop):
+    """First index in [start, stop) where predicate(slice) is True, scanning in growing chunks."""
+    chunk = _SCAN_CHUNK
+    while start < stop:
+        end = min(stop, start + chunk)
+        hits = np.flatnonzero(predicate(start, end))
+        if len(hits):
+            return start + int(hits[0])
+        start = end
+        chunk *= 2
+    return -1
+
+
+def _simulate_numpy(close, position_signal, buying_power, leverage, stop_loss_pct,
+                    use_exit_rules, take_profit, exit_next_bar):
     """
+    Pure NumPy equivalent of _simulate_kernel.
+
+    Instead of visiting every bar it jumps straight to the next eligible
+    entry, then to the first bar that triggers an exit.
+    """
+    n = len(close)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        max_qty_by_power = np.where(close > 0, np.trunc(buying_power / close), 0)
+    entry_qty = np.minimum(leverage, max_qty_by_power)
+    entry_bars = np.flatnonzero((position_signal == 1) & (entry_qty >= 1))
+    sell_bars = np.flatnonzero(position_signal == -1)
+
+    events = []
+    i = 1
+    while i < n:
+        k = np.searchsorted(entry_bars, i)
+        if k == len(entry_bars):
+            break
+        i = int(entry_bars[k])
+        qty = int(entry_qty[i])
+        buy_price = close[i]
+        events.append((i, BUY, qty))
+
+        entry_value = qty * buy_price
+        stop_value = stop_loss_pct * entry_value
+
+        def stop_hit(lo, hi):
+            return qty * close[lo:hi] < stop_value
+
+        if use_exit_rules and exit_next_bar:
+            exit_bar = i + 1 if i + 1 < n else -1
+        elif use_exit_rules:
+            target = buy_price + take_profit
+            exit_bar = _first_true(
+                lambda lo, hi: stop_hit(lo, hi) | (close[lo:hi] >= target), i + 1, n
+            )
+        else:
+            k = np.searchsorted(sell_bars, i + 1)
+            signal_exit = int(sell_bars[k]) if k < len(sell_bars) else n
+            exit_bar = _first_true(stop_hit, i + 1, signal_exit)
+            if exit_bar == -1 and signal_exit < n:
+                exit_bar = signal_exit
+
+        if exit_bar == -1:
+            break
+        events.append((exit_bar, SELL, qty))
+        i = exit_bar + 1
+
+    return events
+
+
+def _backtest_loop(df, capital, exit_rules=None, leverage=1, stop_loss_pct=0.10):
+    """Reference per-row implementation of backtest_strategy."""
     cash = capital
     position = 0
     buy_price = None
     buy_index = None
     trades = []
-    
+
     exit_rules = exit_rules or {}
     take_profit = exit_rules.get("take_profit_rs")
     hold_max_days = exit_rules.get("hold_max_days")
     use_exit_rules = take_profit is not None and hold_max_days is not None
-    
+
     leverage = max(1, int(leverage))
     buying_power = leverage * capital
 
@@ -37,7 +336,7 @@ def backtest_strategy(df, capital, exit_rules=None, leverage=1, stop_loss_pct=0.
             qty = min(leverage, max(0, max_qty_by_power))
             if qty < 1:
                 continue
-            
+
             cash -= qty * price
             position = qty
             buy_price = price
@@ -55,7 +354,7 @@ def backtest_strategy(df, capital, exit_rules=None, leverage=1, stop_loss_pct=0.
                 should_sell = True
             # Strategy-specific exit rules
             elif use_exit_rules:
-                should_sell = (price >= buy_price + take_profit or 
+                should_sell = (price >= buy_price + take_profit or
                               (hold_max_days == 1 and i > buy_index))
             # Default: sell on strategy signal
             else:
@@ -0,0 +1,160 @@
+"""
+Streaming Backtest
+Runs a backtest stage by stage, yielding progress, trades and chart chunks as Server-Sent Events
+"""
+import json
+import time
+import traceback
+
+import numpy as np
+
+import metrics
+from config import INITIAL_CAPITAL, DEFAULT_SYMBOL, USE_MOCK_DATA, STOP_LOSS_PCT, DEFAULT_INTERVAL
+from data_fetcher import fetch_interval_data
+from pipeline import resolve_leverage, compute_strategy_indicators, generate_strategy_signals
+from backtest import backtest_strategy
+from analytics import compute_analytics
+from execution import ExecutionModel
+from utils import (
+    prepare_price_data,
+    prepare_trade_markers,
+    prepare_chart_data,
+    format_trades_for_display,
+    chunk_series,
+    timestamp_format,
+)
+from chart_payload import downsample_indices, trade_indices
+
+CHART_CHUNK_SIZE = 1000  # Bars per chart event
+TRADE_BATCH_SIZE = 200  # Trades per trades event
+
+PRICE_KEYS = ("timestamps", "open", "high", "low", "close")
+
+STAGE_HISTOGRAM = "backtest_stage_seconds"
+STAGE_HISTOGRAM_HELP = "Time spent in each backtest stage"
+
+
+def iter_backtest_events(symbol=None, strategy_id=None, margin=None, custom_strategy=None,
+                         chunk_size=CHART_CHUNK_SIZE, width=None, downsample="lttb", execution=None,
+                         interval=None):
+    """
+    Run a backtest, yielding (event, data) pairs as each stage completes.
+
+    Events, in order:
+        stage:  {"stage", "seconds"} after fetch, indicators, signals, simulation, analytics,
+                serialization
+        meta:   {"symbol", "interval", "bars"} once candles are loaded
+        prices: {"offset", "timestamps", "open", "high", "low", "close"} chunks, right after fetch
+        trades: {"trades", "buy_markers", "sell_markers"} batches from the simulation
+        chart:  {"offset", <indicator series>...} chunks
+        result: the /api/backtest summary fields (without trades/chart_data) plus stage timings
+        error:  {"error", "message"} if a stage fails (ends the stream)
+
+    With width set, prices and chart series are downsampled for that many
+    pixels before any trade is known, so trade markers are moved onto the
+    nearest earlier bar that was kept. execution is a dict of
+    ExecutionModel.from_options options and interval the candle timeframe,
+    as for app.run_backtest.
+    """
+    timings = {}
+
+    def stage(name, started):
+        elapsed = time.perf_counter() - started
+        metrics.histogram(STAGE_HISTOGRAM, STAGE_HISTOGRAM_HELP, labels={"stage": name}).observe(elapsed)
+        timings[name] = round(elapsed, 4)
+        return "stage", {"stage": name, "seconds": timings[name]}
+
+    try:
+        symbol = symbol or DEFAULT_SYMBOL
+        interval = interval or DEFAULT_INTERVAL
+        leverage = resolve_leverage(margin)
+
+        started = time.perf_counter()
+        df = fetch_interval_data(symbol, interval, use_mock=USE_MOCK_DATA)
+        fmt = timestamp_format(df)
+        yield stage("fetch", started)
+        rows = downsample_indices(df["close"].to_numpy(), width, downsample) if width else None
+        yield "meta", {"symbol": symbol, "interval": interval, "bars": len(df) if rows is None else len(rows)}
+        for chunk in chunk_series(prepare_price_data(_select_rows(df, rows)), chunk_size):
+            yield "prices", chunk
+
+        started = time.perf_counter()
+        df = compute_strategy_indicators(df, strategy_id, custom_strategy)
+        yield stage("indicators", started)
+
+        started = time.perf_counter()
+        df, exit_rules, strategy_name = generate_strategy_signals(df, strategy_id, custom_strategy)
+        yield stage("signals", started)
+
+        started = time.perf_counter()
+        final_value, pnl, trades = backtest_strategy(
+            df, INITIAL_CAPITAL, exit_rules=exit_rules, leverage=leverage, stop_loss_pct=STOP_LOSS_PCT,
+            execution=ExecutionModel.from_options(execution),
+        )
+        yield stage("simulation", started)
+        for i in range(0, len(trades), TRADE_BATCH_SIZE):
+            batch = trades[i:i + TRADE_BATCH_SIZE]
+            buy_markers, sell_markers = prepare_trade_markers(
+                batch if rows is None else _snap_to_rows(df, batch, rows), fmt
+            )
+            yield "trades", {
+                "trades": format_trades_for_display(batch, fmt),
+                "buy_markers": buy_markers,
+                "sell_markers": sell_markers,
+            }
+
+        started = time.perf_counter()
+        analytics = compute_analytics(df, trades, INITIAL_CAPITAL)
+        yield stage("analytics", started)
+
+        started = time.perf_counter()
+        chart_data = prepare_chart_data(_select_rows(df, rows), [], [])
+        series = {
+            key: values for key, values in chart_data.items()
+            if key not in PRICE_KEYS and isinstance(values, list) and key not in ("buy_markers", "sell_markers")
+        }
+        for chunk in chunk_series(series, chunk_size):
+            yield "chart", chunk
+        yield stage("serialization", started)
+
+        yield "result", {
+            'final_value': round(final_value, 2),
+            'pnl': round(pnl, 2),
+            'pnl_percent': round((pnl / INITIAL_CAPITAL) * 100, 2),
+            'initial_capital': INITIAL_CAPITAL,
+            'total_trades': len(trades),
+            'symbol': symbol,
+            'strategy': strategy_name,
+            'margin': f"{leverage}x",
+            'interval': interval,
+            'analytics': analytics,
+            'stage_seconds': timings,
+        }
+    except ValueError as e:
+        print(f"Configuration Error: {traceback.format_exc()}")
+        yield "error", {
+            'error': str(e),
+            'message': 'Please configure your Groww API credentials in .env file'
+        }
+    except Exception as e:
+        print(f"Error in streaming backtest: {traceback.format_exc()}")
+        yield "error", {
+            'error': str(e),
+            'message': 'An unexpected error occurred. Check console for details.'
+        }
+
+
+def _select_rows(df, rows):
+    return df if rows is None else df.iloc[rows]
+
+
+def _snap_to_rows(df, trades, rows):
+    """Trades with their timestamp replaced by the last kept bar at or before their fill."""
+    kept = rows[np.maximum(np.searchsorted(rows, trade_indices(df, trades), side="right") - 1, 0)]
+    timestamps = df["timestamp"].iloc[kept]
+    return [(t[0], ts) + tuple(t[2:]) for t, ts in zip(trades, timestamps)]
+
+
+def format_sse(event, data):
+    """Encode one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
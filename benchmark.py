@@ -0,0 +1,365 @@
+"""
+Benchmark Suite
+Times each backtest stage on synthetic candles at several scales, records peak memory and flags regressions
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+from config import (
+    INITIAL_CAPITAL,
+    DEFAULT_STRATEGY,
+    STRATEGIES,
+    STOP_LOSS_PCT,
+    BENCHMARK_HISTORY_FILE,
+    BENCHMARK_BASELINE_RUNS,
+    BENCHMARK_REGRESSION_PCT,
+    BENCHMARK_MIN_SECONDS,
+    COMPACT_CHUNK_BARS,
+)
+from data_fetcher import generate_synthetic_data
+from pipeline import compute_strategy_indicators, generate_strategy_signals, apply_strategy
+from backtest import backtest_strategy
+from analytics import compute_analytics
+from indicator_cache import get_indicator_cache
+from utils import prepare_trade_markers, prepare_chart_data, format_trades_for_display
+
+STAGES = ("fetch", "indicators", "signals", "simulation", "analytics", "serialization")
+
+# (symbols, bars per symbol)
+DEFAULT_CASES = ((1, 1_000), (1, 100_000), (1, 1_000_000), (10, 1_000), (100, 1_000), (500, 1_000))
+QUICK_CASES = ((1, 1_000), (1, 100_000), (50, 1_000))
+MAX_DAILY_BARS = 50_000  # Longer fixtures use minute bars to stay inside pandas' timestamp range
+
+
+def parse_cases(text):
+    """'1x1000,500x1000' -> ((1, 1000), (500, 1000))."""
+    cases = []
+    for part in text.split(","):
+        symbols, _, bars = part.strip().lower().partition("x")
+        if not symbols.isdigit() or not bars.isdigit():
+            raise ValueError(f"Bad case {part!r}, expected SYMBOLSxBARS")
+        cases.append((int(symbols), int(bars)))
+    return tuple(cases)
+
+
+def case_name(symbols, bars):
+    return f"{symbols}x{bars}"
+
+
+@contextmanager
+def _timed(timings, stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+
+
+def run_case(symbols, bars, strategy_id=DEFAULT_STRATEGY, leverage=1, compact=False, custom_strategy=None):
+    """
+    One pass of every run_backtest stage over `symbols` synthetic symbols.
+
+    Stages run symbol after symbol (as app.run_backtest would for each) and
+    their times are summed. The indicator cache is cleared first so every
+    pass computes from scratch. A compact custom strategy longer than
+    COMPACT_CHUNK_BARS is signalled in chunks, which the signals stage times
+    as a whole (indicators are computed inside it).
+
+    Returns:
+        dict: stage -> seconds
+    """
+    get_indicator_cache().clear()
+    freq = "D" if bars <= MAX_DAILY_BARS else "1min"
+    chunked = compact and custom_strategy and bars > COMPACT_CHUNK_BARS
+    timings = {}
+    for j in range(symbols):
+        with _timed(timings, "fetch"):
+            df = generate_synthetic_data(bars=bars, seed=42 + j, freq=freq)
+        with _timed(timings, "indicators"):
+            if not chunked:
+                df = compute_strategy_indicators(df, strategy_id, custom_strategy, compact)
+        with _timed(timings, "signals"):
+            if chunked:
+                df, exit_rules, _ = apply_strategy(df, strategy_id, custom_strategy, compact)
+            else:
+                df, exit_rules, _ = generate_strategy_signals(df, strategy_id, custom_strategy, compact)
+        with _timed(timings, "simulation"):
+            _, _, trades = backtest_strategy(
+                df, INITIAL_CAPITAL, exit_rules=exit_rules, leverage=leverage, stop_loss_pct=STOP_LOSS_PCT
+            )
+        with _timed(timings, "analytics"):
+            analytics = compute_analytics(df, trades, INITIAL_CAPITAL)
+        with _timed(timings, "serialization"):
+            buy_markers, sell_markers = prepare_trade_markers(trades)
+            json.dumps({
+                'chart_data': prepare_chart_data(df, buy_markers, sell_markers),
+                'trades': format_trades_for_display(trades),
+                'analytics': analytics,
+            })
+    return timings
+
+
+def peak_memory_mb(symbols, bars, strategy_id=DEFAULT_STRATEGY, compact=False, custom_strategy=None):
+    """Peak traced allocation of one run_case pass, in MB."""
+    tracemalloc.start()
+    try:
+        run_case(symbols, bars, strategy_id, compact=compact, custom_strategy=custom_strategy)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 2 ** 20, 2)
+
+
+def benchmark_case(symbols, bars, strategy_id=DEFAULT_STRATEGY, repeat=3, memory=True, compact=False,
+                   custom_strategy=None):
+    """
+    Time a case `repeat` times (keeping each stage's best) and measure peak memory.
+
+    Peak memory comes from one extra pass under tracemalloc, so tracing
+    overhead never leaks into the timings.
+
+    Returns:
+        dict with stages (seconds), total_seconds and peak_memory_mb (None if not measured)
+    """
+    runs = [
+        run_case(symbols, bars, strategy_id, compact=compact, custom_strategy=custom_strategy)
+        for _ in range(max(1, repeat))
+    ]
+    stages = {stage: round(min(run.get(stage, 0.0) for run in runs), 6) for stage in STAGES}
+    peak_mb = peak_memory_mb(symbols, bars, strategy_id, compact, custom_strategy) if memory else None
+    return {
+        "stages": stages,
+        "total_seconds": round(sum(stages.values()), 6),
+        "peak_memory_mb": peak_mb,
+    }
+
+
+def _git_commit():
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def environment():
+    """Interpreter, library versions and commit recorded with each result."""
+    try:
+        import numba
+        numba_version = numba.__version__
+    except ImportError:
+        numba_version = None
+    import pandas as pd
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "numba": numba_version,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def load_history(path=BENCHMARK_HISTORY_FILE):
+    """All recorded results, oldest first (empty if there is no history yet)."""
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_history(records, path=BENCHMARK_HISTORY_FILE):
+    """Append result records as JSON lines."""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def baseline_for(history, record, runs=BENCHMARK_BASELINE_RUNS):
+    """
+    Median stage times and peak memory of the last `runs` results of the same case.
+
+    Returns:
+        dict like a result record's stages plus peak_memory_mb, or None without history
+    """
+    previous = [
+        r for r in history
+        if r["case"] == record["case"] and r["strategy"] == record["strategy"]
+        and r.get("compact", False) == record.get("compact", False)
+    ][-runs:]
+    if not previous:
+        return None
+    baseline = {
+        "runs": len(previous),
+        "stages": {
+            stage: statistics.median(r["stages"][stage] for r in previous if stage in r["stages"])
+            for stage in record["stages"]
+            if any(stage in r["stages"] for r in previous)
+        },
+    }
+    peaks = [r["peak_memory_mb"] for r in previous if r.get("peak_memory_mb") is not None]
+    baseline["peak_memory_mb"] = statistics.median(peaks) if peaks else None
+    return baseline
+
+
+def find_regressions(record, baseline, threshold_pct=BENCHMARK_REGRESSION_PCT,
+                     min_seconds=BENCHMARK_MIN_SECONDS):
+    """
+    Stages (and peak memory) of record that are worse than baseline.
+
+    A stage regresses when it is more than threshold_pct slower and at
+    least min_seconds slower; peak memory when it is threshold_pct higher.
+
+    Returns:
+        list of {"metric", "baseline", "current", "change_pct"}
+    """
+    if baseline is None:
+        return []
+    factor = 1 + threshold_pct / 100
+    flags = []
+    for stage, current in record["stages"].items():
+        base = baseline["stages"].get(stage)
+        if base is not None and current > base * factor and current - base >= min_seconds:
+            flags.append({"metric": stage, "baseline": base, "current": current,
+                          "change_pct": round((current / base - 1) * 100, 1) if base else None})
+    base_mb, current_mb = baseline.get("peak_memory_mb"), record.get("peak_memory_mb")
+    if base_mb and current_mb and current_mb > base_mb * factor:
+        flags.append({"metric": "peak_memory_mb", "baseline": base_mb, "current": current_mb,
+                      "change_pct": round((current_mb / base_mb - 1) * 100, 1)})
+    return flags
+
+
+def run_suite(cases=DEFAULT_CASES, strategy_id=DEFAULT_STRATEGY, repeat=3, memory=True,
+              history_path=BENCHMARK_HISTORY_FILE, save=True, threshold_pct=BENCHMARK_REGRESSION_PCT,
+              on_result=None, compact=False, custom_strategy=None):
+    """
+    Benchmark every case, compare each with its history and optionally record it.
+
+    Args:
+        cases: Iterable of (symbols, bars)
+        on_result: Optional callback(record) as each case finishes
+        compact: Run in compact mode (recorded, and compared only with compact history)
+        custom_strategy: Optional custom strategy dict benchmarked instead of strategy_id
+
+    Returns:
+        list of result records, each with a 'regressions' list
+    """
+    # Untimed warm-up so one-off JIT compilation and lazy imports are not measured
+    run_case(1, 1_000, strategy_id, compact=compact, custom_strategy=custom_strategy)
+    history = load_history(history_path)
+    run_at = datetime.now().isoformat(timespec="seconds")
+    env = environment()
+    records = []
+    for symbols, bars in cases:
+        result = benchmark_case(symbols, bars, strategy_id, repeat, memory, compact, custom_strategy)
+        record = {
+            "run_at": run_at,
+            "case": case_name(symbols, bars),
+            "symbols": symbols,
+            "bars": bars,
+            "strategy": "custom" if custom_strategy else strategy_id,
+            "compact": compact,
+            "repeat": repeat,
+            **result,
+            **env,
+        }
+        baseline = baseline_for(history, record)
+        record["baseline_runs"] = baseline["runs"] if baseline else 0
+        record["regressions"] = find_regressions(record, baseline, threshold_pct)
+        records.append(record)
+        if on_result:
+            on_result(record)
+    if save:
+        append_history(records, history_path)
+    return records
+
+
+def print_record(record):
+    """One line per case: stage times in ms, peak memory and any regressions."""
+    stages = "  ".join(f"{stage} {record['stages'][stage] * 1000:,.1f}" for stage in STAGES)
+    peak = record["peak_memory_mb"]
+    print(f"{record['case']:>12}  {stages}  | total {record['total_seconds']:.3f}s"
+          f"{'' if peak is None else f'  peak {peak:,.1f} MB'}")
+    for flag in record["regressions"]:
+        print(f"  ❌ {flag['metric']}: {flag['baseline']} -> {flag['current']} (+{flag['change_pct']}%)")
+
+
+def compare_memory(cases, strategy_id=DEFAULT_STRATEGY, custom_strategy=None):
+    """
+    Peak memory of each case in the default and the compact layout.
+
+    Returns:
+        list of {"case", "default_mb", "compact_mb", "change_pct"}
+    """
+    rows = []
+    for symbols, bars in cases:
+        default_mb = peak_memory_mb(symbols, bars, strategy_id, False, custom_strategy)
+        compact_mb = peak_memory_mb(symbols, bars, strategy_id, True, custom_strategy)
+        rows.append({"case": case_name(symbols, bars), "default_mb": default_mb, "compact_mb": compact_mb,
+                     "change_pct": round((compact_mb / default_mb - 1) * 100, 1) if default_mb else None})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backtest stages on synthetic candles")
+    parser.add_argument("--cases", type=parse_cases, help="Comma-separated SYMBOLSxBARS (default: full suite)")
+    parser.add_argument("--quick", action="store_true", help="Skip the million-bar and 500-symbol cases")
+    parser.add_argument("--strategy", default=DEFAULT_STRATEGY, choices=list(STRATEGIES))
+    parser.add_argument("--repeat", type=int, default=3, help="Timed passes per case (best is kept)")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--history", default=BENCHMARK_HISTORY_FILE)
+    parser.add_argument("--no-save", action="store_true", help="Compare without recording this run")
+    parser.add_argument("--threshold", type=float, default=BENCHMARK_REGRESSION_PCT,
+                        help="Regression threshold in percent")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 on a regression")
+    parser.add_argument("--compact", action="store_true", help="Benchmark the compact frame layout")
+    parser.add_argument("--custom", type=json.loads, metavar="JSON",
+                        help="Custom strategy ({\"buy_conditions\": [...], ...}) instead of --strategy")
+    parser.add_argument("--compare-memory", action="store_true",
+                        help="Only report peak memory, default layout vs compact")
+    args = parser.parse_args()
+
+    cases = args.cases or (QUICK_CASES if args.quick else DEFAULT_CASES)
+    label = "custom" if args.custom else args.strategy
+    if args.compare_memory:
+        print(f"\n📉 Peak memory: {label} | default -> compact")
+        for row in compare_memory(cases, args.strategy, args.custom):
+            print(f"{row['case']:>12}  {row['default_mb']:,.1f} MB -> {row['compact_mb']:,.1f} MB"
+                  f"  ({row['change_pct']:+}%)")
+        return
+
+    print(f"\n⏱  Benchmark: {label}{' (compact)' if args.compact else ''} | stage times in ms (best of {args.repeat})")
+    records = run_suite(
+        cases, args.strategy, args.repeat, not args.no_memory, args.history,
+        save=not args.no_save, threshold_pct=args.threshold, on_result=print_record,
+        compact=args.compact, custom_strategy=args.custom,
+    )
+    regressions = sum(len(r["regressions"]) for r in records)
+    if regressions:
+        print(f"\n❌ {regressions} regression(s) against the last {BENCHMARK_BASELINE_RUNS} runs")
+    else:
+        print("\n✅ No regressions")
+    if not args.no_save:
+        print(f"Results appended to {args.history}")
+    if regressions and args.fail_on_regression:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
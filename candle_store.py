@@ -0,0 +1,157 @@
+"""
+Local Candle Store
+Persists OHLCV candles per symbol/exchange/interval as memory-mapped NumPy files
+"""
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from config import CANDLE_STORE_DIR
+
+CANDLE_COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
+
+# One record per candle; timestamp is epoch nanoseconds (naive UTC, as returned by fetch)
+CANDLE_DTYPE = np.dtype([
+    ("timestamp", "<i8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<i8"),
+])
+
+
+class CandleStore:
+    """
+    On-disk candle cache. Each symbol/exchange/interval lives in its own .npy
+    file of CANDLE_DTYPE records sorted by timestamp, so reads are memory-mapped
+    and a date range is sliced with a binary search instead of a full load.
+    """
+
+    def __init__(self, root=CANDLE_STORE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def path(self, symbol, exchange="NSE", interval="1d"):
+        return os.path.join(self.root, exchange.upper(), interval, f"{symbol.upper()}.npy")
+
+    def _records(self, symbol, exchange, interval):
+        path = self.path(symbol, exchange, interval)
+        if not os.path.exists(path):
+            return None
+        return np.load(path, mmap_mode="r")
+
+    def last_timestamp(self, symbol, exchange="NSE", interval="1d"):
+        """Timestamp of the newest stored candle, or None if nothing is stored."""
+        records = self._records(symbol, exchange, interval)
+        if records is None or len(records) == 0:
+            return None
+        return pd.Timestamp(int(records["timestamp"][-1]))
+
+    def age_seconds(self, symbol, exchange="NSE", interval="1d"):
+        """Seconds since the stored series was last written or refreshed, or None."""
+        path = self.path(symbol, exchange, interval)
+        if not os.path.exists(path):
+            return None
+        return time.time() - os.path.getmtime(path)
+
+    def touch(self, symbol, exchange="NSE", interval="1d"):
+        """Mark the stored series as checked against the API without rewriting it."""
+        path = self.path(symbol, exchange, interval)
+        if os.path.exists(path):
+            os.utime(path, None)
+
+    def load(self, symbol, exchange="NSE", interval="1d", start=None, end=None):
+        """
+        Load stored candles as a DataFrame.
+
+        Args:
+            start, end: Optional inclusive timestamp bounds
+
+        Returns:
+            DataFrame with CANDLE_COLUMNS, or None if nothing is stored
+        """
+        records = self._records(symbol, exchange, interval)
+        if records is None or len(records) == 0:
+            return None
+
+        ts = records["timestamp"]
+        lo = 0 if start is None else int(np.searchsorted(ts, pd.Timestamp(start).value, side="left"))
+        hi = len(records) if end is None else int(np.searchsorted(ts, pd.Timestamp(end).value, side="right"))
+        return records_to_frame(np.array(records[lo:hi]))
+
+    def tail(self, symbol, exchange="NSE", interval="1d", bars=250):
+        """
+        The newest `bars` stored candles as CANDLE_DTYPE records (only those pages are read).
+
+        Returns:
+            record array, or None if nothing is stored
+        """
+        records = self._records(symbol, exchange, interval)
+        if records is None or len(records) == 0:
+            return None
+        return np.array(records[-bars:])
+
+    def merge(self, symbol, df, exchange="NSE", interval="1d"):
+        """
+        Merge freshly fetched candles into the stored series.
+
+        Rows are de-duplicated on timestamp with the new data winning, so a
+        re-fetched (previously partial) last candle replaces the stored one.
+
+        Returns:
+            int: Number of candles stored after the merge
+        """
+        new = frame_to_records(df)
+        with self._lock:
+            old = self._records(symbol, exchange, interval)
+            if old is not None and len(old):
+                merged = np.concatenate([np.array(old), new])
+                del old
+            else:
+                merged = new
+
+            # Stable sort keeps arrival order within a timestamp; keep the last occurrence
+            merged = merged[np.argsort(merged["timestamp"], kind="stable")]
+            ts = merged["timestamp"]
+            keep = np.ones(len(merged), dtype=bool)
+            keep[:-1] = ts[1:] != ts[:-1]
+            merged = merged[keep]
+
+            path = self.path(symbol, exchange, interval)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, merged)
+            os.replace(tmp_path, path)
+            return len(merged)
+
+
+def frame_to_records(df):
+    """Convert a candle DataFrame into a CANDLE_DTYPE record array."""
+    records = np.empty(len(df), dtype=CANDLE_DTYPE)
+    records["timestamp"] = pd.to_datetime(df["timestamp"]).to_numpy(dtype="datetime64[ns]").view("i8")
+    for col in CANDLE_COLUMNS[1:]:
+        records[col] = df[col].to_numpy()
+    return records
+
+
+def records_to_frame(records):
+    """Convert CANDLE_DTYPE records into the DataFrame shape fetch_historical_data returns."""
+    df = pd.DataFrame({col: records[col] for col in CANDLE_COLUMNS[1:]})
+    df.insert(0, "timestamp", pd.to_datetime(records["timestamp"], unit="ns"))
+    return df
+
+
+_default_store = None
+
+
+def get_candle_store():
+    """Process-wide store rooted at config.CANDLE_STORE_DIR."""
+    global _default_store
+    if _default_store is None:
+        _default_store = CandleStore()
+    return _default_store
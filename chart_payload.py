@@ -0,0 +1,218 @@
+"""
+Compact Chart Payloads
+Viewport-based downsampling, a typed-array binary encoding of chart data, and response compression
+"""
+import gzip
+import json
+import struct
+
+import numpy as np
+
+from utils import CHART_INDICATORS
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BINARY_MAGIC = b"BTC1"
+BINARY_MIMETYPE = "application/vnd.backtest.chart"
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+MIN_WIDTH = 50
+MAX_WIDTH = 10000
+COMPRESS_MIN_BYTES = 1024
+PRICE_COLUMNS = ("open", "high", "low", "close")
+
+
+def parse_width(value):
+    """
+    Viewport width from a query arg, clamped to [MIN_WIDTH, MAX_WIDTH] (None if absent).
+
+    Raises:
+        ValueError: If value is not an integer
+    """
+    if value is None or value == "":
+        return None
+    try:
+        width = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("width must be an integer") from None
+    return min(max(width, MIN_WIDTH), MAX_WIDTH)
+
+
+def lttb_indices(values, n_out):
+    """
+    Largest-Triangle-Three-Buckets selection of n_out indices from values.
+
+    Keeps the first and last points; from each bucket in between picks the
+    point forming the largest triangle with the previous pick and the mean
+    of the next bucket, which preserves the visual shape of the line.
+    """
+    n = len(values)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    y = np.nan_to_num(np.asarray(values, dtype=np.float64))
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        next_lo = hi
+        next_hi = edges[b + 2] if b + 2 < len(edges) else n
+        avg_x = (next_lo + next_hi - 1) / 2.0
+        avg_y = y[next_lo:next_hi].mean()
+        xs = np.arange(lo, hi)
+        area = np.abs((a - avg_x) * (y[lo:hi] - y[a]) - (a - xs) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        out[b + 1] = a
+    return out
+
+
+def minmax_indices(values, n_buckets):
+    """Indices of the minimum and maximum of each of n_buckets equal buckets (plus the endpoints)."""
+    n = len(values)
+    if 2 * n_buckets >= n:
+        return np.arange(n)
+    y = np.nan_to_num(np.asarray(values, dtype=np.float64))
+    edges = np.linspace(0, n, n_buckets + 1).astype(np.int64)
+    picks = [0, n - 1]
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        window = y[lo:hi]
+        picks.append(lo + int(np.argmin(window)))
+        picks.append(lo + int(np.argmax(window)))
+    return np.unique(picks)
+
+
+def downsample_indices(values, width, method="lttb", keep=None):
+    """
+    Row indices to draw for a chart width pixels wide.
+
+    Args:
+        values: Series that drives the selection (the close price)
+        width: Viewport width in pixels; lttb keeps one point per pixel, minmax two
+        method: 'lttb' or 'minmax'
+        keep: Extra indices that must survive (e.g. bars with trades)
+
+    Returns:
+        Sorted int64 array of indices
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"Unknown downsample method: {method}")
+    if method == "lttb":
+        indices = lttb_indices(values, width)
+    else:
+        indices = minmax_indices(values, width)
+    if keep is not None and len(keep):
+        indices = np.union1d(indices, np.asarray(keep, dtype=np.int64))
+    return indices
+
+
+def trade_indices(df, trades):
+    """Row positions of the bars trades were filled on."""
+    if not trades:
+        return np.empty(0, dtype=np.int64)
+    timestamps = df["timestamp"].to_numpy()
+    fills = np.array([t[1] for t in trades], dtype=timestamps.dtype)
+    return np.searchsorted(timestamps, fills)
+
+
+def encode_chart_binary(df, meta):
+    """
+    Encode chart columns as little-endian typed arrays.
+
+    Layout: b"BTC1", uint32 header length, UTF-8 JSON header, then each
+    column's bytes at the 8-byte aligned offset the header gives (relative
+    to the end of the header). The header carries meta (the non-chart
+    result fields) and, per column, name, dtype and offset. Timestamps are
+    float64 epoch milliseconds, prices and indicators float32 with NaN
+    during warm-up, signals int8.
+    """
+    columns = [("timestamps", df["timestamp"].to_numpy().astype("datetime64[ms]").astype(np.int64)
+                .astype("<f8"))]
+    for name in PRICE_COLUMNS:
+        columns.append((name, df[name].to_numpy(dtype="<f4")))
+    for key, column in CHART_INDICATORS:
+        if column in df.columns:
+            columns.append((key, df[column].to_numpy(dtype="<f4", na_value=np.nan)))
+    if "signal" in df.columns:
+        columns.append(("signals", df["signal"].fillna(0).to_numpy(dtype="<i1")))
+
+    entries = []
+    offset = 0
+    for name, values in columns:
+        offset = (offset + 7) & ~7
+        entries.append({"name": name, "dtype": values.dtype.str, "offset": offset})
+        offset += values.nbytes
+    header = json.dumps({"length": len(df), "columns": entries, "meta": meta}).encode()
+    # Pad the header so column offsets are aligned relative to the buffer start too
+    prefix_len = len(BINARY_MAGIC) + 4
+    header += b" " * ((-(prefix_len + len(header))) % 8)
+
+    body = bytearray(BINARY_MAGIC + struct.pack("<I", len(header)) + header)
+    base = len(body)
+    for entry, (_, values) in zip(entries, columns):
+        body.extend(b"\0" * (base + entry["offset"] - len(body)))
+        body.extend(values.tobytes())
+    return bytes(body)
+
+
+def decode_chart_binary(payload):
+    """Inverse of encode_chart_binary: returns (meta, {name: ndarray})."""
+    if payload[:4] != BINARY_MAGIC:
+        raise ValueError("Not a binary chart payload")
+    (header_len,) = struct.unpack_from("<I", payload, 4)
+    header = json.loads(payload[8:8 + header_len])
+    base = 8 + header_len
+    n = header["length"]
+    columns = {
+        entry["name"]: np.frombuffer(payload, dtype=entry["dtype"], count=n, offset=base + entry["offset"])
+        for entry in header["columns"]
+    }
+    return header["meta"], columns
+
+
+def _accepted_encodings(accept_encoding):
+    """Accept-Encoding header -> {coding: q}, with malformed q-values read as 0."""
+    accepted = {}
+    for part in (accept_encoding or "").lower().split(","):
+        coding, *params = (item.strip() for item in part.split(";"))
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    Best supported Content-Encoding for an Accept-Encoding header (None for identity).
+
+    Codings with q=0 are refused; "*" covers codings not listed. Among
+    acceptable codings the highest q wins, brotli before gzip on a tie.
+    """
+    accepted = _accepted_encodings(accept_encoding)
+    default = accepted.get("*", 0.0)
+    supported = ("br", "gzip") if brotli is not None else ("gzip",)
+    best, best_q = None, 0.0
+    for coding in supported:
+        q = accepted.get(coding, default)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body, encoding):
+    """Compress body for a negotiated Content-Encoding."""
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return body
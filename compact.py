@@ -0,0 +1,50 @@
+"""
+Compact Frames
+Opt-in low-memory frame layout: float32 indicator columns, narrow signal dtypes and chunked signal passes
+"""
+import numpy as np
+
+from config import COMPACT_CHUNK_BARS, COMPACT_WARMUP_BARS
+
+INDICATOR_DTYPE = np.float32
+SIGNAL_DTYPE = np.int8
+POSITION_DTYPE = np.float32  # -1/0/1 and the leading NaN are exact
+
+# Never narrowed: prices and volume feed fills and costs, equity is money
+EXACT_COLUMNS = ("timestamp", "open", "high", "low", "close", "volume", "equity", "exposure")
+
+
+def compact_values(values):
+    """float32 copy of a float64 indicator Series/array; other dtypes are returned as is."""
+    return values.astype(INDICATOR_DTYPE) if values.dtype == np.float64 else values
+
+
+def compact_frame(df):
+    """
+    Narrow df's derived columns in place and return it.
+
+    float64 indicator columns become float32 (about 7 significant digits,
+    far below indicator noise), 'signal' becomes int8 and 'position'
+    float32. Candle prices, volume and equity keep their exact dtypes.
+    """
+    for col in df.columns:
+        if col in EXACT_COLUMNS:
+            continue
+        if col == "signal" and df[col].dtype.kind == "i":
+            df[col] = df[col].astype(SIGNAL_DTYPE)
+        elif col == "position":
+            df[col] = df[col].astype(POSITION_DTYPE)
+        elif df[col].dtype == np.float64:
+            df[col] = df[col].astype(INDICATOR_DTYPE)
+    return df
+
+
+def chunk_windows(n, chunk_bars=COMPACT_CHUNK_BARS, warmup=COMPACT_WARMUP_BARS):
+    """
+    Split n bars into chunks, each with up to `warmup` bars of preceding history.
+
+    Returns:
+        list of (lo, start, hi): compute on rows [lo, hi), keep rows [start, hi)
+    """
+    chunk_bars = max(1, int(chunk_bars))
+    return [(max(0, start - warmup), start, min(n, start + chunk_bars)) for start in range(0, n, chunk_bars)]
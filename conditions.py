@@ -0,0 +1,318 @@
+"""
+Compiled Custom Strategy Conditions
+Turns condition JSON into a validated, constant-folded plan evaluated with NumPy boolean reductions
+"""
+import json
+from functools import lru_cache
+
+import numpy as np
+
+import metrics
+from resample import RESAMPLE_MINUTES
+
+BASIC_OPERATORS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+CROSS_OPERATORS = ("crosses_above", "crosses_below")
+PCT_OPERATORS = ("pct_change", "pct_change_above", "pct_change_below")
+
+# Plan node kinds
+FALSE = ("const", False)
+TRUE = ("const", True)
+
+PLAN_CACHE_SIZE = 256
+
+# "SMA_50@1d": an indicator computed on another timeframe and joined onto the candles
+TIMEFRAME_SEPARATOR = "@"
+
+# Indicators that are plain candle fields; compact frames read the field instead of a copy
+COLUMN_ALIASES = {"price": "close", "open_price": "open", "high_price": "high", "low_price": "low"}
+
+
+def _to_float(value, condition):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid value {value!r} in condition {condition}")
+
+
+def qualify(name, timeframe):
+    """Column name for `name` computed on `timeframe` (unchanged without a timeframe)."""
+    return f"{name}{TIMEFRAME_SEPARATOR}{timeframe}" if name and timeframe else name
+
+
+def split_timeframe(name):
+    """'SMA_50@1d' -> ('SMA_50', '1d'); 'SMA_50' -> ('SMA_50', None)."""
+    base, sep, timeframe = name.partition(TIMEFRAME_SEPARATOR)
+    return (base, timeframe) if sep else (name, None)
+
+
+def _timeframe(value, condition):
+    if value and value not in RESAMPLE_MINUTES:
+        raise ValueError(f"Invalid timeframe {value!r} in condition {condition}")
+    return value or None
+
+
+def _value_form(indicator, operator, value, condition):
+    """Node comparing an indicator against a constant, or FALSE when it can never match."""
+    if value is None:
+        return FALSE
+    if operator in CROSS_OPERATORS:
+        return ("cross_value", operator, indicator, _to_float(value, condition))
+    if operator in PCT_OPERATORS:
+        direction = "below" if operator == "pct_change_below" else "above"
+        return ("pct", direction, indicator, _to_float(value, condition))
+    if operator in BASIC_OPERATORS:
+        return ("cmp_value", operator, indicator, _to_float(value, condition))
+    return FALSE
+
+
+def _compile_leaf(condition):
+    """
+    Compile one condition dict.
+
+    Whether compare_to names an existing column is only known at evaluation
+    time, so a leaf with compare_to keeps both the column comparison and
+    the constant fallback used when that column is missing.
+
+    An optional "timeframe" (and "compare_timeframe", defaulting to it)
+    evaluates the indicator on candles of that interval; the leaf then
+    refers to the qualified column, e.g. "SMA_50@1d".
+    """
+    if not isinstance(condition, dict):
+        raise ValueError(f"Condition must be an object, got {condition!r}")
+    timeframe = _timeframe(condition.get("timeframe"), condition)
+    compare_timeframe = _timeframe(condition.get("compare_timeframe", timeframe), condition)
+    indicator = qualify(condition.get("indicator", ""), timeframe)
+    operator = condition.get("operator", ">")
+    compare_to = qualify(condition.get("compare_to"), compare_timeframe)
+    value_form = _value_form(indicator, operator, condition.get("value"), condition)
+
+    if not compare_to:
+        return value_form if value_form == FALSE else ("leaf", indicator, None, None, value_form)
+
+    if operator in BASIC_OPERATORS:
+        column_form = ("cmp_column", operator, indicator, compare_to)
+    elif operator in CROSS_OPERATORS:
+        column_form = ("cross_column", operator, indicator, compare_to)
+    else:
+        column_form = FALSE
+    if column_form == FALSE and value_form == FALSE:
+        return FALSE
+    return ("leaf", indicator, compare_to, column_form, value_form)
+
+
+def _compile_group(conditions, logic):
+    """
+    Compile a list of conditions (or nested {"logic", "conditions"} groups).
+
+    Constant children are folded away, duplicate children are evaluated
+    once, and a group that cannot match becomes FALSE.
+    """
+    if not conditions:
+        return FALSE
+    kind = "and" if logic == "AND" else "or"
+    absorbing, neutral = (FALSE, TRUE) if kind == "and" else (TRUE, FALSE)
+
+    children = []
+    for condition in conditions:
+        if isinstance(condition, dict) and "conditions" in condition:
+            child = _compile_group(condition.get("conditions") or [], condition.get("logic", "AND"))
+        else:
+            child = _compile_leaf(condition)
+        if child == absorbing:
+            return absorbing
+        if child != neutral and child not in children:
+            children.append(child)
+
+    if not children:
+        return neutral
+    if len(children) == 1:
+        return children[0]
+    return (kind, tuple(children))
+
+
+def _columns(node, out):
+    kind = node[0]
+    if kind in ("and", "or"):
+        for child in node[1]:
+            _columns(child, out)
+    elif kind == "leaf":
+        for name in (node[1], node[2]):
+            if name and name not in out:
+                out.append(name)
+    return out
+
+
+class _Context:
+    """Per-evaluation memo so repeated columns, shifts and pct changes are computed once."""
+
+    def __init__(self, df):
+        self.df = df
+        # Masks are one value per bar, or bars x symbols for a screener panel
+        self.shape = getattr(df, "mask_shape", (len(df),))
+        self._memo = {}
+
+    def has(self, name):
+        return name in self.df.columns or COLUMN_ALIASES.get(name) in self.df.columns
+
+    def _series(self, name):
+        return self.df[name if name in self.df.columns else COLUMN_ALIASES[name]]
+
+    def column(self, name):
+        key = ("col", name)
+        if key not in self._memo:
+            self._memo[key] = self._series(name).to_numpy(dtype=np.float64, na_value=np.nan)
+        return self._memo[key]
+
+    def shifted(self, name):
+        key = ("shift", name)
+        if key not in self._memo:
+            values = self.column(name)
+            prev = np.empty_like(values)
+            prev[:1] = np.nan
+            prev[1:] = values[:-1]
+            self._memo[key] = prev
+        return self._memo[key]
+
+    def pct_change(self, name):
+        key = ("pct", name)
+        if key not in self._memo:
+            self._memo[key] = (self._series(name).pct_change() * 100).to_numpy(
+                dtype=np.float64, na_value=np.nan)
+        return self._memo[key]
+
+
+class _ArrayContext(_Context):
+    """_Context over a dict of column name -> float64 array, for callers without a DataFrame."""
+
+    def __init__(self, arrays):
+        self.df = arrays
+        self.shape = (len(next(iter(arrays.values()))),) if arrays else (0,)
+        self._memo = {}
+
+    def has(self, name):
+        return name in self.df or COLUMN_ALIASES.get(name) in self.df
+
+    def column(self, name):
+        return self.df[name if name in self.df else COLUMN_ALIASES[name]]
+
+    def pct_change(self, name):
+        key = ("pct", name)
+        if key not in self._memo:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                self._memo[key] = (self.column(name) / self.shifted(name) - 1) * 100
+        return self._memo[key]
+
+
+def _evaluate(node, ctx):
+    kind = node[0]
+    if kind == "const":
+        return np.full(ctx.shape, node[1], dtype=bool)
+
+    if kind in ("and", "or"):
+        reduce = np.logical_and if kind == "and" else np.logical_or
+        out = _evaluate(node[1][0], ctx)
+        for child in node[1][1:]:
+            reduce(out, _evaluate(child, ctx), out=out)
+        return out
+
+    if kind == "leaf":
+        _, indicator, compare_to, column_form, value_form = node
+        if not ctx.has(indicator):
+            return np.zeros(ctx.shape, dtype=bool)
+        if compare_to and ctx.has(compare_to):
+            return _evaluate(column_form, ctx)
+        return _evaluate(value_form, ctx)
+
+    if kind == "cmp_value":
+        _, operator, indicator, value = node
+        return BASIC_OPERATORS[operator](ctx.column(indicator), value)
+
+    if kind == "cmp_column":
+        _, operator, indicator, compare_to = node
+        return BASIC_OPERATORS[operator](ctx.column(indicator), ctx.column(compare_to))
+
+    if kind == "pct":
+        _, direction, indicator, value = node
+        change = ctx.pct_change(indicator)
+        return change < value if direction == "below" else change > value
+
+    if kind in ("cross_value", "cross_column"):
+        _, operator, indicator, other = node
+        col, prev = ctx.column(indicator), ctx.shifted(indicator)
+        if kind == "cross_column":
+            other, other_prev = ctx.column(other), ctx.shifted(other)
+        else:
+            other_prev = other
+        if operator == "crosses_above":
+            out = col > other
+            out &= prev <= other_prev
+        else:
+            out = col < other
+            out &= prev >= other_prev
+        return out
+
+    raise ValueError(f"Unknown plan node: {kind}")
+
+
+class ConditionPlan:
+    """Compiled condition group; evaluate(df) returns a boolean NumPy array."""
+
+    def __init__(self, root):
+        self.root = root
+        self.columns = tuple(_columns(root, []))
+
+    @property
+    def is_constant(self):
+        return self.root[0] == "const"
+
+    def evaluate(self, df, ctx=None):
+        return _evaluate(self.root, ctx or _Context(df))
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _compile_cached(conditions_json, logic):
+    return ConditionPlan(_compile_group(json.loads(conditions_json), logic))
+
+
+metrics.gauge(
+    "condition_plan_cache_hit_ratio", "Share of condition compilations served from the plan cache",
+    lambda: _compile_cached.cache_info().hits / max(1, sum(_compile_cached.cache_info()[:2])),
+)
+
+
+def compile_conditions(conditions, logic="AND"):
+    """
+    Compile a condition list into a ConditionPlan.
+
+    Plans are cached on the canonical JSON of the conditions, so the same
+    strategy submitted repeatedly is only parsed once.
+
+    Raises:
+        ValueError: If a condition is malformed (e.g. a non-numeric value)
+    """
+    return _compile_cached(json.dumps(list(conditions or []), sort_keys=True), logic)
+
+
+def evaluate_strategy(df, buy_plan, sell_plan):
+    """Evaluate buy and sell plans over df with one shared memo; returns (buy, sell) masks."""
+    ctx = _Context(df)
+    return buy_plan.evaluate(df, ctx), sell_plan.evaluate(df, ctx)
+
+
+def evaluate_arrays(arrays, buy_plan, sell_plan):
+    """
+    evaluate_strategy over a dict of column name -> float64 array instead of a DataFrame.
+
+    Columns missing from arrays count as absent, as they would from a frame.
+    Used per tick by the live runner, where building a DataFrame costs more
+    than the evaluation itself.
+    """
+    ctx = _ArrayContext(arrays)
+    return buy_plan.evaluate(arrays, ctx), sell_plan.evaluate(arrays, ctx)
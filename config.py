@@ -8,6 +8,76 @@ from env import API_KEY, API_SECRET
 INITIAL_CAPITAL = 100000  # Initial capital (₹)
 DEFAULT_SYMBOL = "RELIANCE"  # Symbol for backtesting
 USE_MOCK_DATA = False  # Use real Groww API data
+FALLBACK_TO_MOCK_DATA = True  # On an API error serve mock candles; False raises instead
+
+# Local candle store (data_fetcher serves repeat requests from disk)
+USE_CANDLE_STORE = True
+CANDLE_STORE_DIR = "data/candles"
+CANDLE_STORE_MAX_AGE_SECONDS = 300  # Re-check the API for new candles after this long
+
+# Bulk downloader (downloader.py)
+# Longest range the Groww historical candle API returns per request, by interval (days)
+GROWW_MAX_DAYS_PER_REQUEST = {"1m": 7, "5m": 15, "15m": 30, "30m": 90, "1h": 150, "1d": 1080}
+DOWNLOAD_RATE_PER_SECOND = 8  # Sustained requests/second across all download workers
+DOWNLOAD_BURST = 8  # Requests allowed back to back before the rate applies
+DOWNLOAD_WORKERS = 4
+DOWNLOAD_MAX_RETRIES = 4
+DOWNLOAD_BACKOFF_SECONDS = 0.5  # Doubles on every retry, with jitter
+DOWNLOAD_HOLIDAYS = ()  # Exchange holiday dates ("2026-01-26", ...) not reported as gaps
+
+# Timeframes (resample.py): the derived intervals are aggregated from the base
+# interval over the NSE session on demand instead of being downloaded. Daily
+# candles come from the exchange (their close is the closing-auction price),
+# as on the CLI; add "1d" here to derive them from the base candles too.
+RESAMPLE_BASE_INTERVAL = "1m"
+RESAMPLE_DERIVED_INTERVALS = ("5m", "15m", "30m", "1h")
+RESAMPLE_CACHE_SIZE = 32  # Base series (symbol, exchange) kept with their derived frames
+DEFAULT_INTERVAL = "1d"
+
+# Indicator result cache (keyed by candle fingerprint + indicator parameters)
+USE_INDICATOR_CACHE = True
+INDICATOR_CACHE_MAX_BYTES = 256 * 1024 * 1024
+INDICATOR_CACHE_DIR = None  # e.g. "data/indicators" to keep results across restarts
+
+# Groww access token reuse (expiry is read from the token when it is a JWT)
+GROWW_TOKEN_TTL_SECONDS = 8 * 3600  # Assumed lifetime when the token carries no expiry
+GROWW_TOKEN_REFRESH_MARGIN_SECONDS = 300  # Refresh in the background this long before expiry
+
+# Benchmarks (benchmark.py)
+BENCHMARK_HISTORY_FILE = "data/benchmarks.jsonl"
+BENCHMARK_BASELINE_RUNS = 5  # Baseline = median of this many earlier runs of the same case
+BENCHMARK_REGRESSION_PCT = 20  # Flag a stage this much slower than its baseline...
+BENCHMARK_MIN_SECONDS = 0.005  # ...and at least this many seconds slower (ignores noise)
+
+# Compact mode (compact.py): float32 indicator columns, aliased price fields,
+# no defensive frame copies, and long histories signalled in bounded chunks
+COMPACT_FRAMES = False
+COMPACT_CHUNK_BARS = 250_000  # Histories longer than this compute indicators chunk by chunk
+COMPACT_WARMUP_BARS = 1000  # Minimum history prepended to each chunk so indicators are warmed up
+
+# Screener (screener.py): latest-bar signals across a universe from stored candles
+SCREENER_BARS = 250  # Trailing bars loaded for predefined strategies (custom conditions load what they need)
+SCREENER_LIMIT = 50  # Matches returned by default
+
+# Robustness analysis (robustness.py): resampled equity paths and confidence intervals
+ROBUSTNESS_RESAMPLES = 10_000  # Trade-order shuffles and block-bootstrap paths
+ROBUSTNESS_NOISE_PATHS = 500  # Noise-perturbed price paths (each re-runs the strategy)
+ROBUSTNESS_NOISE_PCT = 1.0  # Std dev of the per-bar price perturbation, in percent
+ROBUSTNESS_BLOCK_BARS = 20  # Block length of the return bootstrap (about a trading month of daily bars)
+ROBUSTNESS_CONFIDENCE = 0.95
+ROBUSTNESS_BATCH_CELLS = 5_000_000  # Paths x bars simulated per batch (bounds each batch's matrices)
+ROBUSTNESS_PARALLEL_CELLS = 50_000_000  # Resample runs larger than this are spread across processes
+
+# Per-request profiling: add ?profile=1 (save a .prof file) or ?profile=text (return the report)
+ALLOW_REQUEST_PROFILING = False  # Off by default: any client could fill the disk or read stack internals
+PROFILE_DIR = "data/profiles"
+PROFILE_MAX_FILES = 50  # Oldest .prof files beyond this many are deleted
+PROFILE_TOP_N = 40  # Functions listed in a profile=text report
+
+# Background backtest jobs (/api/jobs)
+JOB_WORKERS = 4  # Backtests running at once
+JOB_MAX_PENDING = 64  # Queued + running jobs before new submissions are refused
+JOB_RESULT_TTL_SECONDS = 600  # Finished results stay pollable (and reusable) this long
 
 # Available stocks for backtesting
 AVAILABLE_STOCKS = [
@@ -46,3 +116,28 @@ STRATEGIES = {
 }
 DEFAULT_STRATEGY = "SMA Crossover"
 DEFAULT_MARGIN = "1x"  # 1x, 2x, 5x, or 10x leverage
+LEVERAGE_MAP = {"1x": 1, "2x": 2, "5x": 5, "10x": 10}
+STOP_LOSS_PCT = 0.10  # Exit once a position is worth less than this fraction of its entry value
+
+# Execution model (execution.ExecutionModel). The defaults keep the original
+# behaviour: fills at the bar close, no slippage, no costs, long only.
+EXECUTION_FILL = "close"  # "close" or "open" (open of the bar after the signal)
+SLIPPAGE_BPS = 0.0
+DEFAULT_COST_SCHEDULE = None  # A key of COST_SCHEDULES, or None for no costs
+
+# Indian equity charges per order, as fractions of order turnover
+# (Groww brokerage: 0.1% capped at ₹20, minimum ₹5; GST on brokerage + fees)
+COST_SCHEDULES = {
+    "delivery": {
+        "brokerage_pct": 0.001, "brokerage_min": 5.0, "brokerage_max": 20.0,
+        "stt_buy_pct": 0.001, "stt_sell_pct": 0.001,
+        "exchange_pct": 0.0000297, "sebi_pct": 0.000001,
+        "gst_pct": 0.18, "stamp_buy_pct": 0.00015,
+    },
+    "intraday": {
+        "brokerage_pct": 0.001, "brokerage_min": 5.0, "brokerage_max": 20.0,
+        "stt_buy_pct": 0.0, "stt_sell_pct": 0.00025,
+        "exchange_pct": 0.0000297, "sebi_pct": 0.000001,
+        "gst_pct": 0.18, "stamp_buy_pct": 0.00003,
+    },
+}
@@ -5,96 +5,262 @@ Allows users to define their own trading strategies with conditions on indicator
 import pandas as pd
 import numpy as np
 
+from config import USE_INDICATOR_CACHE, COMPACT_FRAMES
+from indicator_cache import get_indicator_cache, fingerprint
+from conditions import COLUMN_ALIASES, compile_conditions, evaluate_strategy, qualify, split_timeframe
+from resample import (
+    RESAMPLE_MINUTES, OHLCV_COLUMNS, SESSION_START_UTC, SESSION_END_UTC,
+    resample_ohlcv, completed_rows, take_rows,
+)
+from compact import SIGNAL_DTYPE, POSITION_DTYPE, compact_values
 
-def compute_all_indicators(df):
-    """Compute all available indicators that users can use in custom strategies"""
-    # SMA
-    df["SMA_20"] = df["close"].rolling(20).mean()
-    df["SMA_50"] = df["close"].rolling(50).mean()
-    df["SMA_100"] = df["close"].rolling(100).mean()
-    df["SMA_200"] = df["close"].rolling(200).mean()
-    
-    # RSI
+
+# --- Indicator registry ---
+# Each indicator declares the indicators it is derived from and a function
+# computing it from the candles and the already-computed values. Names
+# starting with "_" are shared intermediates that are never written to df.
+# lookback is how many bars of its inputs one value reads (see required_lookback).
+INDICATORS = {}
+
+EMA_WARMUP_SPANS = 4  # An EMA's starting value weighs under 0.1% after this many spans
+
+
+def _indicator(name, deps=(), lookback=1):
+    def register(fn):
+        INDICATORS[name] = {"deps": tuple(deps), "fn": fn, "lookback": lookback}
+        return fn
+    return register
+
+
+def _register_sma(window):
+    _indicator(f"SMA_{window}", lookback=window)(lambda df, v: df["close"].rolling(window).mean())
+
+
+def _register_ema(span):
+    _indicator(f"EMA_{span}", lookback=EMA_WARMUP_SPANS * span)(
+        lambda df, v: df["close"].ewm(span=span, adjust=False).mean())
+
+
+# SMA
+for _window in (20, 50, 100, 200):
+    _register_sma(_window)
+
+
+# RSI
+@_indicator("RSI", lookback=15)
+def _rsi(df, v):
     delta = df["close"].diff()
     gain = delta.where(delta > 0, 0.0)
     loss = (-delta).where(delta < 0, 0.0)
     avg_gain = gain.rolling(14).mean()
     avg_loss = loss.rolling(14).mean()
     rs = avg_gain / avg_loss.replace(0, 1e-10)
-    df["RSI"] = 100 - (100 / (1 + rs))
-    
-    # VWAP
+    return 100 - (100 / (1 + rs))
+
+
+# VWAP
+@_indicator("VWAP", lookback=20)
+def _vwap(df, v):
     tp = (df["high"] + df["low"] + df["close"]) / 3
     pv = tp * df["volume"]
-    df["VWAP"] = pv.rolling(20).sum() / df["volume"].rolling(20).sum()
-    
-    # EMA
-    df["EMA_9"] = df["close"].ewm(span=9, adjust=False).mean()
-    df["EMA_20"] = df["close"].ewm(span=20, adjust=False).mean()
-    df["EMA_50"] = df["close"].ewm(span=50, adjust=False).mean()
-    df["EMA_100"] = df["close"].ewm(span=100, adjust=False).mean()
-    df["EMA_200"] = df["close"].ewm(span=200, adjust=False).mean()
-    
-    # MACD
-    ema12 = df["close"].ewm(span=12, adjust=False).mean()
-    ema26 = df["close"].ewm(span=26, adjust=False).mean()
-    df["MACD"] = ema12 - ema26
-    df["MACD_Signal"] = df["MACD"].ewm(span=9, adjust=False).mean()
-    df["MACD_Histogram"] = df["MACD"] - df["MACD_Signal"]
-    
-    # Bollinger Bands
-    bb_period = 20
-    bb_std = 2
-    df["BB_Middle"] = df["close"].rolling(bb_period).mean()
-    bb_std_val = df["close"].rolling(bb_period).std()
-    df["BB_Upper"] = df["BB_Middle"] + (bb_std_val * bb_std)
-    df["BB_Lower"] = df["BB_Middle"] - (bb_std_val * bb_std)
-    df["BB_Width"] = (df["BB_Upper"] - df["BB_Lower"]) / df["BB_Middle"]
-    df["BB_Position"] = (df["close"] - df["BB_Lower"]) / (df["BB_Upper"] - df["BB_Lower"])
-    
-    # Stochastic Oscillator
-    stoch_k_period = 14
-    stoch_d_period = 3
-    low_min = df["low"].rolling(stoch_k_period).min()
-    high_max = df["high"].rolling(stoch_k_period).max()
-    df["Stoch_K"] = 100 * ((df["close"] - low_min) / (high_max - low_min))
-    df["Stoch_D"] = df["Stoch_K"].rolling(stoch_d_period).mean()
-    
-    # ATR (Average True Range)
-    atr_period = 14
+    return pv.rolling(20).sum() / df["volume"].rolling(20).sum()
+
+
+# EMA
+for _span in (9, 20, 50, 100, 200):
+    _register_ema(_span)
+
+
+# MACD
+_indicator("_EMA_12", lookback=EMA_WARMUP_SPANS * 12)(lambda df, v: df["close"].ewm(span=12, adjust=False).mean())
+_indicator("_EMA_26", lookback=EMA_WARMUP_SPANS * 26)(lambda df, v: df["close"].ewm(span=26, adjust=False).mean())
+_indicator("MACD", ["_EMA_12", "_EMA_26"])(lambda df, v: v["_EMA_12"] - v["_EMA_26"])
+_indicator("MACD_Signal", ["MACD"], lookback=EMA_WARMUP_SPANS * 9)(lambda df, v: v["MACD"].ewm(span=9, adjust=False).mean())
+_indicator("MACD_Histogram", ["MACD", "MACD_Signal"])(lambda df, v: v["MACD"] - v["MACD_Signal"])
+
+# Bollinger Bands
+BB_PERIOD = 20
+BB_STD = 2
+_indicator("BB_Middle", lookback=BB_PERIOD)(lambda df, v: df["close"].rolling(BB_PERIOD).mean())
+_indicator("_BB_Std", lookback=BB_PERIOD)(lambda df, v: df["close"].rolling(BB_PERIOD).std())
+_indicator("BB_Upper", ["BB_Middle", "_BB_Std"])(lambda df, v: v["BB_Middle"] + (v["_BB_Std"] * BB_STD))
+_indicator("BB_Lower", ["BB_Middle", "_BB_Std"])(lambda df, v: v["BB_Middle"] - (v["_BB_Std"] * BB_STD))
+_indicator("BB_Width", ["BB_Upper", "BB_Lower", "BB_Middle"])(
+    lambda df, v: (v["BB_Upper"] - v["BB_Lower"]) / v["BB_Middle"])
+_indicator("BB_Position", ["BB_Upper", "BB_Lower"])(
+    lambda df, v: (df["close"] - v["BB_Lower"]) / (v["BB_Upper"] - v["BB_Lower"]))
+
+# Stochastic Oscillator
+STOCH_K_PERIOD = 14
+STOCH_D_PERIOD = 3
+
+
+@_indicator("Stoch_K", lookback=STOCH_K_PERIOD)
+def _stoch_k(df, v):
+    low_min = df["low"].rolling(STOCH_K_PERIOD).min()
+    high_max = df["high"].rolling(STOCH_K_PERIOD).max()
+    return 100 * ((df["close"] - low_min) / (high_max - low_min))
+
+
+_indicator("Stoch_D", ["Stoch_K"], lookback=STOCH_D_PERIOD)(lambda df, v: v["Stoch_K"].rolling(STOCH_D_PERIOD).mean())
+
+
+# ATR (Average True Range)
+ATR_PERIOD = 14
+
+
+@_indicator("ATR", lookback=ATR_PERIOD + 1)
+def _atr(df, v):
     high_low = df["high"] - df["low"]
     high_close = np.abs(df["high"] - df["close"].shift())
     low_close = np.abs(df["low"] - df["close"].shift())
-    true_range = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-    df["ATR"] = true_range.rolling(atr_period).mean()
-    
-    # Volume indicators
-    df["Volume_SMA"] = df["volume"].rolling(20).mean()
-    df["Volume_Ratio"] = df["volume"] / df["Volume_SMA"].replace(0, 1e-10)
-    
-    # Price change indicators
-    df["Price_Change"] = df["close"].pct_change() * 100
-    df["Price_Change_5"] = df["close"].pct_change(5) * 100
-    df["Price_Change_10"] = df["close"].pct_change(10) * 100
-    
-    # Price fields (for direct comparison)
-    df["price"] = df["close"]
-    df["open_price"] = df["open"]
-    df["high_price"] = df["high"]
-    df["low_price"] = df["low"]
-    
+    # fmax skips NaN like a row-wise max, and keeps the shape of a (bars x symbols) frame
+    true_range = np.fmax(np.fmax(high_low, high_close), low_close)
+    return true_range.rolling(ATR_PERIOD).mean()
+
+
+# Volume indicators
+_indicator("Volume_SMA", lookback=20)(lambda df, v: df["volume"].rolling(20).mean())
+_indicator("Volume_Ratio", ["Volume_SMA"])(lambda df, v: df["volume"] / v["Volume_SMA"].replace(0, 1e-10))
+
+# Price change indicators
+_indicator("Price_Change", lookback=2)(lambda df, v: df["close"].pct_change() * 100)
+_indicator("Price_Change_5", lookback=6)(lambda df, v: df["close"].pct_change(5) * 100)
+_indicator("Price_Change_10", lookback=11)(lambda df, v: df["close"].pct_change(10) * 100)
+
+# Price fields (for direct comparison)
+_indicator("price")(lambda df, v: df["close"])
+_indicator("open_price")(lambda df, v: df["open"])
+_indicator("high_price")(lambda df, v: df["high"])
+_indicator("low_price")(lambda df, v: df["low"])
+
+
+def compute_indicators(df, names, use_cache=USE_INDICATOR_CACHE, compact=False):
+    """
+    Compute only the named indicators (and what they depend on) into df.
+
+    Results are looked up in the indicator cache first, so a cached
+    indicator needs none of its dependencies computed. Unknown names are
+    ignored, so condition fields that reference raw columns such as "close"
+    pass through untouched. Names qualified with a timeframe ("SMA_50@1d")
+    are computed on the resampled candles by compute_timeframe_indicators.
+    df may also be a screener.Panel (use_cache=False), in which case each
+    value is a bars x symbols frame. With compact=True indicators are stored
+    as float32 and the price aliases (COLUMN_ALIASES) are not copied at all;
+    conditions read the candle field they name instead.
+    """
+    cache = get_indicator_cache() if use_cache else None
+    fp = fingerprint(df) if cache is not None else None
+    values = {}
+
+    def value(name):
+        if name in values:
+            return values[name]
+        key = cache.make_key(fp, f"custom_strategy.{name}") if cache is not None else None
+        entry = cache.get(key) if cache is not None else None
+        if entry is not None:
+            values[name] = pd.Series(entry[name].copy(), index=df.index)
+            return values[name]
+        for dep in INDICATORS[name]["deps"]:
+            value(dep)
+        values[name] = INDICATORS[name]["fn"](df, values)
+        if cache is not None:
+            cache.put(key, {name: values[name].to_numpy()})
+        return values[name]
+
+    requested = set(names)
+    by_timeframe = {}
+    for name in sorted(requested):
+        base, timeframe = split_timeframe(name)
+        if timeframe:
+            by_timeframe.setdefault(timeframe, []).append(base)
+        elif name in INDICATORS and not (compact and name in COLUMN_ALIASES):
+            value(name)
+
+    # Assign in registry order so the column layout matches compute_all_indicators
+    for name in INDICATORS:
+        if name in requested and not name.startswith("_"):
+            if not compact:
+                df[name] = values[name]
+            elif name not in COLUMN_ALIASES:
+                df[name] = compact_values(values[name])
+    for timeframe, bases in sorted(by_timeframe.items()):
+        compute_timeframe_indicators(df, timeframe, bases, compact)
+    return df
+
+
+def _minutes(interval):
+    minutes = RESAMPLE_MINUTES[interval]
+    return 1440 if minutes is None else minutes
+
+
+def compute_timeframe_indicators(df, timeframe, names, compact=False):
+    """
+    Compute names on df's candles resampled to timeframe and join them back as "name@timeframe".
+
+    The join is as of each candle's close: a candle sees the last
+    timeframe bar that had completed by then, never the one it is inside,
+    so higher-timeframe conditions carry no look-ahead. Indicators are
+    computed once per timeframe bar and the join is a single searchsorted.
+
+    Raises:
+        ValueError: If timeframe is finer than df's own interval
+    """
+    interval = df.attrs.get("interval")
+    candles = df[OHLCV_COLUMNS]
+    if interval == timeframe:
+        frame, rows = candles.copy(), None
+    else:
+        if interval in RESAMPLE_MINUTES and _minutes(interval) > _minutes(timeframe):
+            raise ValueError(f"Condition timeframe {timeframe} is finer than the {interval} candles")
+        frame = resample_ohlcv(candles, timeframe)
+        rows = completed_rows(df["timestamp"].to_numpy(), timeframe, RESAMPLE_MINUTES.get(interval))
+    frame.attrs.update(df.attrs, interval=timeframe)
+    compute_indicators(frame, names)
+    for name in names:
+        if name in frame.columns:
+            values = frame[name].to_numpy(dtype=np.float64, na_value=np.nan)
+            values = values if rows is None else take_rows(values, rows)
+            df[qualify(name, timeframe)] = compact_values(values) if compact else values
     return df
 
 
-# Operator mapping for basic comparisons
-_BASIC_OPERATORS = {
-    "<": lambda a, b: a < b,
-    "<=": lambda a, b: a <= b,
-    ">": lambda a, b: a > b,
-    ">=": lambda a, b: a >= b,
-    "==": lambda a, b: a == b,
-    "!=": lambda a, b: a != b,
-}
+def compute_all_indicators(df):
+    """Compute all available indicators that users can use in custom strategies"""
+    return compute_indicators(df, [name for name in INDICATORS if not name.startswith("_")])
+
+
+def _bars_per(timeframe, interval):
+    """Candles of interval in one timeframe bar (a 1d bar is one session)."""
+    if timeframe not in RESAMPLE_MINUTES or interval not in RESAMPLE_MINUTES:
+        return 1
+    if RESAMPLE_MINUTES[timeframe] is None and RESAMPLE_MINUTES[interval] is not None:
+        session_minutes = (SESSION_END_UTC - SESSION_START_UTC) // pd.Timedelta(minutes=1)
+        return -(-session_minutes // RESAMPLE_MINUTES[interval])
+    return max(1, -(-_minutes(timeframe) // _minutes(interval)))
+
+
+def required_lookback(names, interval=None):
+    """
+    Trailing bars needed for the latest value of every named indicator (1 for raw columns).
+
+    Names qualified with a timeframe are counted in candles of interval,
+    plus one timeframe bar for the bucket still forming.
+    """
+    def bars(name):
+        base, timeframe = split_timeframe(name)
+        if timeframe:
+            return (bars(base) + 1) * _bars_per(timeframe, interval)
+        entry = INDICATORS.get(name)
+        if entry is None:
+            return 1
+        return entry["lookback"] + max((bars(dep) for dep in entry["deps"]), default=1) - 1
+    return max((bars(name) for name in names), default=1)
+
+
+def required_indicators(conditions, logic="AND"):
+    """Indicator names referenced by conditions (indicator and compare_to fields, nested groups included)."""
+    return list(compile_conditions(conditions, logic).columns)
 
 
 def evaluate_condition(df, condition):
@@ -115,96 +281,56 @@ def evaluate_condition(df, condition):
     
     Returns: boolean Series
     """
-    indicator = condition.get("indicator", "")
-    operator = condition.get("operator", ">")
-    value = condition.get("value")
-    compare_to = condition.get("compare_to")
-    
-    if indicator not in df.columns:
-        return pd.Series([False] * len(df), index=df.index)
-    
-    col = df[indicator]
-    
-    # Indicator comparison (e.g., RSI > SMA_20)
-    if compare_to and compare_to in df.columns:
-        compare_col = df[compare_to]
-        if operator in _BASIC_OPERATORS:
-            return _BASIC_OPERATORS[operator](col, compare_col)
-        elif operator == "crosses_above":
-            return (col > compare_col) & (col.shift(1) <= compare_col.shift(1))
-        elif operator == "crosses_below":
-            return (col < compare_col) & (col.shift(1) >= compare_col.shift(1))
-        return pd.Series([False] * len(df), index=df.index)
-    
-    # Cross operators (crosses above/below a value)
-    if operator == "crosses_above":
-        return (col > value) & (col.shift(1) <= value) if value is not None else pd.Series([False] * len(df), index=df.index)
-    elif operator == "crosses_below":
-        return (col < value) & (col.shift(1) >= value) if value is not None else pd.Series([False] * len(df), index=df.index)
-    
-    # Percentage change operators
-    if operator in ("pct_change", "pct_change_above"):
-        if value is None:
-            return pd.Series([False] * len(df), index=df.index)
-        return (col.pct_change() * 100) > value
-    elif operator == "pct_change_below":
-        if value is None:
-            return pd.Series([False] * len(df), index=df.index)
-        return (col.pct_change() * 100) < value
-    
-    # Basic comparison operators
-    if value is None or operator not in _BASIC_OPERATORS:
-        return pd.Series([False] * len(df), index=df.index)
-    
-    return _BASIC_OPERATORS[operator](col, float(value))
+    return pd.Series(compile_conditions([condition]).evaluate(df), index=df.index)
 
 
 def combine_conditions(df, conditions, logic="AND"):
     """
     Combine multiple conditions with AND or OR logic.
     
-    conditions: list of condition dicts
+    conditions: list of condition dicts, or nested {"logic": ..., "conditions": [...]} groups
     logic: "AND" or "OR"
     """
-    if not conditions:
-        return pd.Series([False] * len(df), index=df.index)
-    
-    results = [evaluate_condition(df, cond) for cond in conditions]
-    
-    if logic == "AND":
-        return pd.concat(results, axis=1).all(axis=1)
-    else:  # OR
-        return pd.concat(results, axis=1).any(axis=1)
+    return pd.Series(compile_conditions(conditions, logic).evaluate(df), index=df.index)
 
 
-def execute_custom_strategy(df, buy_conditions, sell_conditions, buy_logic="AND", sell_logic="AND"):
+def execute_custom_strategy(df, buy_conditions, sell_conditions, buy_logic="AND", sell_logic="AND",
+                            compact=COMPACT_FRAMES):
     """
     Execute a custom strategy based on user-defined buy and sell conditions.
     
+    Indicators referenced by the conditions that are not already columns of
+    df are computed on demand, so callers need not run compute_all_indicators.
+
     Args:
-        df: DataFrame with indicators computed
-        buy_conditions: list of condition dicts for buy signal
-        sell_conditions: list of condition dicts for sell signal
+        df: Candle DataFrame (indicators are computed as needed)
+        buy_conditions: list of condition dicts (or nested groups) for buy signal
+        sell_conditions: list of condition dicts (or nested groups) for sell signal
         buy_logic: "AND" or "OR" for combining buy conditions
         sell_logic: "AND" or "OR" for combining sell conditions
+        compact: Shallow-copy df instead of copying every column, and store
+            float32 indicators with an int8 signal (see compact.py)
     
     Returns:
         DataFrame with 'signal' and 'position' columns
     """
-    df = df.copy()
-    df["signal"] = 0
-    
-    # Evaluate buy conditions
-    if buy_conditions:
-        buy_mask = combine_conditions(df, buy_conditions, buy_logic)
-        df.loc[buy_mask, "signal"] = 1
-    
-    # Evaluate sell conditions
-    if sell_conditions:
-        sell_mask = combine_conditions(df, sell_conditions, sell_logic)
-        df.loc[sell_mask, "signal"] = -1
+    # Compiled plans are cached, so a repeated strategy skips parsing entirely
+    buy_plan = compile_conditions(buy_conditions, buy_logic)
+    sell_plan = compile_conditions(sell_conditions, sell_logic)
+
+    # A shallow copy shares the candle columns; new columns never touch the caller's frame
+    df = df.copy(deep=not compact)
+    needed = buy_plan.columns + sell_plan.columns
+    compute_indicators(df, [name for name in needed if name not in df.columns], compact=compact)
+    buy_mask, sell_mask = evaluate_strategy(df, buy_plan, sell_plan)
+
+    # Sell overrides buy on the same bar
+    signal = np.where(sell_mask, -1, np.where(buy_mask, 1, 0))
+    df["signal"] = signal.astype(SIGNAL_DTYPE if compact else np.int64)
     
     # Position is signal shifted by 1 (we act on next bar)
     df["position"] = df["signal"].shift(1)
+    if compact:
+        df["position"] = df["position"].astype(POSITION_DTYPE)
     
     return df
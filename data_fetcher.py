@@ -1,14 +1,47 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from growwapi import GrowwAPI
-from env import API_KEY, API_SECRET
+from growwapi.groww.exceptions import GrowwAPIAuthenticationException, GrowwAPIAuthorisationException
+from config import (
+    USE_CANDLE_STORE,
+    CANDLE_STORE_MAX_AGE_SECONDS,
+    FALLBACK_TO_MOCK_DATA,
+    GROWW_MAX_DAYS_PER_REQUEST,
+    RESAMPLE_BASE_INTERVAL,
+    RESAMPLE_DERIVED_INTERVALS,
+)
+from candle_store import get_candle_store
+from resample import get_timeframe_cache, session_timestamps
+from groww_client import get_groww_client, get_provider
+import metrics
 
-def generate_mock_data(days=365, seed=42):
-    """Generate mock stock data for testing"""
+_candle_request_latency = metrics.histogram(
+    "groww_candle_request_seconds", "Latency of Groww historical candle requests")
+_store_hits = metrics.counter("candle_store_hits_total", "Fetches served from stored candles without an API call")
+_store_refreshes = metrics.counter("candle_store_refreshes_total", "Fetches that called the API to refresh stored candles")
+metrics.gauge(
+    "candle_store_hit_ratio", "Share of candle store fetches served without an API call",
+    lambda: _store_hits.value / max(1, _store_hits.value + _store_refreshes.value),
+)
+
+VOLUME_LOW, VOLUME_HIGH = 1000000, 10000000
+
+
+def generate_mock_data(days=365, seed=42, freq='D'):
+    """
+    Generate mock stock data for testing.
+
+    Draws bar by bar from the legacy global RandomState, so a seed always
+    gives the same candles; use generate_synthetic_data for large fixtures.
+
+    Args:
+        days: Number of bars
+        seed: Random seed
+        freq: Bar spacing (pandas offset alias)
+    """
     np.random.seed(seed)
     
-    dates = pd.date_range(end=datetime.today(), periods=days, freq='D')
+    dates = pd.date_range(end=datetime.today(), periods=days, freq=freq)
     base_price = 20000
     trend = np.linspace(0, 2000, days)
     noise = np.random.normal(0, 500, days)
@@ -20,7 +53,7 @@ def generate_mock_data(days=365, seed=42):
         high = close * (1 + np.random.uniform(0, 0.02))
         low = close * (1 - np.random.uniform(0, 0.02))
         open_price = low + (high - low) * np.random.uniform(0.3, 0.7)
-        volume = np.random.randint(1000000, 10000000)
+        volume = np.random.randint(VOLUME_LOW, VOLUME_HIGH)
         
         data.append({
             'timestamp': date,
@@ -33,7 +66,185 @@ def generate_mock_data(days=365, seed=42):
     
     return pd.DataFrame(data)
 
-def fetch_historical_data(symbol, exchange="NSE", interval="1d", use_mock=False):
+
+def generate_synthetic_data(bars=365, seed=42, freq='1min'):
+    """
+    Vectorized mock candles with the same shape as generate_mock_data.
+
+    Uses its own numpy.random.default_rng stream, so values differ from
+    generate_mock_data for the same seed; meant for benchmarks and other
+    fixtures too large for the per-bar loop (1M bars in well under a second).
+
+    Args:
+        bars: Number of bars
+        seed: Random seed
+        freq: Bar spacing (pandas offset alias); the default fits 1M bars in
+            pandas' timestamp range
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(end=datetime.today(), periods=bars, freq=freq)
+    close = np.maximum(1000, 20000 + np.linspace(0, 2000, bars) + rng.normal(0, 500, bars))
+    high = close * (1 + rng.uniform(0, 0.02, bars))
+    low = close * (1 - rng.uniform(0, 0.02, bars))
+    open_price = low + (high - low) * rng.uniform(0.3, 0.7, bars)
+
+    return pd.DataFrame({
+        'timestamp': dates,
+        'open': np.round(open_price, 2),
+        'high': np.round(high, 2),
+        'low': np.round(low, 2),
+        'close': np.round(close, 2),
+        'volume': rng.integers(VOLUME_LOW, VOLUME_HIGH, bars),
+    })
+
+INTERVAL_MINUTES = {
+    "1m": 1,
+    "5m": 5,
+    "15m": 15,
+    "30m": 30,
+    "1h": 60,
+    "1d": 1440,
+}
+
+
+def request_candles(groww, groww_symbol, start_time, end_time, interval_minutes, exchange="NSE"):
+    """Request one range of candles and return them as a cleaned DataFrame (possibly empty)."""
+    groww_exchange = getattr(groww, f"EXCHANGE_{exchange.upper()}", None)
+    if groww_exchange is None:
+        raise ValueError(f"Unsupported exchange: {exchange}")
+    with _candle_request_latency.time():
+        response = groww.get_historical_candle_data(
+            trading_symbol=groww_symbol,
+            exchange=groww_exchange,
+            segment=groww.SEGMENT_CASH,
+            start_time=start_time,
+            end_time=end_time,
+            interval_in_minutes=interval_minutes
+        )
+
+    if not response or "candles" not in response:
+        raise ValueError(f"Invalid response from Groww API for {groww_symbol}")
+
+    df = pd.DataFrame(response["candles"] or [], columns=["timestamp", "open", "high", "low", "close", "volume"])
+    df["timestamp"] = pd.to_datetime(df["timestamp"], unit='s')
+    df = df.sort_values("timestamp").reset_index(drop=True)
+
+    for col in ["open", "high", "low", "close", "volume"]:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    return df.dropna().reset_index(drop=True)
+
+
+def chunk_ranges(start, end, interval="1d"):
+    """
+    Split [start, end] into consecutive ranges no longer than the API accepts for interval.
+
+    Returns:
+        list of (start, end) Timestamps
+    """
+    if interval not in GROWW_MAX_DAYS_PER_REQUEST:
+        raise ValueError(f"Unsupported interval: {interval}")
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    if end <= start:
+        raise ValueError("end must be after start")
+    step = pd.Timedelta(days=GROWW_MAX_DAYS_PER_REQUEST[interval])
+    chunks = []
+    while start < end:
+        chunks.append((start, min(start + step, end)))
+        start += step
+    return chunks
+
+
+def epoch_millis(ts):
+    """Epoch milliseconds string for a naive-UTC timestamp (unambiguous for the API)."""
+    return str(pd.Timestamp(ts).value // 1_000_000)
+
+
+def _fetch_via_store(store, groww_symbol, exchange, interval, interval_minutes, days):
+    """
+    Serve candles from the local store, fetching only the missing tail.
+
+    The full window is downloaded only when nothing (or too little history)
+    is stored yet; afterwards each refresh asks the API for candles from the
+    last stored timestamp onwards and merges them in.
+    """
+    now = pd.Timestamp.now(tz="UTC").tz_localize(None)
+    window_start = now - pd.Timedelta(days=days)
+    max_age = min(interval_minutes * 60, CANDLE_STORE_MAX_AGE_SECONDS)
+
+    stored = store.load(groww_symbol, exchange, interval)
+    age = store.age_seconds(groww_symbol, exchange, interval)
+    covers_window = (
+        stored is not None
+        and stored["timestamp"].iloc[0] <= window_start + pd.Timedelta(days=7)
+    )
+
+    if covers_window and age is not None and age < max_age:
+        _store_hits.inc()
+        print(f"Using stored {groww_symbol} candles ({len(stored)} bars)")
+    else:
+        _store_refreshes.inc()
+        try:
+            _refresh_store(store, groww_symbol, exchange, interval, interval_minutes, days,
+                           stored["timestamp"].iloc[-1] if covers_window else None, now)
+        except Exception as e:
+            if isinstance(e, (GrowwAPIAuthenticationException, GrowwAPIAuthorisationException)):
+                # Drop the rejected token so the next refresh logs in again
+                get_provider().invalidate()
+            if stored is None:
+                raise
+            print(f"❌ Could not refresh {groww_symbol} from Groww API: {str(e)}")
+            print(f"Serving stored candles for {groww_symbol}")
+
+    df = store.load(groww_symbol, exchange, interval, start=window_start)
+    if df is None or len(df) == 0:
+        raise ValueError(f"No valid data after cleaning for {groww_symbol}")
+    return df
+
+
+def _refresh_store(store, groww_symbol, exchange, interval, interval_minutes, days, last, now):
+    """
+    Download the full window (last is None) or the tail since last, and merge it into the store.
+
+    Ranges longer than one request allows for the interval (e.g. a year of
+    1-minute candles) are fetched in consecutive chunks.
+    """
+    groww = get_groww_client()
+    if last is not None:
+        print(f"Fetching {groww_symbol} candles since {last} from Groww API...")
+        start = last
+    else:
+        print(f"Fetching {groww_symbol} data from Groww API...")
+        start = now - pd.Timedelta(days=days)
+    chunks = chunk_ranges(start, now, interval) if interval in GROWW_MAX_DAYS_PER_REQUEST and now > start else [(start, now)]
+    parts = [
+        request_candles(groww, groww_symbol, epoch_millis(lo), epoch_millis(hi), interval_minutes, exchange)
+        for lo, hi in chunks
+    ]
+    tail = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+    if last is None and len(tail) == 0:
+        raise ValueError(f"No data returned for {groww_symbol}")
+
+    if len(tail):
+        store.merge(groww_symbol, tail, exchange, interval)
+        print(f"✅ Stored {len(tail)} new data points for {groww_symbol}")
+    else:
+        store.touch(groww_symbol, exchange, interval)
+
+
+def _tag(df, symbol, interval):
+    """Record what the candles are in df.attrs (used to key cached indicators)."""
+    df.attrs["symbol"] = symbol
+    df.attrs["interval"] = interval
+    return df
+
+
+def _tag_mock(df, symbol, interval):
+    df.attrs["mock"] = True
+    return _tag(df, symbol, interval)
+
+
+def fetch_historical_data(symbol, exchange="NSE", interval="1d", use_mock=False, days=365, store=None):
     """
     Fetch historical data from Groww API
     
@@ -42,69 +253,92 @@ def fetch_historical_data(symbol, exchange="NSE", interval="1d", use_mock=False)
         exchange: Exchange name (default: "NSE")
         interval: Time interval (default: "1d" for daily)
         use_mock: If True, use mock data instead of API
+        days: Length of the history window in days
+        store: CandleStore to serve and persist candles (default: the shared
+            store when config.USE_CANDLE_STORE is set)
     
     Returns:
         pandas.DataFrame with columns: timestamp, open, high, low, close, volume
     """
     if use_mock:
         print(f"Using mock data for {symbol}")
-        return generate_mock_data()
+        return _tag_mock(generate_mock_data(), symbol, interval)
     
     try:
         # Groww expects plain symbols (e.g. RELIANCE), strip .NS/.BO if present
         groww_symbol = symbol.split(".")[0] if "." in symbol else symbol
+        interval_minutes = INTERVAL_MINUTES.get(interval, 1440)
+
+        if store is None and USE_CANDLE_STORE:
+            store = get_candle_store()
+        if store is not None:
+            return _tag(
+                _fetch_via_store(store, groww_symbol, exchange, interval, interval_minutes, days),
+                groww_symbol, interval,
+            )
         
-        # Obtain access token from API key + secret
-        token = GrowwAPI.get_access_token(API_KEY, secret=API_SECRET)
-        groww = GrowwAPI(token)
+        # Shared client; the access token is reused until near expiry
+        groww = get_groww_client()
         
         end_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        start_time = (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d %H:%M:%S")
-        
-        interval_map = {
-            "1m": 1,
-            "5m": 5,
-            "15m": 15,
-            "30m": 30,
-            "1h": 60,
-            "1d": 1440,
-        }
-        interval_minutes = interval_map.get(interval, 1440)
+        start_time = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
         
         print(f"Fetching {groww_symbol} data from Groww API...")
         
-        response = groww.get_historical_candle_data(
-            trading_symbol=groww_symbol,
-            exchange=groww.EXCHANGE_NSE,
-            segment=groww.SEGMENT_CASH,
-            start_time=start_time,
-            end_time=end_time,
-            interval_in_minutes=interval_minutes
-        )
-        
-        if not response or "candles" not in response:
-            raise ValueError(f"Invalid response from Groww API for {groww_symbol}")
-        
-        candles = response["candles"]
-        if not candles or len(candles) == 0:
-            raise ValueError(f"No data returned for {groww_symbol}")
-        
-        df = pd.DataFrame(candles, columns=["timestamp", "open", "high", "low", "close", "volume"])
-        df["timestamp"] = pd.to_datetime(df["timestamp"], unit='s')
-        df = df.sort_values("timestamp").reset_index(drop=True)
-        
-        for col in ["open", "high", "low", "close", "volume"]:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        df = df.dropna()
+        df = request_candles(groww, groww_symbol, start_time, end_time, interval_minutes, exchange)
         
         if len(df) == 0:
             raise ValueError(f"No valid data after cleaning for {groww_symbol}")
         
         print(f"✅ Successfully fetched {len(df)} data points for {groww_symbol}")
-        return df
+        return _tag(df, groww_symbol, interval)
         
     except Exception as e:
+        if isinstance(e, (GrowwAPIAuthenticationException, GrowwAPIAuthorisationException)):
+            get_provider().invalidate()
         print(f"❌ Error fetching data from Groww API for {symbol}: {str(e)}")
+        if not FALLBACK_TO_MOCK_DATA:
+            raise
         print(f"Falling back to mock data for {symbol}")
-        return generate_mock_data()
+        return _tag_mock(generate_mock_data(), symbol, interval)
+
+
+def generate_mock_session_data(days=365, interval="1m", seed=42):
+    """Mock candles of interval on weekday NSE sessions (09:15-15:30 IST) over the last `days` days."""
+    minutes = INTERVAL_MINUTES[interval]
+    timestamps = session_timestamps(max(1, days * 5 // 7), minutes)
+    df = generate_synthetic_data(bars=len(timestamps), seed=seed)
+    df["timestamp"] = timestamps
+    return df
+
+
+def fetch_interval_data(symbol, interval="1d", exchange="NSE", use_mock=False, days=365, store=None):
+    """
+    Candles for any interval, deriving RESAMPLE_DERIVED_INTERVALS from the base interval.
+
+    Only RESAMPLE_BASE_INTERVAL candles are downloaded (and stored); derived
+    intervals are aggregated from them by resample.py and cached, so
+    switching timeframe never calls the API and new base candles only
+    re-aggregate the buckets they fall in. Other intervals are fetched as is.
+
+    Args:
+        symbol, exchange, use_mock, days, store: As for fetch_historical_data
+        interval: Target interval (e.g. "5m", "1h", "1d")
+
+    Returns:
+        pandas.DataFrame with columns: timestamp, open, high, low, close, volume
+    """
+    if interval not in RESAMPLE_DERIVED_INTERVALS or interval == RESAMPLE_BASE_INTERVAL:
+        return fetch_historical_data(symbol, exchange, interval, use_mock, days, store)
+
+    base = None if use_mock else fetch_historical_data(symbol, exchange, RESAMPLE_BASE_INTERVAL, days=days, store=store)
+    mock = base is None or base.attrs.get("mock", False)
+    if mock:
+        print(f"Using mock {RESAMPLE_BASE_INTERVAL} session data for {symbol}")
+        base = generate_mock_session_data(days, RESAMPLE_BASE_INTERVAL)
+    name = symbol if mock else base.attrs.get("symbol", symbol)
+    df = get_timeframe_cache().frame((name, exchange, RESAMPLE_BASE_INTERVAL, mock), base, interval)
+    if len(df) == 0:
+        raise ValueError(f"No {interval} candles could be derived for {symbol}")
+    print(f"✅ Derived {len(df)} {interval} candles for {name} from {len(base)} {RESAMPLE_BASE_INTERVAL} candles")
+    return _tag(df, name, interval)
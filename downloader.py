@@ -0,0 +1,346 @@
+"""
+Bulk Historical Downloader
+Fetches long candle histories in API-sized chunks, concurrently under a shared rate limit, into the candle store
+"""
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from growwapi.groww.exceptions import GrowwAPIAuthenticationException, GrowwAPIAuthorisationException
+
+from config import (
+    AVAILABLE_STOCKS,
+    CANDLE_STORE_DIR,
+    GROWW_MAX_DAYS_PER_REQUEST,
+    DOWNLOAD_RATE_PER_SECOND,
+    DOWNLOAD_BURST,
+    DOWNLOAD_WORKERS,
+    DOWNLOAD_MAX_RETRIES,
+    DOWNLOAD_BACKOFF_SECONDS,
+    DOWNLOAD_HOLIDAYS,
+)
+from candle_store import CandleStore, get_candle_store
+from data_fetcher import INTERVAL_MINUTES, request_candles, epoch_millis, chunk_ranges
+from groww_client import get_groww_client, get_provider
+from resample import SESSION_START_UTC, SESSION_END_UTC
+import metrics
+
+_requests = metrics.counter("download_requests_total", "Candle chunk requests made by the bulk downloader")
+_retries = metrics.counter("download_retries_total", "Candle chunk requests retried after an error")
+_failed_chunks = metrics.counter("download_failed_chunks_total", "Candle chunks given up on after all retries")
+_throttle_wait = metrics.histogram(
+    "download_throttle_seconds", "Time download requests waited on the rate limiter")
+
+IST_OFFSET = pd.Timedelta(hours=5, minutes=30)  # Candles are grouped into sessions by their IST date
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` requests per second with bursts of up to `capacity`.
+
+    clock and sleep are injectable so tests can run without real waiting.
+    """
+
+    def __init__(self, rate=DOWNLOAD_RATE_PER_SECOND, capacity=DOWNLOAD_BURST, clock=time.monotonic,
+                 sleep=time.sleep):
+        if rate <= 0 or capacity < 1:
+            raise ValueError("rate must be positive and capacity at least 1")
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be made. Returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+            waited += wait
+
+
+def expected_sessions(start, end, holidays=DOWNLOAD_HOLIDAYS):
+    """
+    Weekday session dates whose whole session lies in [start, end], minus holidays.
+
+    Sessions cut off by start or end are left out, so a range starting or
+    ending mid-session never expects a candle that could not be in it.
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    days = pd.bdate_range(start.normalize(), end.normalize())
+    days = days[(days + SESSION_START_UTC >= start) & (days + SESSION_END_UTC <= end)]
+    return days.difference(pd.DatetimeIndex(pd.to_datetime(list(holidays))))
+
+
+def find_gaps(timestamps, start, end, interval="1d", holidays=DOWNLOAD_HOLIDAYS):
+    """
+    Stretches of [start, end] with no candles where the market should have traded.
+
+    Every weekday session (see expected_sessions) must have at least one
+    candle, so a single missing session is reported; consecutive missing
+    sessions form one gap. Intraday candles must also be one interval apart
+    within a session.
+
+    Returns:
+        list of {"start", "end"} Timestamps bounding each gap (exclusive): the
+        candles either side of it, or start/end at the edges
+    """
+    ts = pd.DatetimeIndex(pd.to_datetime(timestamps)).sort_values()
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    sessions = expected_sessions(start, end, holidays)
+    present = (ts + IST_OFFSET).normalize()
+    missing = ~sessions.isin(present)
+
+    gaps = []
+    # Runs of missing sessions with no traded session between them
+    run_starts = np.flatnonzero(missing & ~np.concatenate(([False], missing[:-1])))
+    run_ends = np.flatnonzero(missing & ~np.concatenate((missing[1:], [False])))
+    for first, last in zip(run_starts, run_ends):
+        # Last candle of an earlier IST day and first candle of a later one
+        before = ts.searchsorted(sessions[first] - IST_OFFSET, side="left")
+        after = ts.searchsorted(sessions[last] + pd.Timedelta(days=1) - IST_OFFSET, side="left")
+        gaps.append({
+            "start": ts[before - 1] if before > 0 else start,
+            "end": ts[after] if after < len(ts) else end,
+        })
+
+    if interval != "1d" and len(ts) > 1:
+        step = ts[1:] - ts[:-1]
+        same_day = present[1:] == present[:-1]
+        for i in np.flatnonzero(same_day & (step > pd.Timedelta(minutes=INTERVAL_MINUTES[interval]))):
+            gaps.append({"start": ts[i], "end": ts[i + 1]})
+    return sorted(gaps, key=lambda gap: gap["start"])
+
+
+class BulkDownloader:
+    """
+    Downloads many symbols' history chunk by chunk into a CandleStore.
+
+    Args:
+        client: Object with the Groww SDK's get_historical_candle_data (default:
+            the shared get_groww_client(); pass a FakeGrowwClient for tests)
+        store: CandleStore to write into (default: the shared store)
+        rate / burst: Token-bucket limit shared by all workers
+        max_workers: Concurrent requests
+        max_retries: Retries per chunk, with exponential backoff and jitter
+        backoff: First retry delay in seconds
+        sleep: Injectable sleep for the limiter and backoff
+    """
+
+    def __init__(self, client=None, store=None, rate=DOWNLOAD_RATE_PER_SECOND, burst=DOWNLOAD_BURST,
+                 max_workers=DOWNLOAD_WORKERS, max_retries=DOWNLOAD_MAX_RETRIES,
+                 backoff=DOWNLOAD_BACKOFF_SECONDS, sleep=time.sleep):
+        self._client = client
+        self.store = store if store is not None else get_candle_store()
+        self.limiter = TokenBucket(rate, burst, sleep=sleep)
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._sleep = sleep
+
+    def fetch_chunk(self, symbol, start, end, interval="1d", exchange="NSE"):
+        """One rate-limited chunk request, retried on any error. Raises after the last retry."""
+        for attempt in range(self.max_retries + 1):
+            _throttle_wait.observe(self.limiter.acquire())
+            _requests.inc()
+            try:
+                return request_candles(
+                    self._client or get_groww_client(), symbol,
+                    epoch_millis(start), epoch_millis(end), INTERVAL_MINUTES[interval], exchange,
+                )
+            except Exception as e:
+                if self._client is None and isinstance(
+                        e, (GrowwAPIAuthenticationException, GrowwAPIAuthorisationException)):
+                    get_provider().invalidate()
+                if attempt == self.max_retries:
+                    raise
+                _retries.inc()
+                self._sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+
+    def download(self, symbols, start, end, interval="1d", exchange="NSE", on_symbol=None):
+        """
+        Download [start, end] of every symbol into the store.
+
+        Chunks of all symbols are fetched concurrently; each symbol is merged
+        into the store once all of its chunks are back. Failed chunks are not
+        filled with anything; they show up in the report and as gaps.
+
+        Args:
+            on_symbol: Optional callback(report) as each symbol finishes
+
+        Returns:
+            dict of symbol -> {"symbol", "interval", "chunks", "bars", "stored",
+            "failed_chunks": [{"start", "end", "error"}], "gaps": [{"start", "end"}]}
+        """
+        chunks = chunk_ranges(start, end, interval)
+        pending = {symbol: len(chunks) for symbol in symbols}
+        frames = {symbol: [] for symbol in symbols}
+        reports = {
+            symbol: {"symbol": symbol, "interval": interval, "chunks": len(chunks), "bars": 0,
+                     "stored": 0, "failed_chunks": [], "gaps": []}
+            for symbol in symbols
+        }
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {
+                pool.submit(self.fetch_chunk, symbol, lo, hi, interval, exchange): (symbol, lo, hi)
+                for symbol in symbols for lo, hi in chunks
+            }
+            for future in as_completed(futures):
+                symbol, lo, hi = futures[future]
+                try:
+                    df = future.result()
+                    if len(df):
+                        frames[symbol].append(df)
+                except Exception as e:
+                    _failed_chunks.inc()
+                    reports[symbol]["failed_chunks"].append({"start": lo, "end": hi, "error": str(e)})
+                pending[symbol] -= 1
+                if pending[symbol] == 0:
+                    self._finish(reports[symbol], frames.pop(symbol), start, end, exchange)
+                    if on_symbol:
+                        on_symbol(reports[symbol])
+        return reports
+
+    def _finish(self, report, frames, start, end, exchange):
+        """Merge a symbol's chunks into the store and record what is still missing."""
+        symbol, interval = report["symbol"], report["interval"]
+        report["failed_chunks"].sort(key=lambda chunk: chunk["start"])
+        if frames:
+            df = pd.concat(frames, ignore_index=True)
+            report["bars"] = int(df["timestamp"].nunique())
+            report["stored"] = self.store.merge(symbol, df, exchange, interval)
+        stored = self.store.load(symbol, exchange, interval, start=start, end=end)
+        report["gaps"] = find_gaps(
+            stored["timestamp"] if stored is not None else [], start, end, interval
+        )
+
+
+class FakeGrowwClient:
+    """
+    Offline stand-in for the Groww SDK's historical candle endpoint.
+
+    Serves deterministic weekday candles for the 09:15-15:30 IST session
+    (timestamps in UTC epoch seconds, like the API), rejects ranges longer
+    than the per-interval limit, and can fail requests or leave ranges
+    empty to exercise retries and gap reports.
+
+    Args:
+        fail_rate: Probability a request raises ConnectionError
+        missing: List of (start, end) ranges that never return candles
+        seed: Seed for the failure draws
+    """
+
+    EXCHANGE_NSE = "NSE"
+    EXCHANGE_BSE = "BSE"
+    SEGMENT_CASH = "CASH"
+
+    def __init__(self, fail_rate=0.0, missing=(), seed=0):
+        self.fail_rate = fail_rate
+        self.missing = [(pd.Timestamp(lo), pd.Timestamp(hi)) for lo, hi in missing]
+        self.calls = []
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def get_historical_candle_data(self, trading_symbol, exchange, segment, start_time, end_time,
+                                   interval_in_minutes):
+        start, end = _parse_time(start_time), _parse_time(end_time)
+        interval = next(k for k, v in INTERVAL_MINUTES.items() if v == interval_in_minutes)
+        with self._lock:
+            self.calls.append((trading_symbol, start, end, interval))
+            fail = self._rng.random() < self.fail_rate
+        if end - start > pd.Timedelta(days=GROWW_MAX_DAYS_PER_REQUEST[interval]):
+            raise ValueError(f"Range too long for {interval}: {start} - {end}")
+        if fail:
+            raise ConnectionError("Simulated Groww API failure")
+
+        days = pd.date_range(start.normalize(), end.normalize(), freq="B")
+        if interval == "1d":
+            ts = days + SESSION_START_UTC
+        else:
+            offsets = pd.timedelta_range(SESSION_START_UTC, SESSION_END_UTC, freq=f"{interval_in_minutes}min",
+                                         closed="left")
+            ts = pd.DatetimeIndex((days.values[:, None] + offsets.values[None, :]).ravel())
+        keep = (ts >= start) & (ts <= end)
+        for lo, hi in self.missing:
+            keep &= ~((ts >= lo) & (ts <= hi))
+        ts = ts[keep]
+
+        seconds = ts.values.astype("datetime64[s]").astype(np.int64)
+        # Smooth deterministic prices, so overlapping requests agree bar for bar
+        name_offset = sum(map(ord, trading_symbol)) % 97
+        close = 20000 * (1 + 0.1 * np.sin(seconds / 5e6 + name_offset)) + 50 * np.sin(seconds / 7e3)
+        open_ = close - 20 * np.cos(seconds / 3e3)
+        high = np.maximum(open_, close) + 15
+        low = np.minimum(open_, close) - 15
+        volume = 1000000 + (seconds % 9000000)
+        columns = [seconds] + [np.round(values, 2) for values in (open_, high, low, close)] + [volume]
+        return {"candles": [list(row) for row in zip(*(c.tolist() for c in columns))]}
+
+
+def _parse_time(value):
+    """Epoch-millisecond string (as the downloader sends) or 'YYYY-mm-dd HH:MM:SS' to a naive UTC Timestamp."""
+    value = str(value)
+    return pd.to_datetime(int(value), unit="ms") if value.isdigit() else pd.Timestamp(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download candle history into the local candle store")
+    parser.add_argument("--symbols", help="Comma-separated symbols (default: config.AVAILABLE_STOCKS)")
+    parser.add_argument("--interval", default="1d", choices=list(GROWW_MAX_DAYS_PER_REQUEST))
+    parser.add_argument("--days", type=int, default=5 * 365, help="History to download, ending now")
+    parser.add_argument("--start", help="Start date (overrides --days)")
+    parser.add_argument("--end", help="End date (default: now)")
+    parser.add_argument("--workers", type=int, default=DOWNLOAD_WORKERS)
+    parser.add_argument("--rate", type=float, default=DOWNLOAD_RATE_PER_SECOND, help="Requests per second")
+    parser.add_argument("--store-dir", help=f"Candle store root (default: {CANDLE_STORE_DIR})")
+    parser.add_argument("--fake", action="store_true",
+                        help="Use the offline FakeGrowwClient (store defaults to data/candles_fake)")
+    args = parser.parse_args()
+
+    symbols = [s.strip() for s in args.symbols.split(",")] if args.symbols else [
+        s["symbol"] for s in AVAILABLE_STOCKS]
+    end = pd.Timestamp(args.end) if args.end else pd.Timestamp.now(tz="UTC").tz_localize(None)
+    start = pd.Timestamp(args.start) if args.start else end - pd.Timedelta(days=args.days)
+    store_dir = args.store_dir or ("data/candles_fake" if args.fake else None)
+    store = CandleStore(store_dir) if store_dir else get_candle_store()
+
+    downloader = BulkDownloader(
+        client=FakeGrowwClient() if args.fake else None, store=store, rate=args.rate,
+        burst=max(1, int(args.rate)), max_workers=args.workers,
+    )
+    n_chunks = len(chunk_ranges(start, end, args.interval))
+    print(f"\n📥 Downloading {len(symbols)} symbols | {args.interval} | {start:%Y-%m-%d} to {end:%Y-%m-%d} "
+          f"| {n_chunks} chunks each")
+
+    def report(r):
+        status = "❌" if r["failed_chunks"] else "✅"
+        print(f"{status} {r['symbol']}: {r['bars']} bars fetched, {r['stored']} stored, "
+              f"{len(r['failed_chunks'])} failed chunks, {len(r['gaps'])} gaps")
+        for gap in r["gaps"]:
+            print(f"    gap {gap['start']} -> {gap['end']}")
+        for chunk in r["failed_chunks"]:
+            print(f"    failed {chunk['start']} -> {chunk['end']}: {chunk['error']}")
+
+    started = time.perf_counter()
+    reports = downloader.download(symbols, start, end, args.interval, on_symbol=report)
+    failed = sum(1 for r in reports.values() if r["failed_chunks"])
+    print(f"\n⏱  {time.perf_counter() - started:.1f}s | {len(reports) - failed}/{len(reports)} symbols complete")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Execution Model
+Intrabar stops and take-profits, open or close fills, slippage, Indian equity costs and short selling over arrays
+"""
+import math
+
+import numpy as np
+
+from backtest import entry_quantity
+from config import EXECUTION_FILL, SLIPPAGE_BPS, DEFAULT_COST_SCHEDULE, COST_SCHEDULES
+
+try:
+    from numba import njit
+except ImportError:
+    # numba not installed, the kernel runs as a plain Python loop over arrays
+    njit = None
+
+FILL_MODES = ("close", "open")
+
+
+def transaction_costs(prices, qtys, sides, schedule):
+    """
+    Charges for each order under a cost schedule.
+
+    Args:
+        prices, qtys: Arrays of fill prices and quantities
+        sides: Array of 1 (buy) / -1 (sell)
+        schedule: Dict of rates (see config.COST_SCHEDULES), or None
+
+    Returns:
+        float64 array: brokerage + STT + exchange/SEBI fees + GST + stamp duty per order
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    if not schedule:
+        return np.zeros(len(prices))
+    turnover = prices * np.asarray(qtys, dtype=np.float64)
+    buy = np.asarray(sides) == 1
+    brokerage = np.clip(turnover * schedule["brokerage_pct"], schedule["brokerage_min"], schedule["brokerage_max"])
+    stt = turnover * np.where(buy, schedule["stt_buy_pct"], schedule["stt_sell_pct"])
+    fees = turnover * (schedule["exchange_pct"] + schedule["sebi_pct"])
+    gst = (brokerage + fees) * schedule["gst_pct"]
+    stamp = np.where(buy, turnover * schedule["stamp_buy_pct"], 0.0)
+    return brokerage + stt + fees + gst + stamp
+
+
+class ExecutionModel:
+    """
+    How orders are filled and charged in a backtest.
+
+    Args:
+        fill: 'close' fills signal orders at the bar close (the original
+            behaviour); 'open' fills them at the bar's open. The position
+            column is the previous bar's signal, so 'open' is the first
+            price available after the signal
+        intrabar: Check stop-loss and take-profit against each bar's low/high
+            (filling at the level, or at the open when it gaps through)
+            instead of only the close
+        slippage_bps: Adverse slippage on every fill, in basis points
+        costs: Key of config.COST_SCHEDULES, a schedule dict, or None
+        allow_short: Open a short on a sell signal while flat, and reverse
+            on opposite signals (intraday schedule for Indian cash equity)
+
+    stop_loss_pct keeps the original engine's meaning: a long exits once its
+    value falls below that fraction of the entry value (a short mirrors it),
+    so ExecutionModel(costs=None) with the defaults reproduces the original
+    engine's trades.
+    """
+
+    def __init__(self, fill=EXECUTION_FILL, intrabar=False, slippage_bps=SLIPPAGE_BPS,
+                 costs=DEFAULT_COST_SCHEDULE, allow_short=False):
+        if fill not in FILL_MODES:
+            raise ValueError(f"fill must be one of {', '.join(FILL_MODES)}")
+        if isinstance(costs, str):
+            if costs not in COST_SCHEDULES:
+                raise ValueError(f"Unknown cost schedule: {costs}")
+            costs = COST_SCHEDULES[costs]
+        slippage_bps = float(slippage_bps)
+        if not math.isfinite(slippage_bps) or slippage_bps < 0:
+            raise ValueError("slippage_bps must be a non-negative number")
+        self.fill = fill
+        self.intrabar = bool(intrabar)
+        self.slippage = slippage_bps / 10000
+        self.costs = costs
+        self.allow_short = bool(allow_short)
+
+    @classmethod
+    def from_options(cls, options):
+        """
+        Build a model from request/CLI options: fill, intrabar, slippage_bps, costs, shorts.
+
+        Returns None when options is empty, so callers keep the original engine.
+        Raises ValueError on an invalid option.
+        """
+        if not options:
+            return None
+        flag = lambda value: str(value).lower() in ("1", "true", "yes", "on")
+        try:
+            slippage = float(options.get("slippage_bps") or 0)
+        except (TypeError, ValueError):
+            raise ValueError("slippage_bps must be a number")
+        return cls(
+            fill=options.get("fill") or EXECUTION_FILL,
+            intrabar=flag(options.get("intrabar", False)),
+            slippage_bps=slippage,
+            costs=options.get("costs") or None,
+            allow_short=flag(options.get("shorts", False)),
+        )
+
+    def simulate(self, open_, high, low, close, position_signal, capital, exit_rules=None, leverage=1,
+                 stop_loss_pct=0.10):
+        """
+        Run the backtest state machine under this model.
+
+        Args:
+            open_, high, low, close: float64 price arrays
+            position_signal: float64 array of positions (1 buy, -1 sell, NaN/0 none)
+            capital, exit_rules, leverage: As for backtest.backtest_strategy
+            stop_loss_pct: As for backtest.backtest_strategy
+
+        Returns:
+            tuple: (final_value, pnl, fills) with fills as
+            (bar_index, side, price, qty, cost), price including slippage
+        """
+        exit_rules = exit_rules or {}
+        take_profit = exit_rules.get("take_profit_rs")
+        hold_max_days = exit_rules.get("hold_max_days")
+        use_exit_rules = take_profit is not None and hold_max_days is not None
+        leverage = max(1, int(leverage))
+
+        kernel = _execute_jit or _execute_kernel
+        index, side, qty, raw_price, count = kernel(
+            open_, high, low, close, position_signal, float(leverage * capital), leverage,
+            float(stop_loss_pct), use_exit_rules, float(take_profit) if use_exit_rules else 0.0,
+            use_exit_rules and hold_max_days == 1, self.fill == "open", self.intrabar, self.allow_short,
+        )
+        index, side, qty = index[:count], side[:count], qty[:count]
+        price = raw_price[:count] * (1 + self.slippage * side)
+        cost = transaction_costs(price, qty, side, self.costs)
+
+        signed = side * qty
+        cash = capital - float(np.sum(signed * price)) - float(np.sum(cost))
+        position = int(signed.sum())
+        final_value = cash + position * close[-1]
+        fills = [
+            (int(i), int(s), float(p), int(q), float(c))
+            for i, s, p, q, c in zip(index, side, price, qty, cost)
+        ]
+        return final_value, final_value - capital, fills
+
+
+def _protective_exit(direction, entry, stop_loss_pct, use_take_profit, take_profit, o, h, l, c, intrabar):
+    """Stop-loss / take-profit exit price for a position on one bar, or NaN if neither triggers."""
+    # A long stops below stop_loss_pct of its entry, a short the same distance above
+    stop = entry * stop_loss_pct if direction > 0 else entry * (2 - stop_loss_pct)
+    target = entry + direction * take_profit
+    if not intrabar:
+        if direction * (c - stop) < 0 or (use_take_profit and direction * (c - target) >= 0):
+            return c
+        return math.nan
+    # Assume the adverse extreme comes first when both levels are inside the bar
+    worst = l if direction > 0 else h
+    best = h if direction > 0 else l
+    if direction * (o - stop) < 0:
+        return o
+    if direction * (worst - stop) < 0:
+        return stop
+    if use_take_profit:
+        if direction * (o - target) >= 0:
+            return o
+        if direction * (best - target) >= 0:
+            return target
+    return math.nan
+
+
+def _execute_kernel(open_, high, low, close, position_signal, buying_power, leverage, stop_loss_pct,
+                    use_exit_rules, take_profit, exit_next_bar, fill_open, intrabar, allow_short):
+    """Bar-by-bar state machine with signed positions; compiled with numba when available."""
+    n = close.shape[0]
+    index = np.empty(2 * n, np.int64)
+    side = np.empty(2 * n, np.int64)
+    qty_out = np.empty(2 * n, np.int64)
+    price_out = np.empty(2 * n, np.float64)
+    count = 0
+    position = 0
+    entry = 0.0
+    entry_bar = -1
+
+    for i in range(1, n):
+        pos_signal = position_signal[i]
+        want = 1 if pos_signal == 1 else (-1 if pos_signal == -1 else 0)
+        exited = False
+
+        for step in range(2):
+            protective = (step == 0) != fill_open
+            if protective:
+                # Close fills: exits from earlier bars come first; open fills: the
+                # position held after the open is exposed to the rest of the bar
+                if position == 0 or exited:
+                    continue
+                direction = 1 if position > 0 else -1
+                exit_price = _protective_exit(
+                    direction, entry, stop_loss_pct, use_exit_rules, take_profit,
+                    open_[i], high[i], low[i], close[i], intrabar,
+                )
+                if not math.isnan(exit_price):
+                    index[count] = i
+                    side[count] = -direction
+                    qty_out[count] = abs(position)
+                    price_out[count] = exit_price
+                    count += 1
+                    position = 0
+                    exited = True
+                continue
+
+            if exited:
+                continue
+            price = open_[i] if fill_open else close[i]
+            reverse = False
+            if position != 0:
+                direction = 1 if position > 0 else -1
+                if use_exit_rules:
+                    should_exit = exit_next_bar and entry_bar < i
+                else:
+                    should_exit = want == -direction
+                    reverse = should_exit and allow_short
+                if not should_exit:
+                    continue
+                index[count] = i
+                side[count] = -direction
+                qty_out[count] = abs(position)
+                price_out[count] = price
+                count += 1
+                position = 0
+                if not reverse:
+                    continue
+            if want == 0 or (want == -1 and not allow_short):
+                continue
+            qty = entry_quantity(price, buying_power, leverage)
+            if qty < 1:
+                continue
+            position = want * qty
+            entry = price
+            entry_bar = i
+            index[count] = i
+            side[count] = want
+            qty_out[count] = qty
+            price_out[count] = price
+            count += 1
+
+    return index, side, qty_out, price_out, count
+
+
+if njit is not None:
+    _protective_exit = njit(cache=True)(_protective_exit)
+    _execute_jit = njit(cache=True)(_execute_kernel)
+else:
+    _execute_jit = None
@@ -0,0 +1,144 @@
+"""
+Shared Groww API Client
+Caches the access token until near expiry and reuses one GrowwAPI client across requests
+"""
+import base64
+import json
+import threading
+import time
+
+from growwapi import GrowwAPI
+
+from env import API_KEY, API_SECRET
+from config import GROWW_TOKEN_TTL_SECONDS, GROWW_TOKEN_REFRESH_MARGIN_SECONDS
+import metrics
+
+_token_refreshes = metrics.counter(
+    "groww_token_refreshes_total", "Access tokens obtained from the Groww API")
+_token_refresh_failures = metrics.counter(
+    "groww_token_refresh_failures_total", "Failed access token requests")
+_client_reuses = metrics.counter(
+    "groww_client_reuses_total", "Requests served by the cached Groww client")
+_auth_latency = metrics.histogram(
+    "groww_auth_latency_seconds", "Time to obtain a token and build a Groww client")
+
+
+def token_expiry(token, default_ttl=GROWW_TOKEN_TTL_SECONDS):
+    """Epoch seconds at which token expires: the JWT 'exp' claim, else now + default_ttl."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        if exp:
+            return float(exp)
+    except (AttributeError, IndexError, ValueError):
+        pass
+    return time.time() + default_ttl
+
+
+class GrowwClientProvider:
+    """
+    Thread-safe provider of an authenticated GrowwAPI client.
+
+    The first caller authenticates synchronously; afterwards the same client
+    is handed out until the token is within refresh_margin of expiry, at
+    which point one background thread fetches a new token while callers keep
+    using the current client. An expired token is refreshed synchronously.
+    """
+
+    def __init__(self, api_key=API_KEY, api_secret=API_SECRET,
+                 refresh_margin=GROWW_TOKEN_REFRESH_MARGIN_SECONDS, client_factory=GrowwAPI):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.refresh_margin = refresh_margin
+        self.client_factory = client_factory
+        self._client = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_flag_lock = threading.Lock()
+        self._refreshing = False
+
+    def get_client(self):
+        """Return the shared client, authenticating or refreshing as needed."""
+        now = time.time()
+        client = self._client
+        if client is not None and now < self._expires_at - self.refresh_margin:
+            _client_reuses.inc()
+            return client
+
+        if client is not None and now < self._expires_at:
+            self._refresh_in_background()
+            _client_reuses.inc()
+            return client
+
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self._client is None or time.time() >= self._expires_at:
+                self._refresh()
+            return self._client
+
+    def invalidate(self):
+        """Drop the cached client, e.g. after the API rejected its token."""
+        with self._lock:
+            self._client = None
+            self._expires_at = 0.0
+
+    def _refresh(self):
+        start = time.perf_counter()
+        try:
+            token = self.client_factory.get_access_token(self.api_key, secret=self.api_secret)
+            client = self.client_factory(token)
+        except Exception:
+            _token_refresh_failures.inc()
+            raise
+        _auth_latency.observe(time.perf_counter() - start)
+        _token_refreshes.inc()
+        self._client = client
+        self._expires_at = token_expiry(token)
+
+    def _refresh_in_background(self):
+        with self._refresh_flag_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                with self._lock:
+                    self._refresh()
+            except Exception as e:
+                print(f"❌ Background Groww token refresh failed: {str(e)}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="groww-token-refresh", daemon=True).start()
+
+    def stats(self):
+        """Token refresh and auth latency metrics for this process."""
+        latency = _auth_latency.snapshot()
+        return {
+            "token_refreshes": _token_refreshes.value,
+            "token_refresh_failures": _token_refresh_failures.value,
+            "client_reuses": _client_reuses.value,
+            "auth_latency_mean_s": round(latency["mean"], 4),
+            "auth_latency_total_s": round(latency["sum"], 4),
+            "token_expires_in_s": max(0, round(self._expires_at - time.time())),
+        }
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    """Process-wide GrowwClientProvider."""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = GrowwClientProvider()
+        return _provider
+
+
+def get_groww_client():
+    """Shared authenticated GrowwAPI client."""
+    return get_provider().get_client()
@@ -0,0 +1,231 @@
+"""
+Indicator Result Cache
+In-process LRU (with optional disk tier) for indicator columns, keyed by candle fingerprint and parameters
+"""
+import functools
+import hashlib
+import inspect
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from config import USE_INDICATOR_CACHE, INDICATOR_CACHE_MAX_BYTES, INDICATOR_CACHE_DIR
+import metrics
+
+_hits = metrics.counter("indicator_cache_hits_total", "Indicator lookups served from cache")
+_misses = metrics.counter("indicator_cache_misses_total", "Indicator lookups that had to compute")
+
+FINGERPRINT_COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
+
+
+def fingerprint(df):
+    """
+    Hash of the candle data plus the symbol/interval stored in df.attrs.
+
+    Only the raw OHLCV columns are hashed, so adding indicator columns to a
+    frame does not change its fingerprint.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((df.attrs.get("symbol"), df.attrs.get("interval"), len(df))).encode())
+    for col in FINGERPRINT_COLUMNS:
+        if col in df.columns:
+            values = df[col].to_numpy()
+            if values.dtype.kind == "M":
+                values = values.view("i8")
+            h.update(np.ascontiguousarray(values).data)
+    return h.hexdigest()
+
+
+class IndicatorCache:
+    """
+    LRU mapping of key -> {column name: ndarray}, evicted by total byte size.
+
+    With disk_dir set, entries are also written there as .npz files and a
+    memory miss falls back to disk before recomputing.
+    """
+
+    def __init__(self, max_bytes=INDICATOR_CACHE_MAX_BYTES, disk_dir=INDICATOR_CACHE_DIR):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(fp, name, params=None):
+        return hashlib.blake2b(
+            repr((fp, name, sorted((params or {}).items()))).encode(), digest_size=16
+        ).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                _hits.inc()
+                return entry
+
+        entry = self._load_disk(key)
+        with self._lock:
+            if entry is not None:
+                self.disk_hits += 1
+                _hits.inc()
+                self._insert(key, entry)
+            else:
+                self.misses += 1
+                _misses.inc()
+        return entry
+
+    def put(self, key, columns):
+        entry = {}
+        for name, values in columns.items():
+            arr = np.array(values, copy=True)
+            arr.flags.writeable = False
+            entry[name] = arr
+        with self._lock:
+            self._insert(key, entry)
+        self._save_disk(key, entry)
+
+    def _insert(self, key, entry):
+        size = sum(arr.nbytes for arr in entry.values())
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= sum(arr.nbytes for arr in old.values())
+        self._entries[key] = entry
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= sum(arr.nbytes for arr in evicted.values())
+            self.evictions += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.npz")
+
+    def _load_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return {name: data[name] for name in data.files}
+        except (OSError, ValueError):
+            return None
+
+    def _save_disk(self, key, entry):
+        if not self.disk_dir:
+            return
+        os.makedirs(self.disk_dir, exist_ok=True)
+        tmp_path = f"{self._disk_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **entry)
+        os.replace(tmp_path, self._disk_path(key))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+    def cached_columns(self, df, name, params, compute, fp=None, outputs=None):
+        """
+        Add the columns compute(df) would add, from cache when possible.
+
+        Args:
+            df: Candle DataFrame (mutated in place, like the indicator functions)
+            name: Indicator name, part of the key
+            params: Indicator parameters, part of the key
+            compute: Function adding the columns to df and returning it
+            fp: Precomputed fingerprint(df), when the caller has one
+            outputs: Columns compute writes. Without them only columns that
+                were not in df beforehand can be told apart and cached, so
+                one that compute overwrites would be missing from later hits.
+
+        Returns:
+            df with the indicator columns
+        """
+        key = self.make_key(fp or fingerprint(df), name, params)
+        entry = self.get(key)
+        if entry is not None and (outputs is None or all(col in entry for col in outputs)):
+            for col, values in entry.items():
+                df[col] = pd.Series(values.copy(), index=df.index)
+            return df
+
+        before = set(df.columns)
+        df = compute(df)
+        written = outputs if outputs is not None else [col for col in df.columns if col not in before]
+        self.put(key, {col: df[col].to_numpy() for col in written})
+        return df
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_indicator_cache():
+    """Process-wide IndicatorCache configured from config."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = IndicatorCache()
+        return _default_cache
+
+
+metrics.gauge(
+    "indicator_cache_hit_ratio", "Share of indicator lookups served from memory or disk",
+    lambda: get_indicator_cache().stats()["hit_ratio"],
+)
+
+
+def cached_indicator(fn=None, *, outputs=None):
+    """
+    Decorator for strategy.py indicator functions fn(df, **params) -> df.
+
+    The cache key covers the candle fingerprint, the function and its bound
+    parameters (defaults included), so calls with different windows do not
+    collide. Declare the columns fn writes with
+    @cached_indicator(outputs=(...)) so they are cached even when the input
+    frame already has them.
+    """
+    if fn is None:
+        return functools.partial(cached_indicator, outputs=outputs)
+    signature = inspect.signature(fn)
+    name = f"{fn.__module__}.{fn.__qualname__}"
+    outputs = tuple(outputs) if outputs is not None else None
+
+    @functools.wraps(fn)
+    def wrapper(df, *args, **kwargs):
+        if not USE_INDICATOR_CACHE:
+            return fn(df, *args, **kwargs)
+        bound = signature.bind(df, *args, **kwargs)
+        bound.apply_defaults()
+        params = {k: v for k, v in bound.arguments.items() if k != "df"}
+        return get_indicator_cache().cached_columns(
+            df, name, params, lambda d: fn(d, *args, **kwargs), outputs=outputs
+        )
+
+    return wrapper
@@ -0,0 +1,241 @@
+"""
+Backtest Job Queue
+Runs backtests on a bounded worker pool so web requests return immediately with a job id
+"""
+import hashlib
+import json
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config import JOB_WORKERS, JOB_MAX_PENDING, JOB_RESULT_TTL_SECONDS
+import metrics
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+_submitted = metrics.counter("backtest_jobs_submitted_total", "Backtest jobs created")
+_deduplicated = metrics.counter("backtest_jobs_deduplicated_total", "Submissions joined to an existing job")
+_cancelled = metrics.counter("backtest_jobs_cancelled_total", "Backtest jobs cancelled")
+_failed = metrics.counter("backtest_jobs_failed_total", "Backtest jobs that raised")
+_queue_wait = metrics.histogram("backtest_job_queue_seconds", "Time from submission to a worker picking the job up")
+_run_time = metrics.histogram("backtest_job_run_seconds", "Time a worker spent running a backtest job")
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job when it has been cancelled."""
+
+
+class QueueFull(Exception):
+    """Raised by submit() when JOB_MAX_PENDING jobs are already waiting or running."""
+
+
+def params_key(params):
+    """Stable hash of job parameters; identical requests share a key."""
+    return hashlib.blake2b(json.dumps(params, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+
+class Job:
+    """State of one submitted backtest."""
+
+    def __init__(self, key, params):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.params = params
+        self.status = PENDING
+        self.stage = None
+        self.result = None
+        self.error = None
+        self.error_code = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.subscribers = set()  # Tokens of the submissions still waiting on this job
+        self.future = None
+        self._cancel = threading.Event()
+        self._changed = threading.Condition()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def subscribe(self):
+        """Register one more submission of this job; returns its cancel token."""
+        token = uuid.uuid4().hex
+        self.subscribers.add(token)
+        return token
+
+    def checkpoint(self, stage):
+        """Progress callback for the job function: records the stage, aborts if cancelled."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self._set(stage=stage)
+
+    def _set(self, **fields):
+        with self._changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self._changed.notify_all()
+
+    def wait(self, timeout):
+        """Block until the job finishes or timeout seconds pass (long polling)."""
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while self.status not in FINISHED_STATES:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+
+    def to_dict(self, include_result=True):
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == FAILED:
+            data["error"] = self.error
+            data["error_code"] = self.error_code
+        if include_result and self.status == DONE:
+            data["result"] = self.result
+        return data
+
+
+class JobManager:
+    """
+    Bounded pool of backtest workers with de-duplication and cancellation.
+
+    Args:
+        fn: Job function fn(checkpoint, **params) -> JSON-serializable result
+        max_workers: Concurrent jobs
+        max_pending: Jobs allowed to be queued or running before submit() refuses
+        result_ttl: Seconds a finished job (and its result) is kept for polling and reuse
+    """
+
+    def __init__(self, fn, max_workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING,
+                 result_ttl=JOB_RESULT_TTL_SECONDS):
+        self.fn = fn
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="backtest-job")
+        self._jobs = {}
+        self._by_key = {}
+        self._lock = threading.Lock()
+
+    def submit(self, params):
+        """
+        Queue a job, or join the live/recently finished job with identical params.
+
+        Returns:
+            tuple: (Job, created, token) where created is False for a de-duplicated
+            submission and token identifies this submission to cancel()
+
+        Raises:
+            QueueFull: If max_pending jobs are already outstanding
+        """
+        key = params_key(params)
+        with self._lock:
+            self._expire()
+            existing = self._jobs.get(self._by_key.get(key))
+            # A job being cancelled may still be RUNNING until its next stage check; never join it
+            if existing is not None and existing.status not in (FAILED, CANCELLED) and not existing.cancelled:
+                token = existing.subscribe()
+                _deduplicated.inc()
+                return existing, False, token
+            outstanding = sum(1 for job in self._jobs.values() if job.status in (PENDING, RUNNING))
+            if outstanding >= self.max_pending:
+                raise QueueFull(f"{outstanding} backtest jobs already queued")
+            job = Job(key, params)
+            token = job.subscribe()
+            self._jobs[job.id] = job
+            self._by_key[key] = job.id
+            job.future = self._executor.submit(self._run, job)
+        _submitted.inc()
+        return job, True, token
+
+    def get(self, job_id):
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id, token):
+        """
+        Withdraw the submission identified by token from a job.
+
+        A job shared by several submitters keeps running until all of them
+        have cancelled; an unknown or already withdrawn token changes nothing,
+        so a repeated or retried cancel is harmless. Returns the job (None if unknown).
+        """
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED_STATES or token not in job.subscribers:
+                return job
+            job.subscribers.discard(token)
+            if job.subscribers:
+                return job
+            job._cancel.set()
+            if job.future.cancel():
+                # Never started: finish it here, the worker will not run
+                job._set(status=CANCELLED, finished_at=time.time())
+                _cancelled.inc()
+            return job
+
+    def _run(self, job):
+        if job.cancelled:
+            job._set(status=CANCELLED, finished_at=time.time())
+            _cancelled.inc()
+            return
+        job._set(status=RUNNING, started_at=time.time())
+        _queue_wait.observe(job.started_at - job.submitted_at)
+        try:
+            with _run_time.time():
+                result = self.fn(job.checkpoint, **job.params)
+            if job.cancelled:
+                raise JobCancelled()
+            job._set(status=DONE, stage=None, result=result, finished_at=time.time())
+        except JobCancelled:
+            job._set(status=CANCELLED, finished_at=time.time())
+            _cancelled.inc()
+        except Exception as e:
+            print(f"❌ Backtest job {job.id} failed: {traceback.format_exc()}")
+            job._set(status=FAILED, error=str(e), error_code=400 if isinstance(e, ValueError) else 500,
+                     finished_at=time.time())
+            _failed.inc()
+
+    def _expire(self):
+        """Drop finished jobs older than result_ttl. Caller holds _lock."""
+        cutoff = time.time() - self.result_ttl
+        for job_id, job in list(self._jobs.items()):
+            if job.status in FINISHED_STATES and job.finished_at < cutoff:
+                del self._jobs[job_id]
+                if self._by_key.get(job.key) == job_id:
+                    del self._by_key[job.key]
+
+    def stats(self):
+        """Job counts by status plus submission and latency metrics for this process."""
+        with self._lock:
+            self._expire()
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        queue_wait = _queue_wait.snapshot()
+        run_time = _run_time.snapshot()
+        return {
+            "jobs": counts,
+            "submitted": _submitted.value,
+            "deduplicated": _deduplicated.value,
+            "cancelled": _cancelled.value,
+            "failed": _failed.value,
+            "queue_wait_mean_s": round(queue_wait["mean"], 4),
+            "run_time_mean_s": round(run_time["mean"], 4),
+        }
@@ -0,0 +1,409 @@
+"""
+Paper-Trading Live Runner
+Drives strategy signals from arriving candles on an asyncio event loop and simulates orders
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+import pandas as pd
+
+from config import (
+    INITIAL_CAPITAL,
+    STRATEGIES,
+    DEFAULT_STRATEGY,
+    DEFAULT_MARGIN,
+    STOP_LOSS_PCT,
+    AVAILABLE_STOCKS,
+)
+from backtest import BUY, SELL, bar_step
+from candle_store import get_candle_store
+from conditions import COLUMN_ALIASES, compile_conditions, evaluate_arrays
+from data_fetcher import INTERVAL_MINUTES, request_candles, epoch_millis
+from groww_client import get_groww_client
+from pipeline import resolve_leverage
+from streaming import StreamingIndicators
+import metrics
+
+# Sub-millisecond buckets: a decision should cost microseconds, not a network round trip
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+_tick_latency = metrics.histogram(
+    "live_tick_to_decision_seconds", "Time from candle arrival to trading decision", LATENCY_BUCKETS)
+_ticks = metrics.counter("live_ticks_total", "Candles processed by the live runner")
+_orders = metrics.counter("live_orders_total", "Simulated orders routed by the live runner")
+
+
+# --- Per-bar signal rules for predefined strategies ---
+# Each mirrors the vectorized rule in strategy.py for the latest bar, given
+# the current and previous indicator values.
+
+
+def _sma_crossover(cur, prev):
+    if cur["SMA_20"] > cur["SMA_50"]:
+        return 1
+    if cur["SMA_20"] < cur["SMA_50"]:
+        return -1
+    return 0
+
+
+def _rsi_oversold(cur, prev):
+    return 1 if cur["RSI"] < 20 else 0
+
+
+def _vwap_trend_rider(cur, prev):
+    vwap, low = cur["VWAP"], cur["low"]
+    above_vwap = cur["close"] > vwap
+    bullish = cur["close"] > cur["open"]
+    near_vwap = vwap * 0.995 <= low <= vwap * 1.005
+    near_ema = cur["EMA_9"] * 0.995 <= low <= cur["EMA_9"] * 1.005
+    if above_vwap and bullish and (near_vwap or near_ema):
+        return 1
+    return -1 if not above_vwap else 0
+
+
+def _vwap_ema_confluence(cur, prev):
+    above_vwap = cur["close"] > cur["VWAP"]
+    ema_bull = cur["EMA_9"] > cur["EMA_20"]
+    no_break = cur["low"] > cur["VWAP"]
+    bounce = prev is not None and prev["close"] <= prev["EMA_9"] and cur["close"] > cur["EMA_9"]
+    if above_vwap and ema_bull and no_break and bounce:
+        return 1
+    return -1 if (not above_vwap or not ema_bull) else 0
+
+
+SIGNAL_RULES = {
+    "SMA Crossover": _sma_crossover,
+    "RSI Oversold": _rsi_oversold,
+    "VWAP Trend Rider": _vwap_trend_rider,
+    "VWAP + EMA Confluence": _vwap_ema_confluence,
+}
+
+
+class CustomSignalRule:
+    """
+    Evaluates compiled custom-strategy conditions on the last two bars.
+
+    The plans' columns are copied into a preallocated two-bar buffer
+    (previous, current) each tick instead of building a DataFrame.
+    """
+
+    def __init__(self, custom_strategy):
+        self.buy_plan = compile_conditions(
+            custom_strategy.get("buy_conditions", []), custom_strategy.get("buy_logic", "AND"))
+        self.sell_plan = compile_conditions(
+            custom_strategy.get("sell_conditions", []), custom_strategy.get("sell_logic", "AND"))
+        names = self.buy_plan.columns + self.sell_plan.columns
+        # Plans may name a candle field by its alias ("price" for close)
+        self.columns = tuple(dict.fromkeys(names + tuple(COLUMN_ALIASES.get(name, name) for name in names)))
+        self.buffer = {name: np.full(2, np.nan) for name in self.columns}
+
+    def __call__(self, cur, prev):
+        window = {}
+        for name in self.columns:
+            if name not in cur:
+                continue
+            values = self.buffer[name]
+            values[0] = prev.get(name, np.nan) if prev is not None else np.nan
+            values[1] = cur[name]
+            window[name] = values
+        buy, sell = evaluate_arrays(window, self.buy_plan, self.sell_plan)
+        if sell[-1]:
+            return -1
+        return 1 if buy[-1] else 0
+
+
+class PaperAccount:
+    """
+    Simulated account applying the same rules as backtest_strategy.
+
+    A signal produced on one bar becomes the position acted on at the next
+    bar's close; each bar goes through backtest.bar_step, the state machine
+    the backtest engines use, so a replay reproduces their trades.
+    """
+
+    def __init__(self, capital=INITIAL_CAPITAL, leverage=1, stop_loss_pct=STOP_LOSS_PCT, exit_rules=None):
+        self.capital = capital
+        self.cash = capital
+        self.leverage = max(1, int(leverage))
+        self.buying_power = self.leverage * capital
+        self.stop_loss_pct = stop_loss_pct
+        exit_rules = exit_rules or {}
+        take_profit = exit_rules.get("take_profit_rs")
+        hold_max_days = exit_rules.get("hold_max_days")
+        self.use_exit_rules = take_profit is not None and hold_max_days is not None
+        self.take_profit = float(take_profit) if self.use_exit_rules else 0.0
+        self.exit_next_bar = self.use_exit_rules and hold_max_days == 1
+        self.position = 0
+        self.buy_price = 0.0
+        self.trades = []
+        self.last_price = None
+
+    def on_bar(self, i, timestamp, price, pos_signal):
+        """Apply position signal pos_signal at bar i; returns the order placed, if any."""
+        self.last_price = price
+        side, qty = bar_step(
+            price, pos_signal, self.position, self.buy_price, self.buying_power, self.leverage,
+            self.stop_loss_pct, self.use_exit_rules, self.take_profit, self.exit_next_bar,
+        )
+        if side == BUY:
+            self.cash -= qty * price
+            self.position = qty
+            self.buy_price = price
+            order = ("BUY", timestamp, price, qty)
+        elif side == SELL:
+            self.cash += qty * price
+            self.position = 0
+            order = ("SELL", timestamp, price, qty)
+        else:
+            return None
+        self.trades.append(order)
+        return order
+
+    @property
+    def equity(self):
+        return self.cash + (self.position * self.last_price if self.position > 0 else 0)
+
+
+class SymbolSession:
+    """Indicator state, signal rule and paper account for one symbol."""
+
+    def __init__(self, symbol, rule, account):
+        self.symbol = symbol
+        self.rule = rule
+        self.account = account
+        self.indicators = StreamingIndicators()
+        self.bars = 0
+        self.prev_values = None
+        self.pending_position = float("nan")
+
+    def on_candle(self, candle):
+        values = self.indicators.update(candle)
+        # The signal from the previous bar is the position acted on now
+        order = None
+        if self.bars > 0:
+            order = self.account.on_bar(
+                self.bars, values.get("timestamp"), values["close"], self.pending_position
+            )
+        self.pending_position = self.rule(values, self.prev_values)
+        self.prev_values = values
+        self.bars += 1
+        return order
+
+
+# --- Candle sources ---
+# A source is an async iterator of (symbol, candle dict) pairs.
+
+
+class ReplayCandleSource:
+    """
+    Replays stored candles, for testing and paper runs without the API.
+
+    Args:
+        frames: Dict of symbol -> candle DataFrame
+        delay: Seconds to sleep between bars (0 replays as fast as possible)
+    """
+
+    def __init__(self, frames, delay=0.0):
+        self.frames = frames
+        self.delay = delay
+
+    @classmethod
+    def from_store(cls, symbols, exchange="NSE", interval="1d", delay=0.0, store=None):
+        """
+        Replay candles from the candle store (default: the shared store).
+
+        Raises:
+            ValueError: If any symbol has no stored candles for the interval
+        """
+        store = store or get_candle_store()
+        frames = {symbol: store.load(symbol, exchange, interval) for symbol in symbols}
+        missing = [symbol for symbol, df in frames.items() if df is None]
+        if missing:
+            raise ValueError(
+                f"No stored {interval} candles for {', '.join(missing)} on {exchange}; "
+                f"download them first (python downloader.py)"
+            )
+        return cls(frames, delay)
+
+    @classmethod
+    def from_csv(cls, paths, delay=0.0):
+        """paths: Dict of symbol -> CSV file with timestamp, open, high, low, close, volume."""
+        return cls({
+            symbol: pd.read_csv(path, parse_dates=["timestamp"]) for symbol, path in paths.items()
+        }, delay)
+
+    async def __aiter__(self):
+        records = {
+            symbol: df[["timestamp", "open", "high", "low", "close", "volume"]].to_dict("records")
+            for symbol, df in self.frames.items()
+        }
+        # Interleave symbols bar by bar, as a live feed would
+        for i in range(max((len(r) for r in records.values()), default=0)):
+            for symbol, rows in records.items():
+                if i < len(rows):
+                    yield symbol, rows[i]
+            await asyncio.sleep(self.delay)
+
+
+class GrowwCandleSource:
+    """
+    Polls the Groww API for newly completed candles of each symbol.
+
+    Requests run in worker threads (bounded by max_concurrency) so many
+    symbols are polled concurrently without blocking the event loop.
+    """
+
+    def __init__(self, symbols, interval="1m", poll_seconds=None, max_concurrency=8, exchange="NSE"):
+        self.symbols = symbols
+        self.exchange = exchange
+        self.interval = interval
+        self.interval_minutes = INTERVAL_MINUTES.get(interval, 1)
+        self.poll_seconds = poll_seconds or self.interval_minutes * 60
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.last_seen = {}
+
+    async def _poll(self, symbol):
+        now = pd.Timestamp.now(tz="UTC").tz_localize(None)
+        since = self.last_seen.get(symbol, now - pd.Timedelta(minutes=self.interval_minutes * 2))
+        async with self.semaphore:
+            df = await asyncio.to_thread(
+                request_candles, get_groww_client(), symbol,
+                epoch_millis(since), epoch_millis(now), self.interval_minutes, self.exchange,
+            )
+        # Only emit bars that have closed and were not emitted before
+        bar = pd.Timedelta(minutes=self.interval_minutes)
+        df = df[(df["timestamp"] > since) & (df["timestamp"] + bar <= now)]
+        if len(df):
+            self.last_seen[symbol] = df["timestamp"].iloc[-1]
+        return symbol, df.to_dict("records")
+
+    async def __aiter__(self):
+        while True:
+            started = time.monotonic()
+            results = await asyncio.gather(
+                *(self._poll(symbol) for symbol in self.symbols), return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    print(f"❌ Live poll failed: {str(result)}")
+                    continue
+                symbol, rows = result
+                for row in rows:
+                    yield symbol, row
+            await asyncio.sleep(max(0.0, self.poll_seconds - (time.monotonic() - started)))
+
+
+class LiveRunner:
+    """
+    Routes candles from a source to per-symbol sessions and records decisions.
+
+    Args:
+        source: Async iterator of (symbol, candle)
+        strategy_id: Key of config.STRATEGIES (ignored when custom_strategy is set)
+        custom_strategy: Dict with buy/sell conditions and logic
+        margin: '1x'|'2x'|'5x'|'10x'
+    """
+
+    def __init__(self, source, strategy_id=None, custom_strategy=None, margin=None,
+                 capital=INITIAL_CAPITAL, on_order=None):
+        if custom_strategy:
+            self.rule = CustomSignalRule(custom_strategy)
+            self.exit_rules = None
+        else:
+            strategy_id = strategy_id if strategy_id in STRATEGIES else DEFAULT_STRATEGY
+            self.rule = SIGNAL_RULES[strategy_id]
+            self.exit_rules = STRATEGIES[strategy_id].get("exit_rules")
+        self.source = source
+        self.leverage = resolve_leverage(margin)
+        self.capital = capital
+        self.on_order = on_order or _print_order
+        self.sessions = {}
+
+    def session(self, symbol):
+        if symbol not in self.sessions:
+            account = PaperAccount(self.capital, self.leverage, STOP_LOSS_PCT, self.exit_rules)
+            self.sessions[symbol] = SymbolSession(symbol, self.rule, account)
+        return self.sessions[symbol]
+
+    def process(self, symbol, candle):
+        """Handle one candle synchronously; returns the order placed, if any."""
+        start = time.perf_counter()
+        order = self.session(symbol).on_candle(candle)
+        _tick_latency.observe(time.perf_counter() - start)
+        _ticks.inc()
+        if order is not None:
+            _orders.inc()
+            self.on_order(symbol, order)
+        return order
+
+    async def run(self, max_ticks=None):
+        ticks = 0
+        async for symbol, candle in self.source:
+            self.process(symbol, candle)
+            ticks += 1
+            if max_ticks is not None and ticks >= max_ticks:
+                break
+        return self.summary()
+
+    def summary(self):
+        return {
+            symbol: {
+                "equity": round(s.account.equity, 2) if s.account.last_price is not None else s.account.capital,
+                "position": s.account.position,
+                "trades": len(s.account.trades),
+                "bars": s.bars,
+            }
+            for symbol, s in self.sessions.items()
+        }
+
+    @staticmethod
+    def latency_stats():
+        snap = _tick_latency.snapshot()
+        return {
+            "ticks": snap["count"],
+            "mean_us": round(snap["mean"] * 1e6, 1),
+            "p50_le_us": _tick_latency.quantile(0.5) * 1e6,
+            "p99_le_us": _tick_latency.quantile(0.99) * 1e6,
+        }
+
+
+def _print_order(symbol, order):
+    action, timestamp, price, qty = order
+    print(f"  {symbol} {action}: {timestamp} @ ₹{price:,.2f} (Qty: {qty})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paper-trade a strategy on live or replayed candles")
+    parser.add_argument("--symbols", help="Comma-separated symbols (default: config.AVAILABLE_STOCKS)")
+    parser.add_argument("--strategy", default=DEFAULT_STRATEGY, choices=list(STRATEGIES))
+    parser.add_argument("--margin", default=DEFAULT_MARGIN)
+    parser.add_argument("--interval", default="1m", choices=list(INTERVAL_MINUTES))
+    parser.add_argument("--replay", action="store_true", help="Replay stored candles instead of polling Groww")
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds between replayed bars")
+    args = parser.parse_args()
+
+    symbols = [s.strip() for s in args.symbols.split(",")] if args.symbols else [
+        s["symbol"] for s in AVAILABLE_STOCKS]
+    if args.replay:
+        try:
+            source = ReplayCandleSource.from_store(symbols, interval=args.interval, delay=args.delay)
+        except ValueError as e:
+            print(f"❌ {str(e)}")
+            return
+    else:
+        source = GrowwCandleSource(symbols, interval=args.interval)
+
+    runner = LiveRunner(source, strategy_id=args.strategy, margin=args.margin)
+    try:
+        summary = asyncio.run(runner.run())
+    except KeyboardInterrupt:
+        summary = runner.summary()
+    for symbol, stats in summary.items():
+        print(f"{symbol}: equity ₹{stats['equity']:,.2f} | position {stats['position']} | {stats['trades']} trades")
+    print(f"Tick-to-decision latency: {runner.latency_stats()}")
+
+
+if __name__ == "__main__":
+    main()
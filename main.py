@@ -2,31 +2,22 @@ from config import (
     INITIAL_CAPITAL,
     DEFAULT_SYMBOL,
     USE_MOCK_DATA,
-    STRATEGIES,
     DEFAULT_STRATEGY,
     DEFAULT_MARGIN,
 )
 from data_fetcher import fetch_historical_data
-import strategy as strategy_module
-from backtest import backtest_strategy
+from pipeline import resolve_leverage, run_strategy_backtest
+from analytics import compute_analytics
 
 
 def main():
     symbol = DEFAULT_SYMBOL
     strategy_id = DEFAULT_STRATEGY
-    cfg = STRATEGIES[strategy_id]
-    calc_fn = getattr(strategy_module, cfg["indicators"])
-    signal_fn = getattr(strategy_module, cfg["signals"])
 
     df = fetch_historical_data(symbol, use_mock=USE_MOCK_DATA)
-    df = calc_fn(df)
-    df = signal_fn(df)
-
-    exit_rules = cfg.get("exit_rules")
-    leverage_map = {"1x": 1, "2x": 2, "5x": 5, "10x": 10}
-    leverage = leverage_map.get(DEFAULT_MARGIN.strip(), 1)
-    final_value, pnl, trades = backtest_strategy(
-        df, INITIAL_CAPITAL, exit_rules=exit_rules, leverage=leverage, stop_loss_pct=0.10
+    leverage = resolve_leverage(DEFAULT_MARGIN)
+    df, strategy_id, final_value, pnl, trades = run_strategy_backtest(
+        df, strategy_id=strategy_id, leverage=leverage
     )
 
     print(f"Strategy: {strategy_id} | Margin: {DEFAULT_MARGIN} | 10% stop-loss")
@@ -34,6 +25,14 @@ def main():
     print(f"Net P&L: ₹{round(pnl, 2):,.2f}")
     print(f"Return: {round((pnl / INITIAL_CAPITAL) * 100, 2)}%")
     print(f"Total Trades: {len(trades)}")
+
+    stats = compute_analytics(
+        df, trades, INITIAL_CAPITAL, df["equity"].to_numpy(), df["exposure"].to_numpy()
+    )
+    print("\nPerformance:")
+    for name, value in stats.items():
+        label = name.replace("_pct", " %").replace("_", " ").capitalize()
+        print(f"  {label}: {'—' if value is None else value}")
     
     if trades:
         print("\nTrade History:")
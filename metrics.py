@@ -0,0 +1,222 @@
+"""
+In-process Metrics
+Thread-safe counters and latency histograms shared across the application
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; suits everything from in-memory work to network round trips
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text="", labels=None):
+        self.name = name
+        self.help = help_text
+        self.labels = dict(labels or {})
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed values (Prometheus semantics)."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text="", buckets=DEFAULT_BUCKETS, labels=None):
+        self.name = name
+        self.help = help_text
+        self.labels = dict(labels or {})
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[slot] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        """Context manager observing the elapsed wall time of its block."""
+        return _Timer(self)
+
+    def snapshot(self):
+        """Dict with count, sum, mean and cumulative bucket counts."""
+        with self._lock:
+            counts = list(self.counts)
+            total, count = self.sum, self.count
+        cumulative = []
+        running = 0
+        for upper, n in zip(self.buckets + (float("inf"),), counts):
+            running += n
+            cumulative.append((upper, running))
+        return {
+            "count": count,
+            "sum": total,
+            "mean": total / count if count else 0.0,
+            "buckets": cumulative,
+        }
+
+    def quantile(self, q):
+        """Approximate quantile: upper bound of the bucket containing it."""
+        snap = self.snapshot()
+        if not snap["count"]:
+            return 0.0
+        rank = q * snap["count"]
+        for upper, running in snap["buckets"]:
+            if running >= rank:
+                return upper
+        return float("inf")
+
+
+class Gauge:
+    """Value read from a callback each time metrics are collected (e.g. a cache hit ratio)."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text="", fn=None, labels=None):
+        self.name = name
+        self.help = help_text
+        self.labels = dict(labels or {})
+        self.fn = fn or (lambda: 0.0)
+
+    @property
+    def value(self):
+        try:
+            return float(self.fn())
+        except Exception:
+            return float("nan")
+
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        self.histogram.observe(self.elapsed)
+        return False
+
+
+class SpanRecorder:
+    """
+    Times the named stages of one request.
+
+    Each span is kept in .timings (seconds by stage, for the response) and
+    observed into the histogram `name` labelled with its stage.
+    """
+
+    def __init__(self, name, help_text=""):
+        self.name = name
+        self.help = help_text
+        self.timings = {}
+
+    @contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings[stage] = round(elapsed, 4)
+            histogram(self.name, self.help, labels={"stage": stage}).observe(elapsed)
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _key(name, labels):
+    return name, tuple(sorted((labels or {}).items()))
+
+
+def counter(name, help_text="", labels=None):
+    """Get or create the process-wide Counter called name (with these labels)."""
+    key = _key(name, labels)
+    with _registry_lock:
+        if key not in _registry:
+            _registry[key] = Counter(name, help_text, labels)
+        return _registry[key]
+
+
+def histogram(name, help_text="", buckets=DEFAULT_BUCKETS, labels=None):
+    """Get or create the process-wide Histogram called name (with these labels)."""
+    key = _key(name, labels)
+    with _registry_lock:
+        if key not in _registry:
+            _registry[key] = Histogram(name, help_text, buckets, labels)
+        return _registry[key]
+
+
+def gauge(name, help_text="", fn=None, labels=None):
+    """Register (or replace) the process-wide callback Gauge called name."""
+    key = _key(name, labels)
+    with _registry_lock:
+        _registry[key] = Gauge(name, help_text, fn, labels)
+        return _registry[key]
+
+
+def all_metrics():
+    """All registered metrics, sorted by name then labels."""
+    with _registry_lock:
+        return [_registry[key] for key in sorted(_registry)]
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels.items()
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _format_value(value):
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(metrics=None):
+    """All metrics (or the given ones) in the Prometheus text exposition format."""
+    lines = []
+    described = set()
+    for metric in metrics if metrics is not None else all_metrics():
+        if metric.name not in described:
+            described.add(metric.name)
+            if metric.help:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+        if metric.kind == "histogram":
+            snap = metric.snapshot()
+            for upper, running in snap["buckets"]:
+                labels = _format_labels({**metric.labels, "le": _format_value(float(upper))})
+                lines.append(f"{metric.name}_bucket{labels} {running}")
+            labels = _format_labels(metric.labels)
+            lines.append(f"{metric.name}_sum{labels} {_format_value(snap['sum'])}")
+            lines.append(f"{metric.name}_count{labels} {snap['count']}")
+        else:
+            lines.append(f"{metric.name}{_format_labels(metric.labels)} {_format_value(metric.value)}")
+    return "\n".join(lines) + "\n"
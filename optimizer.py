@@ -0,0 +1,252 @@
+"""
+Strategy Parameter Optimizer
+Grid and random search over config.STRATEGIES parameters with shared indicator computation
+"""
+import itertools
+import random
+
+import numpy as np
+import pandas as pd
+
+from config import INITIAL_CAPITAL, STRATEGIES, STOP_LOSS_PCT
+from backtest import backtest_arrays
+
+# Default search spaces per strategy; parameter names follow strategy.py
+DEFAULT_PARAM_SPACES = {
+    "SMA Crossover": {
+        "fast": list(range(5, 55, 5)),
+        "slow": list(range(20, 220, 20)),
+    },
+    "RSI Oversold": {
+        "period": [7, 10, 14, 21, 28],
+        "buy_thresh": [10, 15, 20, 25, 30, 35, 40],
+    },
+    "VWAP Trend Rider": {
+        "window": [10, 20, 30, 50],
+        "ema_fast": [5, 9, 13, 21],
+    },
+    "VWAP + EMA Confluence": {
+        "window": [10, 20, 30, 50],
+        "ema_fast": [5, 9, 13],
+        "ema_slow": [20, 30, 50],
+    },
+}
+
+# Grid points are evaluated in batches of this many rows, bounding the
+# (points x bars) signal matrices for long intraday histories.
+BATCH_SIZE = 64
+
+
+class FeatureCache:
+    """
+    Memoized indicator arrays for one candle frame.
+
+    Each distinct (indicator, window) is computed once and shared by every
+    grid point that needs it, using the same pandas formulas as strategy.py
+    so the optimizer's backtests match the normal pipeline exactly.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.close = df["close"].to_numpy(dtype=np.float64)
+        self.open = df["open"].to_numpy(dtype=np.float64)
+        self.low = df["low"].to_numpy(dtype=np.float64)
+        self._cache = {}
+        self.computed = 0
+
+    def _get(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute().to_numpy(dtype=np.float64)
+            self.computed += 1
+        return self._cache[key]
+
+    def sma(self, window):
+        return self._get(("sma", window), lambda: self.df["close"].rolling(window).mean())
+
+    def ema(self, span):
+        return self._get(("ema", span), lambda: self.df["close"].ewm(span=span, adjust=False).mean())
+
+    def rsi(self, period):
+        def compute():
+            delta = self.df["close"].diff()
+            gain = delta.where(delta > 0, 0.0)
+            loss = (-delta).where(delta < 0, 0.0)
+            rs = gain.rolling(period).mean() / loss.rolling(period).mean().replace(0, 1e-10)
+            return 100 - (100 / (1 + rs))
+        return self._get(("rsi", period), compute)
+
+    def vwap(self, window):
+        def compute():
+            df = self.df
+            pv = (df["high"] + df["low"] + df["close"]) / 3 * df["volume"]
+            return pv.rolling(window).sum() / df["volume"].rolling(window).sum()
+        return self._get(("vwap", window), compute)
+
+
+# --- Batched signal builders ---
+# Each takes the cache and a list of parameter dicts and returns a
+# (points x bars) signal matrix following the matching strategy.py rules.
+
+
+def _sma_crossover(features, points):
+    fast = np.vstack([features.sma(p.get("fast", 20)) for p in points])
+    slow = np.vstack([features.sma(p.get("slow", 50)) for p in points])
+    return np.where(fast > slow, 1, np.where(fast < slow, -1, 0))
+
+
+def _rsi_oversold(features, points):
+    rsi = np.vstack([features.rsi(p.get("period", 14)) for p in points])
+    thresh = np.array([p.get("buy_thresh", 20) for p in points], dtype=np.float64)[:, None]
+    return np.where(rsi < thresh, 1, 0)
+
+
+def _vwap_trend_rider(features, points):
+    vwap = np.vstack([features.vwap(p.get("window", 20)) for p in points])
+    ema_fast = np.vstack([features.ema(p.get("ema_fast", 9)) for p in points])
+    close, low = features.close, features.low
+    above_vwap = close > vwap
+    bullish = close > features.open
+    near_vwap = (low <= vwap * 1.005) & (low >= vwap * 0.995)
+    near_ema = (low <= ema_fast * 1.005) & (low >= ema_fast * 0.995)
+    buy = above_vwap & bullish & (near_vwap | near_ema)
+    return np.where(buy, 1, np.where(~above_vwap, -1, 0))
+
+
+def _vwap_ema_confluence(features, points):
+    vwap = np.vstack([features.vwap(p.get("window", 20)) for p in points])
+    ema_fast = np.vstack([features.ema(p.get("ema_fast", 9)) for p in points])
+    ema_slow = np.vstack([features.ema(p.get("ema_slow", 20)) for p in points])
+    close, low = features.close, features.low
+    above_vwap = close > vwap
+    ema_bull = ema_fast > ema_slow
+    no_break = low > vwap
+    prev_below = np.zeros_like(above_vwap)
+    prev_below[:, 1:] = close[:-1] <= ema_fast[:, :-1]
+    bounce = prev_below & (close > ema_fast)
+    buy = above_vwap & ema_bull & no_break & bounce
+    return np.where(buy, 1, np.where(~above_vwap | ~ema_bull, -1, 0))
+
+
+SIGNAL_BUILDERS = {
+    "SMA Crossover": _sma_crossover,
+    "RSI Oversold": _rsi_oversold,
+    "VWAP Trend Rider": _vwap_trend_rider,
+    "VWAP + EMA Confluence": _vwap_ema_confluence,
+}
+
+
+def _valid(strategy_id, params):
+    """Drop degenerate points, e.g. a fast SMA that is not faster than the slow one."""
+    if strategy_id == "SMA Crossover":
+        return params.get("fast", 20) < params.get("slow", 50)
+    if strategy_id == "VWAP + EMA Confluence":
+        return params.get("ema_fast", 9) < params.get("ema_slow", 20)
+    return True
+
+
+def strategy_positions(features, strategy_id, points):
+    """
+    (points x bars) position matrix for parameter dicts: the strategy's
+    signal shifted one bar (act on the next bar), NaN on the first bar.
+    """
+    signals = SIGNAL_BUILDERS[strategy_id](features, points)
+    positions = np.empty(signals.shape, dtype=np.float64)
+    positions[:, 0] = np.nan
+    positions[:, 1:] = signals[:, :-1]
+    return positions
+
+
+def evaluate_points(df, strategy_id, points, capital=INITIAL_CAPITAL, leverage=1, features=None,
+                    bars=None):
+    """
+    Backtest a list of parameter dicts for one strategy.
+
+    Args:
+        bars: Optional slice of bars to backtest over. Indicators still come
+            from the whole of df (so a window starts with warmed-up values)
+            and each window starts from a flat account.
+
+    Returns:
+        DataFrame with one row per point: parameters, final_value, pnl,
+        pnl_percent, total_trades
+    """
+    if strategy_id not in SIGNAL_BUILDERS:
+        raise ValueError(f"No optimizer support for strategy: {strategy_id}")
+    exit_rules = STRATEGIES[strategy_id].get("exit_rules")
+    features = features or FeatureCache(df)
+    bars = bars if bars is not None else slice(None)
+    close = features.close[bars]
+
+    rows = []
+    for start in range(0, len(points), BATCH_SIZE):
+        batch = points[start:start + BATCH_SIZE]
+        positions = strategy_positions(features, strategy_id, batch)[:, bars]
+        for params, position in zip(batch, positions):
+            final_value, pnl, fills = backtest_arrays(
+                close, position, capital, exit_rules, leverage, STOP_LOSS_PCT
+            )
+            rows.append({
+                **params,
+                "final_value": round(final_value, 2),
+                "pnl": round(pnl, 2),
+                "pnl_percent": round((pnl / capital) * 100, 2),
+                "total_trades": len(fills),
+            })
+    return pd.DataFrame(rows)
+
+
+def grid_points(strategy_id, param_space=None):
+    """Valid parameter dicts in the cartesian product of param_space."""
+    param_space = param_space or DEFAULT_PARAM_SPACES[strategy_id]
+    names = list(param_space)
+    points = [
+        dict(zip(names, values))
+        for values in itertools.product(*(param_space[name] for name in names))
+    ]
+    return [p for p in points if _valid(strategy_id, p)]
+
+
+def _rank(results, rank_by):
+    if len(results) == 0:
+        return results
+    return results.sort_values(rank_by, ascending=False, kind="stable").reset_index(drop=True)
+
+
+def grid_search(df, strategy_id, param_space=None, capital=INITIAL_CAPITAL, leverage=1,
+                rank_by="pnl"):
+    """
+    Exhaustive search over the cartesian product of param_space.
+
+    Args:
+        df: Candle DataFrame
+        strategy_id: Key of config.STRATEGIES
+        param_space: Dict of parameter name -> list of values
+            (default: DEFAULT_PARAM_SPACES[strategy_id])
+        rank_by: Result column to sort by, descending
+
+    Returns:
+        DataFrame of results ranked by rank_by
+    """
+    points = grid_points(strategy_id, param_space)
+    return _rank(evaluate_points(df, strategy_id, points, capital, leverage), rank_by)
+
+
+def random_search(df, strategy_id, param_space=None, n_iter=50, seed=42,
+                  capital=INITIAL_CAPITAL, leverage=1, rank_by="pnl"):
+    """Evaluate n_iter distinct random points from param_space; see grid_search."""
+    param_space = param_space or DEFAULT_PARAM_SPACES[strategy_id]
+    names = list(param_space)
+    rng = random.Random(seed)
+    space_size = int(np.prod([len(param_space[name]) for name in names]))
+
+    points, seen = [], set()
+    attempts = 0
+    while len(points) < n_iter and attempts < space_size * 4:
+        attempts += 1
+        values = tuple(rng.choice(param_space[name]) for name in names)
+        params = dict(zip(names, values))
+        if values in seen or not _valid(strategy_id, params):
+            continue
+        seen.add(values)
+        points.append(params)
+    return _rank(evaluate_points(df, strategy_id, points, capital, leverage), rank_by)
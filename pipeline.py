@@ -0,0 +1,146 @@
+"""
+Backtest Pipeline
+Shared indicator + signal + backtest steps used by the web app, CLI and universe runs
+"""
+import numpy as np
+
+from config import (
+    INITIAL_CAPITAL, STRATEGIES, DEFAULT_STRATEGY, LEVERAGE_MAP, STOP_LOSS_PCT,
+    COMPACT_FRAMES, COMPACT_CHUNK_BARS, COMPACT_WARMUP_BARS,
+)
+import strategy as strategy_module
+from backtest import backtest_strategy
+from analytics import equity_curve
+from custom_strategy import execute_custom_strategy, compute_indicators, required_indicators, required_lookback
+from compact import SIGNAL_DTYPE, POSITION_DTYPE, compact_frame, chunk_windows
+
+
+def resolve_leverage(margin):
+    """'1x'|'2x'|'5x'|'10x' -> 1|2|5|10 (defaults to 1)."""
+    return LEVERAGE_MAP.get((margin or "").strip(), 1)
+
+
+def _custom_indicators(custom_strategy):
+    return (
+        required_indicators(custom_strategy.get("buy_conditions", []), custom_strategy.get("buy_logic", "AND"))
+        + required_indicators(custom_strategy.get("sell_conditions", []), custom_strategy.get("sell_logic", "AND"))
+    )
+
+
+def compute_strategy_indicators(df, strategy_id=None, custom_strategy=None, compact=COMPACT_FRAMES):
+    """
+    Indicator step of apply_strategy: adds the columns the strategy reads.
+
+    For a custom strategy only the indicators its conditions reference are
+    computed (execute_custom_strategy then finds them present). With
+    compact=True the new columns are narrowed to float32 (see compact.py).
+    """
+    if custom_strategy:
+        needed = _custom_indicators(custom_strategy)
+        compute_indicators(df, [name for name in needed if name not in df.columns], compact=compact)
+        return df
+    cfg = STRATEGIES[_resolve_strategy_id(strategy_id)]
+    df = getattr(strategy_module, cfg["indicators"])(df)
+    return compact_frame(df) if compact else df
+
+
+def generate_strategy_signals(df, strategy_id=None, custom_strategy=None, compact=COMPACT_FRAMES):
+    """
+    Signal step of apply_strategy (expects compute_strategy_indicators to have run).
+
+    Returns:
+        tuple: (df with 'signal'/'position', exit_rules, strategy name)
+    """
+    if custom_strategy:
+        df = execute_custom_strategy(
+            df,
+            buy_conditions=custom_strategy.get("buy_conditions", []),
+            sell_conditions=custom_strategy.get("sell_conditions", []),
+            buy_logic=custom_strategy.get("buy_logic", "AND"),
+            sell_logic=custom_strategy.get("sell_logic", "AND"),
+            compact=compact,
+        )
+        return df, None, "Custom Strategy"
+    strategy_id = _resolve_strategy_id(strategy_id)
+    cfg = STRATEGIES[strategy_id]
+    df = getattr(strategy_module, cfg["signals"])(df)
+    return compact_frame(df) if compact else df, cfg.get("exit_rules"), strategy_id
+
+
+def _resolve_strategy_id(strategy_id):
+    if strategy_id is None or strategy_id not in STRATEGIES:
+        return DEFAULT_STRATEGY
+    return strategy_id
+
+
+def apply_strategy(df, strategy_id=None, custom_strategy=None, compact=COMPACT_FRAMES):
+    """
+    Compute indicators and signals for a predefined or custom strategy.
+
+    Args:
+        df: Candle DataFrame from fetch_historical_data
+        strategy_id: Key of config.STRATEGIES (falls back to DEFAULT_STRATEGY)
+        custom_strategy: Dict with buy/sell conditions and logic (overrides strategy_id)
+        compact: Use the compact frame layout; custom strategies over more
+            than COMPACT_CHUNK_BARS candles are signalled chunk by chunk
+
+    Returns:
+        tuple: (df with 'signal'/'position', exit_rules, strategy name)
+    """
+    if custom_strategy:
+        if compact and len(df) > COMPACT_CHUNK_BARS:
+            return apply_strategy_chunked(df, custom_strategy)
+        # Custom strategy: computes only the indicators its conditions reference
+        return generate_strategy_signals(df, custom_strategy=custom_strategy, compact=compact)
+    df = compute_strategy_indicators(df, strategy_id, compact=compact)
+    return generate_strategy_signals(df, strategy_id, compact=compact)
+
+
+def apply_strategy_chunked(df, custom_strategy, chunk_bars=COMPACT_CHUNK_BARS):
+    """
+    Signals for a custom strategy with memory bounded by the chunk size rather than the history.
+
+    Each chunk is computed together with enough preceding candles to warm
+    its indicators up (at least COMPACT_WARMUP_BARS, more if a condition
+    reads a longer window), then only its int8 signal is kept. Indicator
+    columns are never materialised for the whole history, so the
+    returned df carries just 'signal' and 'position' next to the candles.
+    EMA-based indicators converge rather than reset, so their values in a
+    chunk match the full pass to well under float32 precision.
+
+    Returns:
+        tuple: (df with 'signal'/'position', None, "Custom Strategy")
+    """
+    warmup = max(COMPACT_WARMUP_BARS, required_lookback(_custom_indicators(custom_strategy), df.attrs.get("interval")))
+    signal = np.empty(len(df), dtype=SIGNAL_DTYPE)
+    for lo, start, hi in chunk_windows(len(df), chunk_bars, warmup):
+        window = df.iloc[lo:hi].copy(deep=False)
+        window, _, _ = generate_strategy_signals(window, custom_strategy=custom_strategy, compact=True)
+        signal[start:hi] = window["signal"].to_numpy()[start - lo:]
+        del window
+
+    df = df.copy(deep=False)
+    df["signal"] = signal
+    df["position"] = df["signal"].shift(1).astype(POSITION_DTYPE)
+    return df, None, "Custom Strategy"
+
+
+def run_strategy_backtest(df, strategy_id=None, custom_strategy=None, leverage=1,
+                          capital=INITIAL_CAPITAL, execution=None, compact=COMPACT_FRAMES):
+    """
+    Apply a strategy to candles and backtest it.
+
+    Adds per-bar 'equity' and 'exposure' columns to the returned df
+    (see analytics.equity_curve). execution is an optional
+    execution.ExecutionModel passed to backtest_strategy.
+
+    Returns:
+        tuple: (df, strategy name, final_value, pnl, trades)
+    """
+    df, exit_rules, name = apply_strategy(df, strategy_id, custom_strategy, compact)
+    final_value, pnl, trades = backtest_strategy(
+        df, capital, exit_rules=exit_rules, leverage=leverage, stop_loss_pct=STOP_LOSS_PCT,
+        execution=execution,
+    )
+    df["equity"], df["exposure"], _ = equity_curve(df, trades, capital)
+    return df, name, final_value, pnl, trades
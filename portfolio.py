@@ -0,0 +1,294 @@
+"""
+Portfolio Backtest
+Runs a strategy across many symbols with one shared cash pool, sizing positions over (time x symbol) arrays
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from config import (
+    INITIAL_CAPITAL,
+    USE_MOCK_DATA,
+    STRATEGIES,
+    DEFAULT_STRATEGY,
+    DEFAULT_MARGIN,
+    AVAILABLE_STOCKS,
+    STOP_LOSS_PCT,
+)
+from backtest import BUY, simulate_events
+from custom_strategy import ATR_PERIOD
+from data_fetcher import fetch_historical_data
+from pipeline import resolve_leverage, apply_strategy
+from universe import FETCH_WORKERS
+
+SIZING_METHODS = ("equal_weight", "fixed_fraction", "vol_target")
+DEFAULT_SIZING = "equal_weight"
+DEFAULT_FRACTION = 0.10  # fixed_fraction: share of equity per open position
+DEFAULT_RISK_PER_TRADE = 0.01  # vol_target: equity risked per ATR_MULTIPLE * ATR move
+ATR_MULTIPLE = 2.0
+MAX_WEIGHT = 0.25  # vol_target: cap on a single position's share of equity
+REBALANCE_BAND = 0.02  # Skip rebalancing trades smaller than this share of equity
+
+
+def align_frames(frames, columns=("open", "high", "low", "close", "position")):
+    """
+    Align per-symbol candle frames on the union of their timestamps.
+
+    Args:
+        frames: Dict of symbol -> DataFrame with a timestamp column
+        columns: Columns to stack
+
+    Returns:
+        tuple: (timestamps DatetimeIndex, symbols list, {column: (T x N) float64 array},
+                valid (T x N) bool array marking bars the symbol actually traded)
+    """
+    symbols = list(frames)
+    index = pd.DatetimeIndex(
+        np.unique(np.concatenate([f["timestamp"].to_numpy() for f in frames.values()]))
+    )
+    arrays = {col: np.full((len(index), len(symbols)), np.nan) for col in columns}
+    valid = np.zeros((len(index), len(symbols)), dtype=bool)
+    for j, symbol in enumerate(symbols):
+        df = frames[symbol]
+        rows = index.get_indexer(df["timestamp"])
+        valid[rows, j] = True
+        for col in columns:
+            arrays[col][rows, j] = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+    return index, symbols, arrays, valid
+
+
+def _ffill(values):
+    """Forward-fill NaNs down each column of a (T x N) array."""
+    rows = np.where(np.isnan(values), 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return values[rows, np.arange(values.shape[1])]
+
+
+def average_true_range(high, low, close, period=ATR_PERIOD):
+    """
+    ATR of every symbol at once over (T x N) arrays; NaN until period bars are in.
+
+    Bars a symbol has no candle for are left out of its average rather than
+    counted as zero range; a window with no candles at all is NaN.
+    """
+    prev_close = np.vstack([np.full((1, close.shape[1]), np.nan), close[:-1]])
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    present = ~np.isnan(true_range)
+    atr = np.full_like(true_range, np.nan)
+    if len(true_range) < period:
+        return atr
+    csum = np.cumsum(np.where(present, true_range, 0.0), axis=0)
+    count = np.cumsum(present, axis=0)
+    window_sum = np.vstack([csum[period - 1:period], csum[period:] - csum[:-period]])
+    window_count = np.vstack([count[period - 1:period], count[period:] - count[:-period]])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        atr[period - 1:] = np.where(window_count > 0, window_sum / window_count, np.nan)
+    return atr
+
+
+def holding_mask(close, position_signal, exit_rules=None, stop_loss_pct=STOP_LOSS_PCT):
+    """
+    (T x N) mask of bars each symbol is held, from the single-symbol entry/exit rules.
+
+    Entries, stop-losses and exits follow backtest_strategy; a position is
+    held from its entry bar up to (not including) its exit bar. Sizing is
+    decided later, so one share is simulated per entry.
+    """
+    exit_rules = exit_rules or {}
+    hold = np.zeros(close.shape, dtype=bool)
+    for j in range(close.shape[1]):
+        if np.isnan(close[:, j]).all():
+            continue
+        steps = np.zeros(len(close) + 1, dtype=np.int64)
+        # Buying power of the highest price guarantees the one-share entry always fills
+        events = simulate_events(
+            close[:, j], position_signal[:, j], float(np.nanmax(close[:, j])), 1, stop_loss_pct,
+            exit_rules.get("take_profit_rs"), exit_rules.get("hold_max_days"),
+        )
+        for i, side, _ in events:
+            steps[i] += 1 if side == BUY else -1
+        hold[:, j] = np.cumsum(steps[:-1]) > 0
+    return hold
+
+
+def target_weights(hold, close, atr, sizing=DEFAULT_SIZING, leverage=1, fraction=DEFAULT_FRACTION,
+                   risk_per_trade=DEFAULT_RISK_PER_TRADE, max_weight=MAX_WEIGHT):
+    """
+    Target share of equity per symbol and bar, as one (T x N) array.
+
+    equal_weight splits leverage x equity evenly across the open positions,
+    fixed_fraction gives each open position `fraction` of equity, and
+    vol_target sizes so an ATR_MULTIPLE * ATR move costs risk_per_trade of
+    equity (capped at max_weight). Rows are scaled down so gross exposure
+    never exceeds leverage.
+    """
+    if sizing not in SIZING_METHODS:
+        raise ValueError(f"Unknown sizing method: {sizing}")
+    held = hold.astype(np.float64)
+    if sizing == "equal_weight":
+        count = held.sum(axis=1, keepdims=True)
+        weights = np.divide(held * leverage, count, out=np.zeros_like(held), where=count > 0)
+    elif sizing == "fixed_fraction":
+        weights = held * fraction
+    else:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            vol_weight = risk_per_trade * close / (ATR_MULTIPLE * atr)
+        weights = held * np.nan_to_num(np.minimum(vol_weight, max_weight), nan=0.0, posinf=0.0)
+    gross = weights.sum(axis=1, keepdims=True)
+    scale = np.divide(leverage, gross, out=np.ones_like(gross), where=gross > leverage)
+    return weights * scale
+
+
+def simulate_portfolio(close, weights, valid, capital=INITIAL_CAPITAL, leverage=1, rebalance=True,
+                       band=REBALANCE_BAND):
+    """
+    Trade whole shares towards the target weights bar by bar from one cash pool.
+
+    Each bar is a handful of vector operations across all symbols. Orders
+    fill at the bar's close; symbols without a bar that day are left as they
+    are. With rebalance=False a position keeps its entry size until exit.
+    Buys never take gross exposure above leverage x equity.
+
+    Returns:
+        tuple: (shares (T x N) int64, cash (T,), equity (T,))
+    """
+    n_bars, n_symbols = close.shape
+    price = np.nan_to_num(_ffill(close))
+    shares = np.zeros((n_bars, n_symbols), dtype=np.int64)
+    cash = np.empty(n_bars)
+    equity = np.empty(n_bars)
+    held = np.zeros(n_symbols, dtype=np.int64)
+    balance = float(capital)
+
+    for t in range(n_bars):
+        px = price[t]
+        value = balance + held @ px
+        tradable = valid[t] & (px > 0)
+        target = np.zeros(n_symbols, dtype=np.int64)
+        np.floor_divide(weights[t] * value, px, out=target, where=tradable, casting="unsafe")
+        target = np.where(tradable, np.maximum(target, 0), held)
+        if not rebalance:
+            # Only open and close positions; open positions keep their size
+            target = np.where((held > 0) & (target > 0), held, target)
+        elif band > 0:
+            # Ignore small drifts; always act on entries and exits
+            small = np.abs(target - held) * px < band * value
+            target = np.where(small & (held > 0) & (target > 0), held, target)
+        # Sell first, trim what is left if price moves took it over the cap,
+        # then scale buys down to the remaining buying power so gross
+        # exposure stays within leverage x equity
+        delta = target - held
+        buys = np.maximum(delta, 0)
+        kept = held + np.minimum(delta, 0)
+        cap = leverage * value
+        gross = kept @ px
+        if gross > cap:
+            fixed = np.where(tradable, 0, kept) @ px
+            movable = gross - fixed
+            scale = max(cap - fixed, 0.0) / movable if movable > 0 else 1.0
+            kept = np.where(tradable, np.floor(kept * scale).astype(np.int64), kept)
+            buys[:] = 0
+        room = max(cap - kept @ px, 0.0)
+        cost = buys @ px
+        if cost > room:
+            buys = (buys * (room / cost)).astype(np.int64)
+        target = kept + buys
+        balance -= (target - held) @ px
+        held = target
+        shares[t] = held
+        cash[t] = balance
+        equity[t] = balance + held @ px
+    return shares, cash, equity
+
+
+def run_portfolio_backtest(frames, strategy_id=None, custom_strategy=None, sizing=DEFAULT_SIZING,
+                           capital=INITIAL_CAPITAL, leverage=1, rebalance=True, **sizing_params):
+    """
+    Backtest one strategy over several symbols sharing a single cash pool.
+
+    Args:
+        frames: Dict of symbol -> candle DataFrame (from fetch_historical_data)
+        strategy_id / custom_strategy: As for pipeline.apply_strategy
+        sizing: 'equal_weight', 'fixed_fraction' or 'vol_target'
+        leverage: Max gross exposure as a multiple of equity
+        rebalance: Rebalance open positions to their target weight every bar
+        **sizing_params: fraction, risk_per_trade, max_weight (see target_weights)
+
+    Returns:
+        dict with final_value, pnl, pnl_percent, timestamps, symbols, equity,
+        cash, shares (T x N) and trades [(timestamp, symbol, side, price, qty)]
+    """
+    signals = {}
+    exit_rules = None
+    for symbol, df in frames.items():
+        df, exit_rules, strategy_name = apply_strategy(df.copy(), strategy_id, custom_strategy)
+        signals[symbol] = df
+    timestamps, symbols, arrays, valid = align_frames(signals)
+    close = arrays["close"]
+
+    hold = holding_mask(close, arrays["position"], exit_rules)
+    atr = average_true_range(arrays["high"], arrays["low"], close) if sizing == "vol_target" else None
+    weights = target_weights(hold, close, atr, sizing, leverage, **sizing_params)
+    shares, cash, equity = simulate_portfolio(close, weights, valid, capital, leverage, rebalance)
+
+    # Every change in share count is a fill at that bar's close
+    changes = np.diff(shares, axis=0, prepend=0)
+    rows, cols = np.nonzero(changes)
+    trades = [
+        (timestamps[i], symbols[j], "BUY" if changes[i, j] > 0 else "SELL",
+         close[i, j], int(abs(changes[i, j])))
+        for i, j in zip(rows, cols)
+    ]
+    final_value = float(equity[-1]) if len(equity) else float(capital)
+    pnl = final_value - capital
+    return {
+        "strategy": strategy_name,
+        "sizing": sizing,
+        "final_value": round(final_value, 2),
+        "pnl": round(pnl, 2),
+        "pnl_percent": round(pnl / capital * 100, 2),
+        "total_trades": len(trades),
+        "timestamps": timestamps,
+        "symbols": symbols,
+        "equity": equity,
+        "cash": cash,
+        "shares": shares,
+        "trades": trades,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest a strategy as one portfolio across symbols")
+    parser.add_argument("--symbols", help="Comma-separated symbols (default: config.AVAILABLE_STOCKS)")
+    parser.add_argument("--strategy", default=DEFAULT_STRATEGY, choices=list(STRATEGIES))
+    parser.add_argument("--margin", default=DEFAULT_MARGIN)
+    parser.add_argument("--sizing", default=DEFAULT_SIZING, choices=SIZING_METHODS)
+    parser.add_argument("--no-rebalance", action="store_true", help="Size positions at entry only")
+    args = parser.parse_args()
+
+    symbols = [s.strip() for s in args.symbols.split(",")] if args.symbols else [
+        s["symbol"] for s in AVAILABLE_STOCKS]
+    with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(symbols))) as pool:
+        frames = dict(zip(symbols, pool.map(
+            lambda symbol: fetch_historical_data(symbol, use_mock=USE_MOCK_DATA), symbols)))
+
+    start = time.perf_counter()
+    result = run_portfolio_backtest(
+        frames, strategy_id=args.strategy, sizing=args.sizing,
+        leverage=resolve_leverage(args.margin), rebalance=not args.no_rebalance,
+    )
+    elapsed = time.perf_counter() - start
+
+    print(f"\n📊 Portfolio: {result['strategy']} | {len(symbols)} symbols | sizing: {result['sizing']}")
+    print(f"Initial Capital: ₹{INITIAL_CAPITAL:,.2f}")
+    print(f"Final Value: ₹{result['final_value']:,.2f}")
+    print(f"PnL: ₹{result['pnl']:,.2f} ({result['pnl_percent']}%)")
+    print(f"Trades: {result['total_trades']}")
+    print(f"⏱  {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
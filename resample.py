@@ -0,0 +1,291 @@
+"""
+Timeframe Resampling
+Derives 5m-1d OHLCV candles from one stored base interval over NSE sessions, cached and updated incrementally
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from config import RESAMPLE_CACHE_SIZE
+import metrics
+
+SESSION_START_UTC = pd.Timedelta(hours=3, minutes=45)  # 09:15 IST
+SESSION_END_UTC = pd.Timedelta(hours=10)  # 15:30 IST
+RESAMPLE_MINUTES = {"1m": 1, "5m": 5, "15m": 15, "30m": 30, "1h": 60, "1d": None}
+
+_NS_PER_DAY = 86_400 * 10 ** 9
+_NS_PER_MINUTE = 60 * 10 ** 9
+_SESSION_START_NS = SESSION_START_UTC.value
+_SESSION_LENGTH_NS = (SESSION_END_UTC - SESSION_START_UTC).value
+
+_hits = metrics.counter("resample_cache_hits_total", "Derived timeframe requests with no new base candles")
+_updates = metrics.counter("resample_cache_updates_total", "Derived timeframe requests that resampled only new base candles")
+_rebuilds = metrics.counter("resample_cache_rebuilds_total", "Derived timeframe requests that resampled the whole base series")
+
+OHLCV_COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
+
+
+def bucket_starts(timestamps, interval):
+    """
+    Start of the session-aligned bucket each timestamp falls in.
+
+    Intraday buckets are counted from the 09:15 IST open, so 1h candles
+    start at 09:15, 10:15, ... and the last one of the day (15:15) is
+    15 minutes long; 1d buckets are labelled with the session open.
+
+    Args:
+        timestamps: Naive-UTC datetime64 values (array or Series)
+        interval: A key of RESAMPLE_MINUTES
+
+    Returns:
+        tuple: (int64 nanosecond bucket starts, bool mask of in-session timestamps)
+    """
+    if interval not in RESAMPLE_MINUTES:
+        raise ValueError(f"Cannot resample to {interval}")
+    ts = np.asarray(timestamps, dtype="datetime64[ns]").view("i8")
+    day = ts - ts % _NS_PER_DAY
+    offset = ts - day - _SESSION_START_NS
+    in_session = (offset >= 0) & (offset < _SESSION_LENGTH_NS)
+    minutes = RESAMPLE_MINUTES[interval]
+    if minutes is None:
+        return day + _SESSION_START_NS, in_session
+    step = minutes * _NS_PER_MINUTE
+    return day + _SESSION_START_NS + offset // step * step, in_session
+
+
+def resample_ohlcv(df, interval):
+    """
+    Aggregate sorted base candles into interval candles, one pass with no groupby.
+
+    Candles outside the 09:15-15:30 IST session (pre-open, post-close) are
+    dropped. Bucket edges come from a single comparison of neighbouring
+    bucket starts; open/close are the first/last candle of each bucket and
+    high/low/volume are reduced with numpy's reduceat.
+
+    Args:
+        df: DataFrame with timestamp, open, high, low, close, volume sorted by timestamp
+        interval: Target interval (a key of RESAMPLE_MINUTES)
+
+    Returns:
+        pandas.DataFrame with the same columns, timestamps at bucket starts
+    """
+    keys, in_session = bucket_starts(df["timestamp"].to_numpy(), interval)
+    keys = keys[in_session]
+    if len(keys) == 0:
+        return pd.DataFrame({col: pd.Series(dtype=df[col].dtype) for col in OHLCV_COLUMNS})
+
+    cols = {col: df[col].to_numpy()[in_session] for col in OHLCV_COLUMNS[1:]}
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    ends = np.append(starts[1:], len(keys)) - 1
+    return pd.DataFrame({
+        "timestamp": keys[starts].view("datetime64[ns]"),
+        "open": cols["open"][starts],
+        "high": np.maximum.reduceat(cols["high"], starts),
+        "low": np.minimum.reduceat(cols["low"], starts),
+        "close": cols["close"][ends],
+        "volume": np.add.reduceat(cols["volume"], starts),
+    })
+
+
+def completed_rows(timestamps, interval, candle_minutes=None):
+    """
+    For each candle, the row of resample_ohlcv(candles, interval) last completed at that candle's close.
+
+    A bucket counts as complete from the last candle inside it, so a candle
+    never sees the bucket it is still in and an as-of join on these rows has
+    no look-ahead. The final bucket may still be forming: it only counts once
+    its last candle (candle_minutes long) reaches the bucket's end. The
+    lookup is one searchsorted over bucket end positions.
+
+    Args:
+        timestamps: Sorted naive-UTC candle timestamps
+        interval: Coarser interval the resampled frame was built with
+        candle_minutes: Length of one candle (None: the final bucket is never complete)
+
+    Returns:
+        int64 array of row positions, -1 before the first bucket completes
+    """
+    keys, in_session = bucket_starts(timestamps, interval)
+    positions = np.flatnonzero(in_session)
+    keys = keys[in_session]
+    if len(keys) == 0:
+        return np.full(len(in_session), -1, dtype=np.int64)
+    ends = positions[np.append(np.flatnonzero(keys[1:] != keys[:-1]), len(keys) - 1)]
+
+    last_key = keys[-1]
+    session_end = last_key - (last_key - _SESSION_START_NS) % _NS_PER_DAY + _SESSION_LENGTH_NS
+    minutes = RESAMPLE_MINUTES[interval]
+    bucket_end = session_end if minutes is None else min(last_key + minutes * _NS_PER_MINUTE, session_end)
+    last_ts = np.asarray(timestamps, dtype="datetime64[ns]").view("i8")[ends[-1]]
+    if candle_minutes is None or last_ts + candle_minutes * _NS_PER_MINUTE < bucket_end:
+        ends = ends[:-1]
+    return np.searchsorted(ends, np.arange(len(in_session)), side="right") - 1
+
+
+def take_rows(values, rows):
+    """values[rows] as float64, NaN where rows is -1."""
+    out = np.full(len(rows), np.nan)
+    found = rows >= 0
+    out[found] = values[rows[found]]
+    return out
+
+
+class ResampledSeries:
+    """
+    A base candle series and the timeframes derived from it so far.
+
+    update() appends new base candles and re-aggregates only from the first
+    bucket they touch, so a minute of new data costs a few rows of work
+    rather than a full resample.
+    """
+
+    def __init__(self, base):
+        self.base = base[OHLCV_COLUMNS].reset_index(drop=True)
+        self.frames = {}
+
+    def get(self, interval):
+        frame = self.frames.get(interval)
+        if frame is None:
+            frame = self.frames[interval] = resample_ohlcv(self.base, interval)
+        return frame
+
+    def update(self, new_bars):
+        """
+        Merge base candles at or after the last stored one (they replace it, as it may have been partial).
+
+        Returns:
+            int: Number of base candles that were new or replaced
+        """
+        if len(new_bars) == 0:
+            return 0
+        first = new_bars["timestamp"].iloc[0]
+        keep = self.base["timestamp"].searchsorted(first, side="left")
+        self.base = pd.concat(
+            [self.base.iloc[:keep], new_bars[OHLCV_COLUMNS]], ignore_index=True
+        )
+        for interval, frame in self.frames.items():
+            start = bucket_starts(np.array([first.to_datetime64()]), interval)[0][0]
+            start = pd.Timestamp(start)
+            tail = self.base.iloc[self.base["timestamp"].searchsorted(start, side="left"):]
+            head = frame.iloc[:frame["timestamp"].searchsorted(start, side="left")]
+            self.frames[interval] = pd.concat([head, resample_ohlcv(tail, interval)], ignore_index=True)
+        return len(new_bars)
+
+
+class TimeframeCache:
+    """
+    LRU of ResampledSeries keyed by (symbol, exchange, base interval).
+
+    Each request passes the current base window (e.g. straight from the
+    candle store); the cache compares it with what it has seen and either
+    serves the derived frame as is, resamples only the new tail, or
+    rebuilds when the history itself changed (a backfill or a longer window).
+    """
+
+    def __init__(self, max_entries=RESAMPLE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.updates = 0
+        self.rebuilds = 0
+
+    def frame(self, key, base, interval):
+        """
+        Candles of base resampled to interval, covering the same window as base.
+
+        Args:
+            key: Hashable identity of the base series, e.g. (symbol, exchange, "1m")
+            base: Sorted base candle DataFrame
+            interval: Target interval
+
+        Returns:
+            pandas.DataFrame (a copy, safe to add columns to)
+        """
+        if len(base) == 0:
+            return resample_ohlcv(base, interval)
+        with self._lock:
+            series = self._entries.get(key)
+            base_ts = base["timestamp"]
+            if series is not None and self._extends(series.base["timestamp"], base_ts):
+                new = base.iloc[base_ts.searchsorted(series.base["timestamp"].iloc[-1], side="left"):]
+                last = series.base.iloc[-1:]
+                if len(new) == 1 and (new[OHLCV_COLUMNS].to_numpy() == last[OHLCV_COLUMNS].to_numpy()).all():
+                    self.hits += 1
+                    _hits.inc()
+                else:
+                    series.update(new)
+                    self.updates += 1
+                    _updates.inc()
+            else:
+                series = ResampledSeries(base)
+                self.rebuilds += 1
+                _rebuilds.inc()
+            self._entries[key] = series
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            frame = series.get(interval)
+
+        # Whole buckets inside the window (the cached series may reach further back)
+        start = frame["timestamp"].searchsorted(base_ts.iloc[0], side="left")
+        return frame.iloc[start:].reset_index(drop=True).copy()
+
+    @staticmethod
+    def _extends(cached_ts, base_ts):
+        """True if base_ts is cached_ts (possibly trimmed at the front) plus candles after its end."""
+        if base_ts.iloc[0] < cached_ts.iloc[0] or base_ts.iloc[-1] < cached_ts.iloc[-1]:
+            return False
+        # Same candles from base's first timestamp up to the cached end: compare counts
+        cached_from = len(cached_ts) - cached_ts.searchsorted(base_ts.iloc[0], side="left")
+        base_until = base_ts.searchsorted(cached_ts.iloc[-1], side="right")
+        return cached_from == base_until and base_until > 0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.updates + self.rebuilds
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "updates": self.updates,
+                "rebuilds": self.rebuilds,
+                "hit_ratio": (self.hits + self.updates) / requests if requests else 0.0,
+            }
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_timeframe_cache():
+    """Process-wide TimeframeCache configured from config."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = TimeframeCache()
+        return _default_cache
+
+
+metrics.gauge(
+    "resample_cache_hit_ratio", "Share of derived timeframe requests served without a full resample",
+    lambda: get_timeframe_cache().stats()["hit_ratio"],
+)
+
+
+def session_timestamps(sessions, interval_minutes, end=None):
+    """
+    Candle start times for the last `sessions` weekday sessions up to end (default today).
+
+    Returns:
+        pandas.DatetimeIndex of naive-UTC timestamps
+    """
+    days = pd.bdate_range(end=pd.Timestamp(end or pd.Timestamp.now()).normalize(), periods=sessions)
+    offsets = pd.timedelta_range(SESSION_START_UTC, SESSION_END_UTC, freq=f"{interval_minutes}min",
+                                 closed="left")
+    return pd.DatetimeIndex((days.values[:, None] + offsets.values[None, :]).ravel())
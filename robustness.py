@@ -0,0 +1,376 @@
+"""
+Robustness Analysis
+Monte Carlo trade shuffles, block-bootstrapped returns and noise-perturbed prices with confidence intervals
+"""
+import argparse
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from config import (
+    INITIAL_CAPITAL,
+    STRATEGIES,
+    DEFAULT_STRATEGY,
+    DEFAULT_SYMBOL,
+    DEFAULT_MARGIN,
+    USE_MOCK_DATA,
+    STOP_LOSS_PCT,
+    ROBUSTNESS_RESAMPLES,
+    ROBUSTNESS_NOISE_PATHS,
+    ROBUSTNESS_NOISE_PCT,
+    ROBUSTNESS_BLOCK_BARS,
+    ROBUSTNESS_CONFIDENCE,
+    ROBUSTNESS_BATCH_CELLS,
+    ROBUSTNESS_PARALLEL_CELLS,
+)
+from analytics import equity_curve, periods_per_year, round_trips
+from backtest import backtest_arrays, equity_from_fills
+from custom_strategy import compute_indicators, execute_custom_strategy, required_indicators
+from data_fetcher import fetch_historical_data
+from optimizer import FeatureCache, strategy_positions
+from pipeline import resolve_leverage, run_strategy_backtest
+
+METHODS = ("shuffle", "bootstrap", "noise")
+NOISE_BATCH_PATHS = 25  # Each noise path re-runs the strategy, so its batches are small
+
+# Parameters of the predefined strategies as strategy.py runs them (see optimizer.SIGNAL_BUILDERS)
+STRATEGY_PARAMS = {"SMA Crossover": {"fast": 20, "slow": 50}}
+
+
+def path_metrics(equity, capital, periods):
+    """
+    Final value, max drawdown and Sharpe of every row of a (paths x steps) equity matrix.
+
+    Each path starts from capital, which is prepended before returns and
+    drawdowns are taken. Sharpe is annualised with `periods` steps per year
+    (NaN for a path whose returns never vary).
+
+    Returns:
+        dict of 1-D arrays: final_value, max_drawdown_pct, sharpe
+    """
+    equity = np.hstack([np.full((len(equity), 1), float(capital)), equity])
+    drawdown = equity / np.maximum.accumulate(equity, axis=1) - 1
+    returns = np.diff(equity, axis=1) / equity[:, :-1]
+    std = returns.std(axis=1, ddof=1) if returns.shape[1] > 1 else np.full(len(equity), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(std > 0, returns.mean(axis=1) / std * math.sqrt(periods), np.nan)
+    return {
+        "final_value": equity[:, -1],
+        "max_drawdown_pct": drawdown.min(axis=1) * 100,
+        "sharpe": sharpe,
+    }
+
+
+def _round(value, digits=2):
+    return None if value is None or not math.isfinite(value) else round(float(value), digits)
+
+
+def summarize(metrics, observed, capital, confidence=ROBUSTNESS_CONFIDENCE):
+    """
+    Confidence interval of each metric across paths, next to the observed backtest.
+
+    Returns:
+        dict: paths, prob_loss_pct and, per metric, observed/mean/median/low/high
+    """
+    tail = (1 - confidence) / 2 * 100
+    summary = {"paths": int(len(metrics["final_value"])), "confidence": confidence}
+    for name, values in metrics.items():
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            low = high = mean = median = None
+        else:
+            low, median, high = np.percentile(values, [tail, 50, 100 - tail])
+            mean = values.mean()
+        summary[name] = {
+            "observed": _round(observed.get(name)),
+            "mean": _round(mean),
+            "median": _round(median),
+            "low": _round(low),
+            "high": _round(high),
+        }
+    summary["prob_loss_pct"] = _round((metrics["final_value"] < capital).mean() * 100)
+    return summary
+
+
+# --- Batch workers ---
+# Each takes a path count and its own SeedSequence, so results depend only on
+# the seed and batch layout, not on how many processes ran them. Shared
+# inputs are set once per worker process by the pool initializer.
+
+_worker_shared = None
+
+
+def _init_worker(shared):
+    global _worker_shared
+    _worker_shared = shared
+
+
+def _shuffle_batch(count, seed_seq, shared=None):
+    """Trade pnl in a random order per path: same total, different drawdowns."""
+    shared = shared or _worker_shared
+    rng = np.random.default_rng(seed_seq)
+    pnl = rng.permuted(np.broadcast_to(shared["pnl"], (count, len(shared["pnl"]))), axis=1)
+    return path_metrics(shared["capital"] + np.cumsum(pnl, axis=1), shared["capital"], shared["periods"])
+
+
+def _bootstrap_batch(count, seed_seq, shared=None):
+    """Per-bar returns rebuilt from randomly placed circular blocks."""
+    shared = shared or _worker_shared
+    rng = np.random.default_rng(seed_seq)
+    returns, block = shared["returns"], shared["block"]
+    n = len(returns)
+    blocks = -(-n // block)
+    starts = rng.integers(0, n, size=(count, blocks, 1))
+    rows = ((starts + np.arange(block)) % n).reshape(count, blocks * block)[:, :n]
+    equity = shared["capital"] * np.cumprod(1 + returns[rows], axis=1)
+    return path_metrics(equity, shared["capital"], shared["periods"])
+
+
+def _path_position(path, strategy_id, custom_strategy):
+    """Position array of a strategy on one candle frame, bypassing the indicator cache."""
+    if custom_strategy:
+        buy, sell = custom_strategy.get("buy_conditions", []), custom_strategy.get("sell_conditions", [])
+        buy_logic, sell_logic = custom_strategy.get("buy_logic", "AND"), custom_strategy.get("sell_logic", "AND")
+        # Computed up front without the cache, which would only fill up with one-off paths
+        compute_indicators(path, required_indicators(buy, buy_logic) + required_indicators(sell, sell_logic),
+                           use_cache=False)
+        path = execute_custom_strategy(path, buy, sell, buy_logic, sell_logic)
+        return path["position"].to_numpy(dtype=np.float64, na_value=np.nan)
+    params = STRATEGY_PARAMS.get(strategy_id, {})
+    return strategy_positions(FeatureCache(path), strategy_id, [params])[0]
+
+
+def _noise_batch(count, seed_seq, shared=None):
+    """
+    Candles with every bar's prices scaled by 1 + N(0, noise), the strategy re-run on each.
+
+    Like generate_mock_data's gaussian noise around a trend, the
+    perturbation is independent per bar, so the path keeps its trend while
+    every indicator and crossover sees slightly different prices.
+    """
+    shared = shared or _worker_shared
+    rng = np.random.default_rng(seed_seq)
+    df = shared["df"]
+    n = len(df)
+    factors = 1 + rng.normal(0, shared["noise_pct"] / 100, size=(count, n))
+    prices = {col: df[col].to_numpy(dtype=np.float64) * factors for col in ("open", "high", "low", "close")}
+    prices["high"] = np.maximum.reduce([prices["open"], prices["high"], prices["close"]])
+    prices["low"] = np.minimum.reduce([prices["open"], prices["low"], prices["close"]])
+
+    exit_rules = None if shared["custom_strategy"] else STRATEGIES[shared["strategy_id"]].get("exit_rules")
+    equity = np.empty((count, n))
+    for k in range(count):
+        path = df.copy()
+        for col, values in prices.items():
+            path[col] = values[k]
+        position = _path_position(path, shared["strategy_id"], shared["custom_strategy"])
+        close = prices["close"][k]
+        _, _, fills = backtest_arrays(
+            close, position, shared["capital"], exit_rules, shared["leverage"], STOP_LOSS_PCT
+        )
+        equity[k], _ = equity_from_fills(close, fills, shared["capital"])
+    return path_metrics(equity, shared["capital"], shared["periods"])
+
+
+def _run_batches(batch_fn, paths, batch_paths, shared, seed, parallel, max_workers=None):
+    """Run paths in batches (in worker processes when parallel) and concatenate their metrics."""
+    sizes = [min(batch_paths, paths - start) for start in range(0, paths, batch_paths)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    max_workers = min(max_workers or os.cpu_count() or 1, len(sizes))
+    if not parallel or max_workers == 1:
+        results = [batch_fn(size, seq, shared) for size, seq in zip(sizes, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(shared,)) as pool:
+            results = list(pool.map(batch_fn, sizes, seeds))
+    return {name: np.concatenate([r[name] for r in results]) for name in results[0]}
+
+
+def _cells_batch(steps):
+    return max(1, ROBUSTNESS_BATCH_CELLS // max(1, steps))
+
+
+def shuffle_trades(trade_pnl, capital=INITIAL_CAPITAL, periods=None, resamples=ROBUSTNESS_RESAMPLES,
+                   seed=42, max_workers=None):
+    """
+    Metrics of the closed trades replayed in `resamples` random orders.
+
+    The final value is the same on every path (the pnl only moves around);
+    the drawdown and Sharpe intervals show how much the observed ones owe
+    to the order trades happened to come in.
+
+    Args:
+        trade_pnl: Net pnl per closed trade (analytics.round_trips)
+        periods: Trades per year for the Sharpe (default: one per day)
+
+    Returns:
+        dict of per-path metric arrays (see path_metrics)
+    """
+    trade_pnl = np.asarray(trade_pnl, dtype=np.float64)
+    if len(trade_pnl) == 0:
+        raise ValueError("No closed trades to shuffle")
+    shared = {"pnl": trade_pnl, "capital": capital, "periods": periods or 252}
+    steps = len(trade_pnl)
+    return _run_batches(_shuffle_batch, resamples, _cells_batch(steps), shared, seed,
+                        resamples * steps > ROBUSTNESS_PARALLEL_CELLS, max_workers)
+
+
+def block_bootstrap(returns, capital=INITIAL_CAPITAL, periods=252, resamples=ROBUSTNESS_RESAMPLES,
+                    block_bars=ROBUSTNESS_BLOCK_BARS, seed=42, max_workers=None):
+    """
+    Metrics of `resamples` equity paths rebuilt from blocks of the per-bar strategy returns.
+
+    Circular blocks of block_bars consecutive returns keep the short-range
+    autocorrelation (holding periods, volatility clusters) that resampling
+    single bars would destroy.
+
+    Args:
+        returns: Per-bar strategy returns (equity pct changes)
+        periods: Bars per year for the Sharpe
+
+    Returns:
+        dict of per-path metric arrays (see path_metrics)
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    if len(returns) < 2:
+        raise ValueError("Need at least two bars of returns to bootstrap")
+    shared = {"returns": returns, "block": max(1, min(int(block_bars), len(returns))),
+              "capital": capital, "periods": periods}
+    steps = len(returns)
+    return _run_batches(_bootstrap_batch, resamples, _cells_batch(steps), shared, seed,
+                        resamples * steps > ROBUSTNESS_PARALLEL_CELLS, max_workers)
+
+
+def noise_paths(df, strategy_id=DEFAULT_STRATEGY, custom_strategy=None, capital=INITIAL_CAPITAL, leverage=1,
+                paths=ROBUSTNESS_NOISE_PATHS, noise_pct=ROBUSTNESS_NOISE_PCT, seed=42, max_workers=None):
+    """
+    Metrics of the strategy re-run on `paths` noise-perturbed copies of df's candles.
+
+    Unlike the resampling methods this re-generates signals, so it shows
+    whether the result survives small changes in the prices themselves.
+    Batches run across worker processes (max_workers=1 keeps them in-process).
+
+    Returns:
+        dict of per-path metric arrays (see path_metrics)
+    """
+    if not custom_strategy and strategy_id not in STRATEGIES:
+        strategy_id = DEFAULT_STRATEGY
+    shared = {
+        "df": df[["timestamp", "open", "high", "low", "close", "volume"]].reset_index(drop=True),
+        "strategy_id": strategy_id, "custom_strategy": custom_strategy, "capital": capital,
+        "leverage": leverage, "noise_pct": noise_pct, "periods": periods_per_year(df["timestamp"]),
+    }
+    return _run_batches(_noise_batch, paths, NOISE_BATCH_PATHS, shared, seed, True, max_workers)
+
+
+def observed_metrics(equity, capital, periods):
+    """path_metrics of the backtest's own equity curve, as plain floats."""
+    return {name: float(values[0]) for name, values in path_metrics(equity[None, :], capital, periods).items()}
+
+
+def analyze_robustness(df, trades, equity=None, strategy_id=DEFAULT_STRATEGY, custom_strategy=None,
+                       capital=INITIAL_CAPITAL, leverage=1, methods=METHODS, resamples=ROBUSTNESS_RESAMPLES,
+                       noise_paths_count=ROBUSTNESS_NOISE_PATHS, noise_pct=ROBUSTNESS_NOISE_PCT,
+                       block_bars=ROBUSTNESS_BLOCK_BARS, confidence=ROBUSTNESS_CONFIDENCE, seed=42,
+                       max_workers=None):
+    """
+    Confidence intervals for final value, max drawdown and Sharpe of one backtest.
+
+    Args:
+        df: Candle DataFrame the backtest ran on
+        trades: backtest_strategy trades
+        equity: Per-bar equity (computed from trades if omitted)
+        strategy_id / custom_strategy: The strategy, re-run by the noise method
+        methods: Any of "shuffle" (trade order), "bootstrap" (block bootstrap
+            of per-bar returns) and "noise" (perturbed prices)
+
+    Returns:
+        dict with observed metrics and one summary per method (see summarize);
+        a method that cannot run (e.g. shuffling with no closed trades) maps
+        to {"error": ...}
+    """
+    unknown = set(methods) - set(METHODS)
+    if unknown:
+        raise ValueError(f"Unknown robustness method(s): {', '.join(sorted(unknown))}")
+    if equity is None:
+        equity, _, _ = equity_curve(df, trades, capital)
+    equity = np.asarray(equity, dtype=np.float64)
+    periods = periods_per_year(df["timestamp"])
+    observed = observed_metrics(equity, capital, periods)
+    result = {"observed": {name: _round(value) for name, value in observed.items()}, "bars": len(df)}
+
+    for method in methods:
+        try:
+            if method == "shuffle":
+                pnl = round_trips(trades, df["timestamp"])["pnl"]
+                span = df["timestamp"].iloc[-1] - df["timestamp"].iloc[0] if len(df) > 1 else None
+                years = span.total_seconds() / (365.25 * 86400) if span is not None else 0
+                per_year = len(pnl) / years if years > 0 else None
+                metrics = shuffle_trades(pnl, capital, per_year, resamples, seed, max_workers)
+                # Closed trades only: a position still open at the end is not shuffled
+                shuffled_observed = observed_metrics(capital + np.cumsum(pnl), capital, per_year or 252)
+                result[method] = summarize(metrics, shuffled_observed, capital, confidence)
+            elif method == "bootstrap":
+                returns = np.diff(equity) / equity[:-1]
+                metrics = block_bootstrap(returns, capital, periods, resamples, block_bars, seed, max_workers)
+                result[method] = summarize(metrics, observed, capital, confidence)
+            else:
+                metrics = noise_paths(df, strategy_id, custom_strategy, capital, leverage, noise_paths_count,
+                                      noise_pct, seed, max_workers)
+                result[method] = summarize(metrics, observed, capital, confidence)
+        except ValueError as e:
+            result[method] = {"error": str(e)}
+    return result
+
+
+def print_report(result):
+    labels = {"final_value": "Final value (₹)", "max_drawdown_pct": "Max drawdown %", "sharpe": "Sharpe"}
+    print("\nObserved: " + "  ".join(f"{labels[k]} {v}" for k, v in result["observed"].items()))
+    for method in METHODS:
+        summary = result.get(method)
+        if summary is None:
+            continue
+        if "error" in summary:
+            print(f"\n❌ {method}: {summary['error']}")
+            continue
+        level = round(summary["confidence"] * 100)
+        print(f"\n{method} ({summary['paths']:,} paths, {level}% interval, P(loss) {summary['prob_loss_pct']}%)")
+        for name, label in labels.items():
+            s = summary[name]
+            print(f"  {label:<16} observed {s['observed']}  median {s['median']}  [{s['low']}, {s['high']}]")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo robustness analysis of a backtest")
+    parser.add_argument("--symbol", default=DEFAULT_SYMBOL)
+    parser.add_argument("--strategy", default=DEFAULT_STRATEGY, choices=list(STRATEGIES))
+    parser.add_argument("--margin", default=DEFAULT_MARGIN)
+    parser.add_argument("--days", type=int, default=365, help="History to fetch")
+    parser.add_argument("--methods", default=",".join(METHODS), help="Comma-separated subset of " + ",".join(METHODS))
+    parser.add_argument("--resamples", type=int, default=ROBUSTNESS_RESAMPLES, help="Shuffle/bootstrap paths")
+    parser.add_argument("--noise-paths", type=int, default=ROBUSTNESS_NOISE_PATHS)
+    parser.add_argument("--noise-pct", type=float, default=ROBUSTNESS_NOISE_PCT)
+    parser.add_argument("--block", type=int, default=ROBUSTNESS_BLOCK_BARS, help="Bootstrap block length in bars")
+    parser.add_argument("--confidence", type=float, default=ROBUSTNESS_CONFIDENCE)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    df = fetch_historical_data(args.symbol, use_mock=USE_MOCK_DATA, days=args.days)
+    leverage = resolve_leverage(args.margin)
+    df, strategy_name, final_value, pnl, trades = run_strategy_backtest(df, args.strategy, leverage=leverage)
+    print(f"\n🎲 Robustness: {strategy_name} on {args.symbol} | {len(df)} bars, {len(trades)} orders, "
+          f"PnL ₹{pnl:,.2f}")
+    result = analyze_robustness(
+        df, trades, df["equity"].to_numpy(), args.strategy, capital=INITIAL_CAPITAL, leverage=leverage,
+        methods=[m.strip() for m in args.methods.split(",") if m.strip()], resamples=args.resamples,
+        noise_paths_count=args.noise_paths, noise_pct=args.noise_pct, block_bars=args.block,
+        confidence=args.confidence, seed=args.seed, max_workers=args.workers,
+    )
+    print_report(result)
+
+
+if __name__ == "__main__":
+    main()
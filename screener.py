@@ -0,0 +1,326 @@
+"""
+Universe Screener
+Evaluates a strategy's latest-bar signal for many symbols at once from stored candles and ranks the matches
+"""
+import argparse
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from config import (
+    USE_MOCK_DATA,
+    STRATEGIES,
+    DEFAULT_STRATEGY,
+    AVAILABLE_STOCKS,
+    DEFAULT_INTERVAL,
+    RESAMPLE_BASE_INTERVAL,
+    RESAMPLE_DERIVED_INTERVALS,
+    SCREENER_BARS,
+    SCREENER_LIMIT,
+)
+import strategy as strategy_module
+from candle_store import CANDLE_COLUMNS, get_candle_store, frame_to_records, records_to_frame
+from conditions import compile_conditions, evaluate_strategy, split_timeframe
+from custom_strategy import compute_indicators, required_lookback
+from data_fetcher import generate_synthetic_data, fetch_interval_data
+from resample import RESAMPLE_MINUTES, resample_ohlcv
+from universe import FETCH_WORKERS
+import metrics
+
+SIDES = {"buy": 1, "sell": -1}
+FIELDS = CANDLE_COLUMNS[1:]
+SESSION_BARS = 375  # 1-minute bars per NSE session
+
+_scan_seconds = metrics.histogram("screener_scan_seconds", "Time to screen a universe")
+
+
+class Panel:
+    """
+    Candle fields of many symbols as (bars x symbols) DataFrames, newest bar last.
+
+    Indexes like a candle DataFrame (panel["close"], panel["SMA_20"] = ...,
+    panel.loc[mask, "signal"] = 1), so the custom strategy indicator registry,
+    compiled conditions and the strategy.py functions run on every symbol in
+    one column-wise pass per operation. Symbols with a shorter history are
+    NaN-padded at the top.
+    """
+
+    def __init__(self, fields, symbols, as_of):
+        self._fields = dict(fields)
+        self.symbols = list(symbols)
+        self.as_of = list(as_of)
+        self.attrs = {}
+        self.loc = _PanelLoc(self)
+
+    @classmethod
+    def from_records(cls, records_by_symbol, bars):
+        """Build from {symbol: CANDLE_DTYPE records}, keeping the last `bars` of each."""
+        symbols = list(records_by_symbol)
+        arrays = {field: np.full((bars, len(symbols)), np.nan) for field in FIELDS}
+        as_of = []
+        for j, symbol in enumerate(symbols):
+            records = records_by_symbol[symbol][-bars:]
+            for field in FIELDS:
+                arrays[field][bars - len(records):, j] = records[field]
+            as_of.append(pd.Timestamp(int(records["timestamp"][-1])))
+        return cls({field: pd.DataFrame(values, columns=symbols) for field, values in arrays.items()},
+                   symbols, as_of)
+
+    @property
+    def columns(self):
+        return list(self._fields)
+
+    @property
+    def mask_shape(self):
+        return len(self), len(self.symbols)
+
+    def __len__(self):
+        return len(next(iter(self._fields.values())))
+
+    def __contains__(self, name):
+        return name in self._fields
+
+    def __getitem__(self, name):
+        return self._fields[name]
+
+    def __setitem__(self, name, value):
+        if np.isscalar(value):
+            value = pd.DataFrame(value, index=self["close"].index, columns=self.symbols)
+        self._fields[name] = value
+
+    def latest(self, name):
+        """Newest value of a field for every symbol."""
+        return self._fields[name].to_numpy(dtype=np.float64, na_value=np.nan)[-1]
+
+
+class _PanelLoc:
+    """panel.loc[mask, name] = value, as the strategy.py signal functions write it."""
+
+    def __init__(self, panel):
+        self._panel = panel
+
+    def __setitem__(self, key, value):
+        mask, name = key
+        self._panel[name] = self._panel[name].mask(mask, value)
+
+
+def _bars_per_candle(interval):
+    """Base-interval candles in one candle of a derived interval."""
+    base = RESAMPLE_MINUTES[RESAMPLE_BASE_INTERVAL] or SESSION_BARS
+    return (RESAMPLE_MINUTES[interval] or SESSION_BARS) // base
+
+
+def _stored_tail(store, symbol, exchange, interval, bars):
+    """Last `bars` candles of interval from the store, derived from the base series if only that is stored."""
+    records = store.tail(symbol, exchange, interval, bars)
+    if records is not None or interval not in RESAMPLE_DERIVED_INTERVALS or interval == RESAMPLE_BASE_INTERVAL:
+        return records
+    base = store.tail(symbol, exchange, RESAMPLE_BASE_INTERVAL, (bars + 1) * _bars_per_candle(interval))
+    if base is None:
+        return None
+    records = frame_to_records(resample_ohlcv(records_to_frame(base), interval))[-bars:]
+    return records if len(records) else None
+
+
+def _history_days(bars, interval):
+    """Calendar days of history that hold `bars` candles of interval."""
+    sessions = bars if interval == "1d" else bars * (RESAMPLE_MINUTES[interval] or SESSION_BARS) / SESSION_BARS
+    return int(math.ceil(sessions * 7 / 5)) + 7
+
+
+def load_candles(symbols, bars, interval=DEFAULT_INTERVAL, exchange="NSE", store=None, use_mock=USE_MOCK_DATA,
+                 fetch_missing=False):
+    """
+    Trailing candle records per symbol from the candle store, without API calls.
+
+    Args:
+        fetch_missing: Fetch symbols with nothing stored (in a thread pool) and retry them
+
+    Returns:
+        tuple: ({symbol: CANDLE_DTYPE records}, [symbols with no candles])
+    """
+    if use_mock:
+        return {
+            symbol: frame_to_records(generate_synthetic_data(bars=bars, seed=42 + i, freq="D"))
+            for i, symbol in enumerate(symbols)
+        }, []
+    store = store or get_candle_store()
+
+    def tail(symbol):
+        return _stored_tail(store, symbol.split(".")[0], exchange, interval, bars)
+
+    records = {symbol: tail(symbol) for symbol in symbols}
+    missing = [symbol for symbol, r in records.items() if r is None]
+    if missing and fetch_missing:
+        days = _history_days(bars, interval)
+
+        def fetch(symbol):
+            try:
+                fetch_interval_data(symbol, interval, exchange, days=days, store=store)
+            except Exception as e:
+                print(f"❌ Could not fetch {symbol}: {str(e)}")
+            return symbol, tail(symbol)
+
+        with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(missing))) as pool:
+            records.update(pool.map(fetch, missing))
+        missing = [symbol for symbol, r in records.items() if r is None]
+    return {symbol: r for symbol, r in records.items() if r is not None}, missing
+
+
+def _value(x):
+    x = float(x)
+    return round(x, 4) if math.isfinite(x) else None
+
+
+def screen(symbols=None, strategy_id=None, custom_strategy=None, side="buy", rank_by=None, ascending=False,
+           new_only=False, limit=SCREENER_LIMIT, interval=DEFAULT_INTERVAL, exchange="NSE", store=None,
+           use_mock=USE_MOCK_DATA, fetch_missing=False):
+    """
+    Symbols whose latest bar fires a strategy's buy (or sell) signal, ranked by an indicator.
+
+    Custom conditions load only the trailing bars their indicators need
+    (see custom_strategy.required_lookback); predefined strategies load
+    SCREENER_BARS. All symbols are evaluated together as one Panel.
+
+    Args:
+        symbols: List of symbols (default: every config.AVAILABLE_STOCKS entry)
+        strategy_id, custom_strategy: As for app.run_backtest
+        side: 'buy' or 'sell'
+        rank_by: Indicator or candle field to sort matches by (any custom strategy indicator)
+        ascending: Sort smallest first (e.g. rank_by='RSI' for the most oversold)
+        new_only: Only symbols whose signal turned on at the latest bar
+        limit: Maximum matches returned
+        fetch_missing: Fetch symbols that have no stored candles
+
+    Returns:
+        dict with matches (symbol, as_of, close, rank value and the strategy's
+        indicator values), matched, scanned, missing, bars and seconds
+
+    Raises:
+        ValueError: On an unknown side, rank_by or a condition with a timeframe
+    """
+    started = time.perf_counter()
+    if side not in SIDES:
+        raise ValueError(f"side must be one of {', '.join(SIDES)}")
+    symbols = symbols or [s["symbol"] for s in AVAILABLE_STOCKS]
+    extra = [rank_by] if rank_by else []
+
+    if custom_strategy:
+        buy_plan = compile_conditions(custom_strategy.get("buy_conditions", []), custom_strategy.get("buy_logic", "AND"))
+        sell_plan = compile_conditions(custom_strategy.get("sell_conditions", []), custom_strategy.get("sell_logic", "AND"))
+        columns = list(dict.fromkeys(buy_plan.columns + sell_plan.columns))
+        if any(split_timeframe(name)[1] for name in columns):
+            raise ValueError("Screener conditions run on one interval; remove the condition timeframes")
+        # One extra bar for crossovers, percentage changes and new_only
+        bars = required_lookback(columns + extra) + 1
+        strategy_name = "Custom Strategy"
+    else:
+        strategy_name = strategy_id if strategy_id in STRATEGIES else DEFAULT_STRATEGY
+        bars = max(SCREENER_BARS, required_lookback(extra) + 1)
+
+    records, missing = load_candles(symbols, bars, interval, exchange, store, use_mock, fetch_missing)
+    result = {
+        "strategy": strategy_name, "side": side, "rank_by": rank_by, "interval": interval, "bars": bars,
+        "scanned": len(records), "matched": 0, "matches": [], "missing": missing,
+    }
+    if not records:
+        result["seconds"] = round(time.perf_counter() - started, 4)
+        return result
+
+    panel = Panel.from_records(records, bars)
+    if custom_strategy:
+        compute_indicators(panel, columns, use_cache=False)
+        buy, sell = evaluate_strategy(panel, buy_plan, sell_plan)
+        # Sell overrides buy on the same bar, as in execute_custom_strategy
+        signal = np.where(sell, -1, np.where(buy, 1, 0))
+    else:
+        cfg = STRATEGIES[strategy_name]
+        indicators = getattr(strategy_module, cfg["indicators"])
+        # The indicator cache keys single-symbol frames, so call the undecorated function
+        panel = getattr(indicators, "__wrapped__", indicators)(panel)
+        panel = getattr(strategy_module, cfg["signals"])(panel)
+        signal = panel["signal"].to_numpy()
+        columns = [name for name in panel.columns if name not in FIELDS and name not in ("signal", "position")]
+    if rank_by and rank_by not in panel:
+        compute_indicators(panel, [rank_by], use_cache=False)
+        if rank_by not in panel:
+            raise ValueError(f"Unknown rank_by indicator: {rank_by}")
+
+    want = SIDES[side]
+    hit = signal[-1] == want
+    if new_only:
+        hit &= signal[-2] != want
+    matched = np.flatnonzero(hit)
+    if rank_by:
+        key = panel.latest(rank_by)[matched]
+        # NaN ranks last in either direction
+        order = np.lexsort((key if ascending else -key, np.isnan(key)))
+        matched = matched[order]
+
+    shown = [name for name in dict.fromkeys(([rank_by] if rank_by else []) + columns) if name in panel]
+    latest = {name: panel.latest(name) for name in ["close"] + shown}
+    result["matched"] = len(matched)
+    result["matches"] = [
+        {
+            "symbol": panel.symbols[j],
+            "as_of": panel.as_of[j].isoformat(),
+            **{name: _value(values[j]) for name, values in latest.items()},
+        }
+        for j in matched[:limit]
+    ]
+    seconds = time.perf_counter() - started
+    _scan_seconds.observe(seconds)
+    result["seconds"] = round(seconds, 4)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Screen a universe for symbols whose latest bar fires a signal")
+    parser.add_argument("--symbols", help="Comma-separated symbols (default: config.AVAILABLE_STOCKS)")
+    parser.add_argument("--strategy", default=DEFAULT_STRATEGY, choices=list(STRATEGIES))
+    parser.add_argument("--buy-conditions", help="Custom strategy buy conditions (JSON list); overrides --strategy")
+    parser.add_argument("--sell-conditions", default="[]", help="Custom strategy sell conditions (JSON list)")
+    parser.add_argument("--logic", default="AND", choices=["AND", "OR"], help="How conditions are combined")
+    parser.add_argument("--side", default="buy", choices=list(SIDES))
+    parser.add_argument("--rank-by", help="Indicator to rank matches by, e.g. RSI or Volume_Ratio")
+    parser.add_argument("--ascending", action="store_true", help="Rank smallest first")
+    parser.add_argument("--new-only", action="store_true", help="Only signals that turned on at the latest bar")
+    parser.add_argument("--limit", type=int, default=SCREENER_LIMIT)
+    parser.add_argument("--interval", default=DEFAULT_INTERVAL, choices=list(RESAMPLE_MINUTES))
+    parser.add_argument("--fetch-missing", action="store_true", help="Fetch symbols with no stored candles")
+    parser.add_argument("--mock", action="store_true", help="Screen mock candles")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args()
+
+    custom_strategy = None
+    if args.buy_conditions:
+        custom_strategy = {
+            "buy_conditions": json.loads(args.buy_conditions),
+            "sell_conditions": json.loads(args.sell_conditions),
+            "buy_logic": args.logic,
+            "sell_logic": args.logic,
+        }
+    symbols = [s.strip() for s in args.symbols.split(",")] if args.symbols else None
+    result = screen(
+        symbols, args.strategy, custom_strategy, args.side, args.rank_by, args.ascending, args.new_only,
+        args.limit, args.interval, use_mock=args.mock or USE_MOCK_DATA, fetch_missing=args.fetch_missing,
+    )
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"\n🔎 {result['strategy']} | {result['side']} on latest {result['interval']} bar | "
+          f"{result['matched']} of {result['scanned']} symbols in {result['seconds'] * 1000:.0f} ms")
+    if result["matches"]:
+        print(pd.DataFrame(result["matches"]).to_string(index=False))
+    if result["missing"]:
+        print(f"❌ No stored candles for {len(result['missing'])} symbol(s): {', '.join(result['missing'][:20])}"
+              f"{' ...' if len(result['missing']) > 20 else ''} (use --fetch-missing or downloader.py)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,7 @@
+from indicator_cache import cached_indicator
+
+
+@cached_indicator(outputs=("SMA_20", "SMA_50"))
 def calculate_indicators(df):
     df["SMA_20"] = df["close"].rolling(20).mean()
     df["SMA_50"] = df["close"].rolling(50).mean()
@@ -12,6 +16,7 @@ def generate_signals(df):
     return df
 
 
+@cached_indicator(outputs=("RSI",))
 def rsi_indicators(df, period=14):
     """Compute RSI (Relative Strength Index)."""
     delta = df["close"].diff()
@@ -40,6 +45,7 @@ def rsi_signals(df, buy_thresh=20):
 # Trade with the trend: above VWAP = buyers in control, below = sellers.
 
 
+@cached_indicator(outputs=("VWAP", "EMA_9", "EMA_20"))
 def vwap_indicators(df, window=20, ema_fast=9, ema_slow=20):
     """Compute rolling VWAP and EMAs for VWAP strategies."""
     tp = (df["high"] + df["low"] + df["close"]) / 3
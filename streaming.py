@@ -0,0 +1,361 @@
+"""
+Streaming Indicators
+O(1)-per-bar incremental versions of the batch indicators in strategy.py and custom_strategy.py
+"""
+import math
+from collections import deque
+
+NAN = float("nan")
+
+
+def _isnan(x):
+    return x != x
+
+
+class RollingMean:
+    """
+    Rolling mean over the last `window` values with compensated running sums.
+
+    Matches pandas rolling(window).mean(): NaN until the window is full, and
+    NaN while any value inside the window is NaN.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.nan_count = 0
+        self._sum = 0.0
+        self._comp = 0.0
+
+    def _add(self, x):
+        # Neumaier summation keeps long streams from drifting
+        t = self._sum + x
+        if abs(self._sum) >= abs(x):
+            self._comp += (self._sum - t) + x
+        else:
+            self._comp += (x - t) + self._sum
+        self._sum = t
+
+    def update(self, x):
+        self.values.append(x)
+        if _isnan(x):
+            self.nan_count += 1
+        else:
+            self._add(x)
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            if _isnan(old):
+                self.nan_count -= 1
+            else:
+                self._add(-old)
+        return self.value
+
+    @property
+    def total(self):
+        return self._sum + self._comp
+
+    @property
+    def value(self):
+        if len(self.values) < self.window or self.nan_count:
+            return NAN
+        return self.total / self.window
+
+
+class RollingSum(RollingMean):
+    """Rolling sum; same NaN rules as RollingMean."""
+
+    @property
+    def value(self):
+        if len(self.values) < self.window or self.nan_count:
+            return NAN
+        return self.total
+
+
+class RollingStd:
+    """Rolling sample standard deviation (ddof=1) via windowed Welford updates."""
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, x):
+        self.values.append(x)
+        n = len(self.values)
+        if n > self.window:
+            old = self.values.popleft()
+            # Replace old with x in a window of constant size
+            new_mean = self.mean + (x - old) / self.window
+            self.m2 += (x - old) * (x - new_mean + old - self.mean)
+            self.mean = new_mean
+        else:
+            delta = x - self.mean
+            self.mean += delta / n
+            self.m2 += delta * (x - self.mean)
+        return self.value
+
+    @property
+    def value(self):
+        if len(self.values) < self.window:
+            return NAN
+        return math.sqrt(max(self.m2, 0.0) / (self.window - 1))
+
+
+class RollingExtreme:
+    """Rolling min or max via a monotonic deque of (index, value)."""
+
+    def __init__(self, window, mode="min"):
+        self.window = window
+        self.is_min = mode == "min"
+        self.queue = deque()
+        self.count = 0
+
+    def update(self, x):
+        i = self.count
+        self.count += 1
+        if self.is_min:
+            while self.queue and self.queue[-1][1] >= x:
+                self.queue.pop()
+        else:
+            while self.queue and self.queue[-1][1] <= x:
+                self.queue.pop()
+        self.queue.append((i, x))
+        while self.queue[0][0] <= i - self.window:
+            self.queue.popleft()
+        return self.value
+
+    @property
+    def value(self):
+        if self.count < self.window:
+            return NAN
+        return self.queue[0][1]
+
+
+class EMA:
+    """Exponential moving average, pandas ewm(span, adjust=False)."""
+
+    def __init__(self, span):
+        self.alpha = 2.0 / (span + 1.0)
+        self.value = NAN
+
+    def update(self, x):
+        if _isnan(self.value):
+            self.value = x
+        else:
+            self.value = (1.0 - self.alpha) * self.value + self.alpha * x
+        return self.value
+
+
+class RSI:
+    """RSI as in strategy.rsi_indicators: simple rolling means of gains and losses."""
+
+    def __init__(self, period=14):
+        self.gain = RollingMean(period)
+        self.loss = RollingMean(period)
+        self.prev = NAN
+        self.value = NAN
+
+    def update(self, close):
+        delta = close - self.prev
+        self.prev = close
+        # delta is NaN on the first bar; where(delta > 0, 0.0) turns that into 0.0
+        avg_gain = self.gain.update(delta if delta > 0 else 0.0)
+        avg_loss = self.loss.update(-delta if delta < 0 else 0.0)
+        if _isnan(avg_gain) or _isnan(avg_loss):
+            self.value = NAN
+        else:
+            rs = avg_gain / (avg_loss if avg_loss != 0 else 1e-10)
+            self.value = 100 - (100 / (1 + rs))
+        return self.value
+
+
+class VWAP:
+    """Rolling VWAP over window bars with typical price (H+L+C)/3."""
+
+    def __init__(self, window=20):
+        self.pv = RollingSum(window)
+        self.volume = RollingSum(window)
+        self.value = NAN
+
+    def update(self, high, low, close, volume):
+        pv = self.pv.update((high + low + close) / 3 * volume)
+        vol = self.volume.update(volume)
+        self.value = pv / vol if vol else NAN
+        return self.value
+
+
+class MACD:
+    """MACD line (EMA12 - EMA26), its 9-period signal EMA and the histogram."""
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal_ema = EMA(signal)
+        self.macd = self.signal = self.histogram = NAN
+
+    def update(self, close):
+        self.macd = self.fast.update(close) - self.slow.update(close)
+        self.signal = self.signal_ema.update(self.macd)
+        self.histogram = self.macd - self.signal
+        return self.macd
+
+
+class Bollinger:
+    """Bollinger bands: rolling mean +/- num_std sample standard deviations."""
+
+    def __init__(self, period=20, num_std=2):
+        self.mean = RollingMean(period)
+        self.std = RollingStd(period)
+        self.num_std = num_std
+        self.middle = self.upper = self.lower = self.width = self.position = NAN
+
+    def update(self, close):
+        self.middle = self.mean.update(close)
+        std = self.std.update(close)
+        self.upper = self.middle + std * self.num_std
+        self.lower = self.middle - std * self.num_std
+        band = self.upper - self.lower
+        self.width = band / self.middle if self.middle else NAN
+        self.position = (close - self.lower) / band if band else NAN
+        return self.middle
+
+
+class Stochastic:
+    """Stochastic %K over k_period bars (monotonic deques) and %D as its d_period mean."""
+
+    def __init__(self, k_period=14, d_period=3):
+        self.low_min = RollingExtreme(k_period, "min")
+        self.high_max = RollingExtreme(k_period, "max")
+        self.d = RollingMean(d_period)
+        self.k_value = self.d_value = NAN
+
+    def update(self, high, low, close):
+        lowest = self.low_min.update(low)
+        highest = self.high_max.update(high)
+        span = highest - lowest
+        self.k_value = 100 * ((close - lowest) / span) if span else NAN
+        self.d_value = self.d.update(self.k_value)
+        return self.k_value
+
+
+class ATR:
+    """Average true range: rolling mean of true range over period bars."""
+
+    def __init__(self, period=14):
+        self.mean = RollingMean(period)
+        self.prev_close = NAN
+        self.value = NAN
+
+    def update(self, high, low, close):
+        true_range = high - low
+        if not _isnan(self.prev_close):
+            true_range = max(true_range, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        self.value = self.mean.update(true_range)
+        return self.value
+
+
+class PriceChange:
+    """Percent change of close over `periods` bars."""
+
+    def __init__(self, periods=1):
+        self.history = deque(maxlen=periods + 1)
+        self.value = NAN
+
+    def update(self, close):
+        self.history.append(close)
+        if len(self.history) == self.history.maxlen and self.history[0]:
+            self.value = (close / self.history[0] - 1) * 100
+        else:
+            self.value = NAN
+        return self.value
+
+
+class StreamingIndicators:
+    """
+    Incremental counterpart of compute_all_indicators (plus the strategy.py columns).
+
+    Feed candles one at a time with update(); each call costs O(1) and
+    returns a dict of the latest values keyed by the same column names the
+    batch functions produce (NaN during warm-up).
+    """
+
+    def __init__(self):
+        self.sma = {w: RollingMean(w) for w in (20, 50, 100, 200)}
+        self.ema = {s: EMA(s) for s in (9, 20, 50, 100, 200)}
+        self.rsi = RSI(14)
+        self.vwap = VWAP(20)
+        self.macd = MACD()
+        self.bollinger = Bollinger(20, 2)
+        self.stochastic = Stochastic(14, 3)
+        self.atr = ATR(14)
+        self.volume_sma = RollingMean(20)
+        self.price_change = {p: PriceChange(p) for p in (1, 5, 10)}
+        self.bars = 0
+        self.values = {}
+
+    def update(self, candle):
+        """
+        Args:
+            candle: Mapping with open, high, low, close, volume (timestamp optional)
+
+        Returns:
+            dict of indicator name -> latest value
+        """
+        o = float(candle["open"])
+        h = float(candle["high"])
+        low = float(candle["low"])
+        c = float(candle["close"])
+        v = float(candle["volume"])
+        self.bars += 1
+
+        values = {}
+        for window, sma in self.sma.items():
+            values[f"SMA_{window}"] = sma.update(c)
+        values["RSI"] = self.rsi.update(c)
+        values["VWAP"] = self.vwap.update(h, low, c, v)
+        for span, ema in self.ema.items():
+            values[f"EMA_{span}"] = ema.update(c)
+
+        self.macd.update(c)
+        values["MACD"] = self.macd.macd
+        values["MACD_Signal"] = self.macd.signal
+        values["MACD_Histogram"] = self.macd.histogram
+
+        bb = self.bollinger
+        bb.update(c)
+        values["BB_Middle"] = bb.middle
+        values["BB_Upper"] = bb.upper
+        values["BB_Lower"] = bb.lower
+        values["BB_Width"] = bb.width
+        values["BB_Position"] = bb.position
+
+        self.stochastic.update(h, low, c)
+        values["Stoch_K"] = self.stochastic.k_value
+        values["Stoch_D"] = self.stochastic.d_value
+        values["ATR"] = self.atr.update(h, low, c)
+
+        volume_sma = self.volume_sma.update(v)
+        values["Volume_SMA"] = volume_sma
+        values["Volume_Ratio"] = v / (volume_sma if volume_sma != 0 else 1e-10)
+
+        values["Price_Change"] = self.price_change[1].update(c)
+        values["Price_Change_5"] = self.price_change[5].update(c)
+        values["Price_Change_10"] = self.price_change[10].update(c)
+
+        values["price"] = c
+        values["open_price"] = o
+        values["high_price"] = h
+        values["low_price"] = low
+        if "timestamp" in candle:
+            values["timestamp"] = candle["timestamp"]
+        values.update(open=o, high=h, low=low, close=c, volume=v)
+        self.values = values
+        return values
+
+    def warm_up(self, df):
+        """Feed historical candles (e.g. from fetch_historical_data) before going live."""
+        for candle in df[["timestamp", "open", "high", "low", "close", "volume"]].to_dict("records"):
+            self.update(candle)
+        return self.values
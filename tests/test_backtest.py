@@ -0,0 +1,60 @@
+"""
+Array engine vs the reference loop for every configured strategy.
+"""
+import pytest
+
+import backtest
+import strategy
+from backtest import backtest_strategy
+from config import STRATEGIES
+from data_fetcher import generate_mock_data
+from pipeline import apply_strategy
+
+ENGINES = [
+    pytest.param("numba", marks=pytest.mark.skipif(backtest._simulate_jit is None, reason="numba not installed")),
+    "numpy",
+]
+
+
+@pytest.fixture(params=ENGINES)
+def array_engine(request, monkeypatch):
+    """Run the array engine through the numba kernel or force the pure-NumPy path."""
+    if request.param == "numpy":
+        monkeypatch.setattr(backtest, "_simulate_jit", None)
+    return request.param
+
+
+@pytest.mark.parametrize("strategy_id", list(STRATEGIES))
+@pytest.mark.parametrize("seed", [1, 7])
+@pytest.mark.parametrize("leverage,stop_loss_pct", [(1, 0.10), (5, 0.10), (2, 0.98)])
+def test_array_engine_matches_loop(array_engine, strategy_id, seed, leverage, stop_loss_pct):
+    df, exit_rules, _ = apply_strategy(generate_mock_data(days=400, seed=seed), strategy_id)
+    kwargs = dict(exit_rules=exit_rules, leverage=leverage, stop_loss_pct=stop_loss_pct)
+
+    final_loop, pnl_loop, trades_loop = backtest_strategy(df, 100_000, engine="loop", **kwargs)
+    final_array, pnl_array, trades_array = backtest_strategy(df, 100_000, engine="array", **kwargs)
+
+    assert final_array == pytest.approx(final_loop, abs=1e-6)
+    assert pnl_array == pytest.approx(pnl_loop, abs=1e-6)
+    assert [(a, t, q) for a, t, _, q in trades_array] == [(a, t, q) for a, t, _, q in trades_loop]
+    assert [p for *_, p, _ in trades_array] == pytest.approx([p for *_, p, _ in trades_loop])
+
+
+def test_unknown_engine_raises():
+    df, _, _ = apply_strategy(generate_mock_data(days=50), "SMA Crossover")
+    with pytest.raises(ValueError):
+        backtest_strategy(df, 100_000, engine="vectorized")
+
+
+@pytest.mark.parametrize("leverage", [1, 10])
+def test_exit_rules_match_loop(array_engine, leverage):
+    # RSI Oversold's default threshold rarely fires on mock data; a looser one exercises take-profit exits
+    df = strategy.rsi_signals(strategy.rsi_indicators(generate_mock_data(days=400, seed=3)), buy_thresh=45)
+    kwargs = dict(exit_rules=STRATEGIES["RSI Oversold"]["exit_rules"], leverage=leverage)
+
+    loop = backtest_strategy(df, 100_000, engine="loop", **kwargs)
+    array = backtest_strategy(df, 100_000, engine="array", **kwargs)
+
+    assert len(loop[2]) > 0
+    assert array[0] == pytest.approx(loop[0], abs=1e-6)
+    assert [(a, t, q) for a, t, _, q in array[2]] == [(a, t, q) for a, t, _, q in loop[2]]
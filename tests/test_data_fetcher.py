@@ -0,0 +1,103 @@
+"""
+Store-backed fetches against a stubbed Groww client: incremental refreshes and token invalidation.
+"""
+import os
+import time
+
+import pytest
+from growwapi.groww.exceptions import GrowwAPIAuthenticationException
+
+import data_fetcher
+from candle_store import CandleStore
+from downloader import FakeGrowwClient
+
+
+class RecordingClient(FakeGrowwClient):
+    """Also records the exchange each request was sent to."""
+
+    def __init__(self):
+        super().__init__()
+        self.exchanges = []
+
+    def get_historical_candle_data(self, trading_symbol, exchange, *args, **kwargs):
+        self.exchanges.append(exchange)
+        return super().get_historical_candle_data(trading_symbol, exchange, *args, **kwargs)
+
+
+class RejectingClient(FakeGrowwClient):
+    """Rejects every request as the API does once the access token is revoked."""
+
+    def get_historical_candle_data(self, *args, **kwargs):
+        raise GrowwAPIAuthenticationException()
+
+
+class FakeProvider:
+    def __init__(self):
+        self.invalidated = 0
+
+    def invalidate(self):
+        self.invalidated += 1
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    provider = FakeProvider()
+    monkeypatch.setattr(data_fetcher, "get_provider", lambda: provider)
+    return provider
+
+
+def use_client(monkeypatch, client):
+    monkeypatch.setattr(data_fetcher, "get_groww_client", lambda: client)
+    return client
+
+
+def make_stale(store, symbol, exchange="NSE", interval="1d"):
+    """Backdate the stored series so the next fetch refreshes it."""
+    stale = time.time() - 2 * data_fetcher.CANDLE_STORE_MAX_AGE_SECONDS
+    os.utime(store.path(symbol, exchange, interval), (stale, stale))
+
+
+def test_rejected_token_is_invalidated_before_serving_stored_candles(tmp_path, monkeypatch, provider):
+    store = CandleStore(str(tmp_path))
+    use_client(monkeypatch, FakeGrowwClient())
+    data_fetcher.fetch_historical_data("RELIANCE", days=60, store=store)
+    make_stale(store, "RELIANCE")
+
+    use_client(monkeypatch, RejectingClient())
+    df = data_fetcher.fetch_historical_data("RELIANCE", days=60, store=store)
+
+    assert len(df) > 0 and not df.attrs.get("mock")
+    assert provider.invalidated == 1
+
+
+def test_refresh_requests_only_the_missing_tail(tmp_path, monkeypatch, provider):
+    store = CandleStore(str(tmp_path))
+    client = use_client(monkeypatch, FakeGrowwClient())
+    first = data_fetcher.fetch_historical_data("RELIANCE", interval="5m", days=40, store=store)
+    full_window = len(client.calls)
+    assert full_window > 1  # 40 days of 5-minute candles take several requests
+
+    make_stale(store, "RELIANCE", interval="5m")
+    last = store.last_timestamp("RELIANCE", interval="5m")
+    second = data_fetcher.fetch_historical_data("RELIANCE", interval="5m", days=40, store=store)
+
+    tail = client.calls[full_window:]
+    assert len(tail) == 1
+    _, start, _, interval = tail[0]
+    assert start == last and interval == "5m"
+    assert second["timestamp"].iloc[-1] >= first["timestamp"].iloc[-1]
+
+
+def test_store_refresh_requests_the_stored_exchange(tmp_path, monkeypatch, provider):
+    store = CandleStore(str(tmp_path))
+    client = use_client(monkeypatch, RecordingClient())
+    data_fetcher.fetch_historical_data("RELIANCE", exchange="BSE", days=60, store=store)
+
+    assert client.exchanges and set(client.exchanges) == {"BSE"}
+    assert store.load("RELIANCE", "BSE", "1d") is not None
+    assert store.load("RELIANCE", "NSE", "1d") is None
+
+
+def test_unknown_exchange_is_rejected():
+    with pytest.raises(ValueError, match="XYZ"):
+        data_fetcher.request_candles(FakeGrowwClient(), "RELIANCE", "0", "1", 1440, exchange="XYZ")
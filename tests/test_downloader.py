@@ -0,0 +1,168 @@
+"""
+Bulk downloader against the offline FakeGrowwClient: chunking, retries, failure reports and gaps.
+"""
+import pandas as pd
+import pytest
+
+from candle_store import CandleStore
+from config import GROWW_MAX_DAYS_PER_REQUEST
+from data_fetcher import chunk_ranges
+from downloader import BulkDownloader, FakeGrowwClient, TokenBucket, expected_sessions, find_gaps
+from resample import SESSION_START_UTC
+
+START = pd.Timestamp("2024-01-01")  # A Monday
+END = pd.Timestamp("2024-12-31 12:00")
+
+
+class FlakyClient(FakeGrowwClient):
+    """Fails the first `failures` requests, then serves normally."""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def get_historical_candle_data(self, *args, **kwargs):
+        with self._lock:
+            self.failures -= 1
+            fail = self.failures >= 0
+        if fail:
+            raise ConnectionError("Simulated Groww API failure")
+        return super().get_historical_candle_data(*args, **kwargs)
+
+
+def make_downloader(tmp_path, client, sleeps=None, **kwargs):
+    sleep = sleeps.append if sleeps is not None else (lambda seconds: None)
+    kwargs.setdefault("rate", 10_000)
+    kwargs.setdefault("burst", 10_000)
+    return BulkDownloader(client=client, store=CandleStore(str(tmp_path)), sleep=sleep, **kwargs)
+
+
+@pytest.mark.parametrize("interval", ["1d", "1h", "5m"])
+def test_chunk_ranges_cover_range_within_api_limit(interval):
+    chunks = chunk_ranges(START, END, interval)
+    limit = pd.Timedelta(days=GROWW_MAX_DAYS_PER_REQUEST[interval])
+    assert chunks[0][0] == START and chunks[-1][1] == END
+    assert all(lo < hi <= lo + limit for lo, hi in chunks)
+    assert all(prev[1] == nxt[0] for prev, nxt in zip(chunks, chunks[1:]))
+
+
+def test_download_fetches_every_chunk_and_stores_every_session(tmp_path):
+    client = FakeGrowwClient()
+    reports = make_downloader(tmp_path, client).download(["RELIANCE", "TCS"], START, END, "1d")
+
+    chunks = chunk_ranges(START, END, "1d")
+    assert len(client.calls) == 2 * len(chunks)
+    sessions = len(expected_sessions(START, END))
+    for report in reports.values():
+        assert report["chunks"] == len(chunks)
+        assert report["failed_chunks"] == []
+        assert report["gaps"] == []
+        assert report["bars"] == sessions
+
+
+def test_intraday_download_is_chunked_to_the_interval_limit(tmp_path):
+    client = FakeGrowwClient()
+    end = START + pd.Timedelta(days=40)
+    reports = make_downloader(tmp_path, client).download(["INFY"], START, end, "5m")
+
+    # The fake rejects any request longer than the limit, so a clean report means every chunk fit
+    assert len(client.calls) == len(chunk_ranges(START, end, "5m")) > 1
+    assert reports["INFY"]["failed_chunks"] == []
+    assert reports["INFY"]["gaps"] == []
+
+
+def test_retries_back_off_exponentially(tmp_path):
+    sleeps = []
+    downloader = make_downloader(tmp_path, FlakyClient(failures=3), sleeps, max_retries=4, backoff=0.5)
+    df = downloader.fetch_chunk("RELIANCE", START, START + pd.Timedelta(days=30), "1d")
+
+    assert len(df) > 0
+    assert len(sleeps) == 3
+    for attempt, delay in enumerate(sleeps):
+        # backoff * 2**attempt with +-50% jitter
+        assert 0.5 * 2 ** attempt * 0.5 <= delay <= 0.5 * 2 ** attempt * 1.5
+
+
+def test_fetch_chunk_raises_after_last_retry(tmp_path):
+    sleeps = []
+    downloader = make_downloader(tmp_path, FlakyClient(failures=10), sleeps, max_retries=2)
+    with pytest.raises(ConnectionError):
+        downloader.fetch_chunk("RELIANCE", START, START + pd.Timedelta(days=30), "1d")
+    assert len(sleeps) == 2
+
+
+def test_failed_chunks_are_reported_and_left_as_gaps(tmp_path):
+    client = FakeGrowwClient(fail_rate=1.0)
+    reports = make_downloader(tmp_path, client, max_retries=1).download(["RELIANCE"], START, END, "1d")
+
+    report = reports["RELIANCE"]
+    chunks = chunk_ranges(START, END, "1d")
+    assert len(client.calls) == 2 * len(chunks)
+    assert [(c["start"], c["end"]) for c in report["failed_chunks"]] == chunks
+    assert all("Simulated" in c["error"] for c in report["failed_chunks"])
+    assert report["stored"] == 0
+    assert report["gaps"] == [{"start": START, "end": END}]
+
+
+def test_missing_range_is_reported_as_a_gap(tmp_path):
+    client = FakeGrowwClient(missing=[("2024-03-04", "2024-03-09")])
+    reports = make_downloader(tmp_path, client).download(["RELIANCE"], START, END, "1d")
+
+    assert reports["RELIANCE"]["gaps"] == [{
+        "start": pd.Timestamp("2024-03-01") + SESSION_START_UTC,
+        "end": pd.Timestamp("2024-03-11") + SESSION_START_UTC,
+    }]
+
+
+def _daily(days):
+    return pd.DatetimeIndex(pd.to_datetime(days)) + SESSION_START_UTC
+
+
+def test_find_gaps_reports_a_single_missing_session():
+    sessions = expected_sessions(START, END)
+    stamps = _daily(sessions.drop(pd.Timestamp("2024-05-15")))  # A Wednesday
+
+    assert find_gaps(stamps, START, END) == [{
+        "start": pd.Timestamp("2024-05-14") + SESSION_START_UTC,
+        "end": pd.Timestamp("2024-05-16") + SESSION_START_UTC,
+    }]
+
+
+def test_find_gaps_ignores_weekends_and_holidays():
+    sessions = expected_sessions(START, END)
+    stamps = _daily(sessions.drop(pd.Timestamp("2024-01-26")))
+
+    assert find_gaps(_daily(sessions), START, END) == []
+    assert find_gaps(stamps, START, END, holidays=["2024-01-26"]) == []
+
+
+def test_find_gaps_reports_missing_edges():
+    sessions = expected_sessions(START, END)
+    stamps = _daily(sessions[5:-5])
+
+    gaps = find_gaps(stamps, START, END)
+    assert gaps == [{"start": START, "end": stamps[0]}, {"start": stamps[-1], "end": END}]
+    assert find_gaps([], START, END) == [{"start": START, "end": END}]
+
+
+def test_find_gaps_reports_missing_intraday_bars():
+    day = pd.Timestamp("2024-01-02")
+    bars = pd.date_range(day + SESSION_START_UTC, periods=75, freq="5min")
+    stamps = bars.delete([10, 11])
+
+    assert find_gaps(stamps, day, day + pd.Timedelta(days=1), "5m") == [
+        {"start": bars[9], "end": bars[12]},
+    ]
+
+
+def test_token_bucket_limits_rate():
+    now = [0.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0], sleep=sleep)
+    waits = [bucket.acquire() for _ in range(6)]
+
+    assert waits[:2] == [0.0, 0.0]
+    assert sum(waits) == pytest.approx(2.0)
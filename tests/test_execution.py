@@ -0,0 +1,38 @@
+"""
+A neutral execution model against the original engine.
+"""
+import pytest
+
+import strategy
+from backtest import backtest_strategy
+from config import STRATEGIES
+from data_fetcher import generate_mock_data
+from execution import ExecutionModel
+from pipeline import apply_strategy
+
+NEUTRAL = ExecutionModel(fill="close", intrabar=False, slippage_bps=0, costs=None, allow_short=False)
+
+
+def assert_same_backtest(df, **kwargs):
+    final_original, pnl_original, trades_original = backtest_strategy(df, 100_000, **kwargs)
+    final_model, pnl_model, trades_model = backtest_strategy(df, 100_000, execution=NEUTRAL, **kwargs)
+
+    assert final_model == pytest.approx(final_original, abs=1e-6)
+    assert pnl_model == pytest.approx(pnl_original, abs=1e-6)
+    assert [t[:4] for t in trades_model] == [t[:4] for t in trades_original]
+    assert all(t[4] == 0 for t in trades_model)
+    return trades_original
+
+
+@pytest.mark.parametrize("strategy_id", list(STRATEGIES))
+@pytest.mark.parametrize("seed", [1, 5])
+@pytest.mark.parametrize("leverage,stop_loss_pct", [(1, 0.10), (5, 0.10), (2, 0.98)])
+def test_neutral_model_matches_original_engine(strategy_id, seed, leverage, stop_loss_pct):
+    df, exit_rules, _ = apply_strategy(generate_mock_data(days=400, seed=seed), strategy_id)
+    assert_same_backtest(df, exit_rules=exit_rules, leverage=leverage, stop_loss_pct=stop_loss_pct)
+
+
+def test_neutral_model_matches_original_exit_rules():
+    df = strategy.rsi_signals(strategy.rsi_indicators(generate_mock_data(days=400, seed=3)), buy_thresh=45)
+    trades = assert_same_backtest(df, exit_rules=STRATEGIES["RSI Oversold"]["exit_rules"], leverage=5)
+    assert len(trades) > 0
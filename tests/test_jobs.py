@@ -0,0 +1,110 @@
+"""
+Job queue: de-duplication, per-submission cancellation and result expiry.
+"""
+import threading
+import time
+
+import pytest
+
+from jobs import CANCELLED, DONE, JobManager, QueueFull
+
+
+class BlockingJob:
+    """Job function that waits at its first checkpoint until released."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.calls = 0
+
+    def __call__(self, checkpoint, **params):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        checkpoint("backtesting")
+        return {"params": params}
+
+
+@pytest.fixture
+def fn():
+    fn = BlockingJob()
+    yield fn
+    fn.release.set()
+
+
+def finish(job):
+    job.wait(5)
+    return job.status
+
+
+def test_identical_params_join_the_same_job(fn):
+    manager = JobManager(fn, max_workers=1)
+    job, created, first = manager.submit({"symbol": "TCS"})
+    joined, joined_created, second = manager.submit({"symbol": "TCS"})
+    other, other_created, _ = manager.submit({"symbol": "INFY"})
+
+    assert created and not joined_created and other_created
+    assert joined is job and other is not job
+    assert first != second
+    fn.release.set()
+    assert finish(job) == DONE and finish(other) == DONE
+    assert fn.calls == 2
+
+    # A finished job is reused until it expires
+    assert manager.submit({"symbol": "TCS"})[0] is job
+
+
+def test_shared_job_runs_until_every_submitter_cancels(fn):
+    manager = JobManager(fn, max_workers=1)
+    job, _, first = manager.submit({"symbol": "TCS"})
+    _, _, second = manager.submit({"symbol": "TCS"})
+    fn.started.wait(5)
+
+    manager.cancel(job.id, first)
+    manager.cancel(job.id, first)  # A retried DELETE must not count twice
+    manager.cancel(job.id, "not-a-token")
+    assert not job.cancelled
+
+    manager.cancel(job.id, second)
+    assert job.cancelled
+    fn.release.set()
+    assert finish(job) == CANCELLED
+
+
+def test_cancelled_job_is_not_joined(fn):
+    manager = JobManager(fn, max_workers=1)
+    job, _, token = manager.submit({"symbol": "TCS"})
+    fn.started.wait(5)
+    manager.cancel(job.id, token)
+
+    fresh, created, _ = manager.submit({"symbol": "TCS"})
+    assert created and fresh is not job
+
+
+def test_cancel_before_start_finishes_the_job(fn):
+    manager = JobManager(fn, max_workers=1)
+    manager.submit({"symbol": "TCS"})
+    fn.started.wait(5)
+    queued, _, token = manager.submit({"symbol": "INFY"})
+
+    manager.cancel(queued.id, token)
+    assert queued.status == CANCELLED
+
+
+def test_queue_full(fn):
+    manager = JobManager(fn, max_workers=1, max_pending=1)
+    manager.submit({"symbol": "TCS"})
+    with pytest.raises(QueueFull):
+        manager.submit({"symbol": "INFY"})
+
+
+def test_finished_jobs_expire_on_lookup_and_stats(fn):
+    manager = JobManager(fn, max_workers=1, result_ttl=0.05)
+    fn.release.set()
+    job, _, _ = manager.submit({"symbol": "TCS"})
+    assert finish(job) == DONE
+    assert manager.get(job.id) is job
+
+    time.sleep(0.1)
+    assert manager.stats()["jobs"] == {}
+    assert manager.get(job.id) is None
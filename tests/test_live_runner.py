@@ -0,0 +1,65 @@
+"""
+Paper-trading replay vs the backtest, and the buffered custom rule vs the DataFrame evaluation.
+"""
+import asyncio
+
+import pandas as pd
+import pytest
+
+from backtest import backtest_strategy
+from candle_store import CandleStore
+from conditions import evaluate_strategy
+from config import INITIAL_CAPITAL, STOP_LOSS_PCT, STRATEGIES
+from data_fetcher import generate_mock_data
+from live_runner import CustomSignalRule, LiveRunner, ReplayCandleSource
+from pipeline import apply_strategy
+from streaming import StreamingIndicators
+
+CUSTOM = {
+    "buy_conditions": [
+        {"indicator": "RSI", "operator": "crosses_above", "value": 30},
+        {"indicator": "price", "operator": "pct_change_above", "value": 0.5},
+    ],
+    "sell_conditions": [{"indicator": "SMA_20", "operator": "crosses_below", "compare_to": "SMA_50"}],
+    "buy_logic": "OR",
+    "sell_logic": "OR",
+}
+
+
+@pytest.mark.parametrize("strategy_id", list(STRATEGIES))
+def test_replay_reproduces_backtest_trades(strategy_id):
+    candles = generate_mock_data(days=400, seed=7)
+    runner = LiveRunner(ReplayCandleSource({"MOCK": candles}), strategy_id=strategy_id, margin="5x",
+                        on_order=lambda symbol, order: None)
+    asyncio.run(runner.run())
+
+    df, exit_rules, _ = apply_strategy(candles.copy(), strategy_id)
+    final_value, _, trades = backtest_strategy(
+        df, INITIAL_CAPITAL, exit_rules=exit_rules, leverage=5, stop_loss_pct=STOP_LOSS_PCT)
+    account = runner.sessions["MOCK"].account
+
+    assert [(a, q) for a, _, _, q in account.trades] == [(a, q) for a, _, _, q in trades]
+    assert account.equity == pytest.approx(final_value)
+
+
+def test_custom_rule_matches_dataframe_evaluation():
+    rule = CustomSignalRule(CUSTOM)
+    indicators = StreamingIndicators()
+    prev = None
+    for candle in generate_mock_data(days=200, seed=1).to_dict("records"):
+        cur = indicators.update(candle)
+        frame = pd.DataFrame([prev, cur] if prev is not None else [cur])
+        buy, sell = evaluate_strategy(frame, rule.buy_plan, rule.sell_plan)
+        assert rule(cur, prev) == (-1 if sell[-1] else 1 if buy[-1] else 0)
+        prev = cur
+
+
+def test_replay_from_store_refuses_missing_symbols(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.merge("TCS", generate_mock_data(days=30), "NSE", "1d")
+
+    assert list(ReplayCandleSource.from_store(["TCS"], store=store).frames) == ["TCS"]
+    with pytest.raises(ValueError, match="INFY"):
+        ReplayCandleSource.from_store(["TCS", "INFY"], store=store)
+    with pytest.raises(ValueError, match="5m"):
+        ReplayCandleSource.from_store(["TCS"], interval="5m", store=store)
@@ -0,0 +1,33 @@
+"""
+Streaming indicators fed bar by bar against the batch compute_all_indicators.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from custom_strategy import compute_all_indicators
+from data_fetcher import generate_mock_data, generate_synthetic_data
+from streaming import StreamingIndicators
+
+
+def stream(df):
+    indicators = StreamingIndicators()
+    return pd.DataFrame([indicators.update(candle) for candle in df.to_dict("records")])
+
+
+@pytest.mark.parametrize("candles", [
+    pytest.param(lambda: generate_mock_data(days=400, seed=3), id="mock"),
+    pytest.param(lambda: generate_synthetic_data(bars=5000, seed=11), id="long"),
+])
+def test_streaming_matches_batch_indicators(candles):
+    df = candles()
+    batch = compute_all_indicators(df.copy())
+    streamed = stream(df)
+
+    columns = [col for col in batch.columns if col != "timestamp"]
+    assert set(columns) <= set(streamed.columns)
+    for col in columns:
+        expected = batch[col].to_numpy(dtype=np.float64)
+        actual = streamed[col].to_numpy(dtype=np.float64)
+        np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected), err_msg=col)
+        np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=col)
@@ -0,0 +1,41 @@
+"""
+Universe backtest streaming: results arrive while other fetches are still running.
+"""
+import threading
+
+import universe
+from data_fetcher import generate_mock_data
+
+
+def test_results_are_yielded_before_every_fetch_finishes(monkeypatch):
+    first_result = threading.Event()
+    fetched_after_result = {}
+
+    def fetch(symbol, use_mock=True):
+        if symbol == "SLOW":
+            # Only completes once a result has been streamed (or gives up after 10s)
+            fetched_after_result[symbol] = first_result.wait(10)
+        return generate_mock_data(days=120)
+
+    monkeypatch.setattr(universe, "fetch_historical_data", fetch)
+    results = []
+    for result in universe.iter_universe_backtest(["FAST", "SLOW"], strategy_id="SMA Crossover", max_workers=2):
+        results.append(result)
+        first_result.set()
+
+    assert [r["symbol"] for r in results] == ["FAST", "SLOW"]
+    assert all("error" not in r for r in results)
+    assert fetched_after_result == {"SLOW": True}
+
+
+def test_fetch_errors_are_reported_per_symbol(monkeypatch):
+    def fetch(symbol, use_mock=True):
+        if symbol == "BAD":
+            raise ValueError("No data")
+        return generate_mock_data(days=120)
+
+    monkeypatch.setattr(universe, "fetch_historical_data", fetch)
+    results = list(universe.iter_universe_backtest(["GOOD", "BAD"], strategy_id="SMA Crossover", max_workers=1))
+
+    assert {"symbol": "BAD", "error": "No data"} in results
+    assert any(r["symbol"] == "GOOD" and "error" not in r for r in results)
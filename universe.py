@@ -0,0 +1,148 @@
+"""
+Universe Backtest
+Runs one strategy over many symbols: fetches in a thread pool, backtests in a process pool
+"""
+import argparse
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from config import (
+    INITIAL_CAPITAL,
+    USE_MOCK_DATA,
+    STRATEGIES,
+    DEFAULT_STRATEGY,
+    DEFAULT_MARGIN,
+    AVAILABLE_STOCKS,
+)
+from data_fetcher import fetch_historical_data
+from pipeline import resolve_leverage, run_strategy_backtest
+from analytics import compute_analytics
+
+FETCH_WORKERS = 8  # Fetching is network-bound, so more threads than cores is fine
+
+
+def backtest_symbol(symbol, df, strategy_id=None, custom_strategy=None, leverage=1):
+    """Backtest one symbol's candles; runs inside a worker process."""
+    start = time.perf_counter()
+    df, strategy_name, final_value, pnl, trades = run_strategy_backtest(
+        df, strategy_id=strategy_id, custom_strategy=custom_strategy, leverage=leverage
+    )
+    stats = compute_analytics(
+        df, trades, INITIAL_CAPITAL, df["equity"].to_numpy(), df["exposure"].to_numpy()
+    )
+    return {
+        "symbol": symbol,
+        "strategy": strategy_name,
+        "bars": len(df),
+        "final_value": round(final_value, 2),
+        "pnl": round(pnl, 2),
+        "pnl_percent": round((pnl / INITIAL_CAPITAL) * 100, 2),
+        "total_trades": len(trades),
+        "sharpe": stats["sharpe"],
+        "max_drawdown_pct": stats["max_drawdown_pct"],
+        "win_rate_pct": stats["win_rate_pct"],
+        "seconds": round(time.perf_counter() - start, 4),
+    }
+
+
+def iter_universe_backtest(symbols=None, strategy_id=None, custom_strategy=None, margin=None,
+                           max_workers=None, fetch_workers=FETCH_WORKERS, use_mock=USE_MOCK_DATA):
+    """
+    Backtest a strategy across symbols, yielding per-symbol results as they finish.
+
+    Candles are fetched concurrently in a thread pool; each symbol is handed
+    to the process pool as soon as its fetch completes, so CPU-bound
+    indicator/signal/backtest work overlaps with the remaining downloads.
+
+    Args:
+        symbols: List of symbols (default: every config.AVAILABLE_STOCKS entry)
+        max_workers: Worker processes (default: os.cpu_count())
+
+    Yields:
+        dict per symbol (see backtest_symbol), or {"symbol", "error"} on failure
+    """
+    symbols = symbols or [s["symbol"] for s in AVAILABLE_STOCKS]
+    leverage = resolve_leverage(margin)
+    max_workers = max_workers or os.cpu_count() or 1
+
+    with ThreadPoolExecutor(max_workers=min(fetch_workers, len(symbols))) as fetch_pool, \
+            ProcessPoolExecutor(max_workers=min(max_workers, len(symbols))) as compute_pool:
+        pending = {
+            fetch_pool.submit(fetch_historical_data, symbol, use_mock=use_mock): (symbol, "fetch")
+            for symbol in symbols
+        }
+        # One wait loop over fetches and backtests, so a finished backtest is
+        # yielded while other symbols are still downloading
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                symbol, kind = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    yield {"symbol": symbol, "error": str(e)}
+                    continue
+                if kind == "fetch":
+                    job = compute_pool.submit(
+                        backtest_symbol, symbol, result, strategy_id, custom_strategy, leverage
+                    )
+                    pending[job] = (symbol, "backtest")
+                else:
+                    yield result
+
+
+def summarize_results(results):
+    """Aggregate per-symbol results into a summary table ranked by pnl_percent."""
+    ok = [r for r in results if "error" not in r]
+    if not ok:
+        return pd.DataFrame(columns=["symbol", "final_value", "pnl", "pnl_percent", "total_trades"])
+    return (
+        pd.DataFrame(ok)
+        .sort_values("pnl_percent", ascending=False)
+        .reset_index(drop=True)
+    )
+
+
+def run_universe_backtest(symbols=None, strategy_id=None, custom_strategy=None, margin=None,
+                          max_workers=None):
+    """Backtest a strategy across symbols and return (summary DataFrame, errors)."""
+    results = list(iter_universe_backtest(
+        symbols, strategy_id=strategy_id, custom_strategy=custom_strategy,
+        margin=margin, max_workers=max_workers,
+    ))
+    errors = [r for r in results if "error" in r]
+    return summarize_results(results), errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest a strategy across a universe of symbols")
+    parser.add_argument("--symbols", help="Comma-separated symbols (default: config.AVAILABLE_STOCKS)")
+    parser.add_argument("--strategy", default=DEFAULT_STRATEGY, choices=list(STRATEGIES))
+    parser.add_argument("--margin", default=DEFAULT_MARGIN)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    symbols = [s.strip() for s in args.symbols.split(",")] if args.symbols else None
+    start = time.perf_counter()
+    results = []
+    for result in iter_universe_backtest(
+        symbols, strategy_id=args.strategy, margin=args.margin, max_workers=args.workers
+    ):
+        results.append(result)
+        if "error" in result:
+            print(f"❌ {result['symbol']}: {result['error']}")
+        else:
+            print(f"  {result['symbol']}: {result['pnl_percent']}% ({result['total_trades']} trades)")
+
+    summary = summarize_results(results)
+    print(f"\nStrategy: {args.strategy} | Margin: {args.margin} | "
+          f"{len(summary)} symbols in {time.perf_counter() - start:.2f}s")
+    if len(summary):
+        print(summary.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,36 @@
 """
 Utility functions for the application
 """
-from datetime import datetime
+from datetime import datetime, timedelta
 
+DATE_FORMAT = '%Y-%m-%d'
+INTRADAY_FORMAT = '%Y-%m-%d %H:%M'
+IST_OFFSET = timedelta(hours=5, minutes=30)  # Intraday labels are shown in exchange time
+FLOAT32_DECIMALS = 6  # Compact (float32) columns are rounded so the payload is not padded with float noise
 
-def format_trade_date(trade_date):
+
+def timestamp_format(df):
+    """Label format for df's candles: the date for daily data, date and IST time for intraday"""
+    return DATE_FORMAT if df.attrs.get('interval', '1d') == '1d' else INTRADAY_FORMAT
+
+
+def format_trade_date(trade_date, fmt=DATE_FORMAT):
     """Format trade date to string consistently"""
     if isinstance(trade_date, datetime) or hasattr(trade_date, 'strftime'):
-        return trade_date.strftime('%Y-%m-%d')
+        if fmt != DATE_FORMAT:
+            trade_date = trade_date + IST_OFFSET
+        return trade_date.strftime(fmt)
     return str(trade_date)
 
 
-def prepare_trade_markers(trades):
+def prepare_trade_markers(trades, fmt=DATE_FORMAT):
     """Prepare buy and sell markers for chart visualization"""
     buy_markers = []
     sell_markers = []
     
     for trade in trades:
         try:
-            trade_date_str = format_trade_date(trade[1])
+            trade_date_str = format_trade_date(trade[1], fmt)
             price = round(trade[2], 2)
             marker = {'x': trade_date_str, 'y': price}
             
@@ -36,52 +48,85 @@ def prepare_trade_markers(trades):
 def _get_indicator_list(df, column_name):
     """Helper to get indicator list or None if column doesn't exist"""
     if column_name in df.columns:
-        return df[column_name].fillna(0).tolist()
+        values = df[column_name].fillna(0)
+        if values.dtype == 'float32':
+            values = values.astype('float64').round(FLOAT32_DECIMALS)
+        return values.tolist()
     return None
 
 
-def prepare_chart_data(df, buy_markers, sell_markers):
-    """Prepare chart data with strategy-specific indicators"""
+def prepare_price_data(df):
+    """Timestamps and OHLC lists for the price chart"""
+    fmt = timestamp_format(df)
+    timestamps = df['timestamp'] if fmt == DATE_FORMAT else df['timestamp'] + IST_OFFSET
     return {
-        'timestamps': df['timestamp'].dt.strftime('%Y-%m-%d').tolist(),
+        'timestamps': timestamps.dt.strftime(fmt).tolist(),
         'open': df['open'].tolist(),
         'high': df['high'].tolist(),
         'low': df['low'].tolist(),
         'close': df['close'].tolist(),
-        'sma_20': _get_indicator_list(df, 'SMA_20') or [0] * len(df),
-        'sma_50': _get_indicator_list(df, 'SMA_50') or [0] * len(df),
-        'sma_100': _get_indicator_list(df, 'SMA_100'),
-        'sma_200': _get_indicator_list(df, 'SMA_200'),
-        'rsi': _get_indicator_list(df, 'RSI'),
-        'vwap': _get_indicator_list(df, 'VWAP'),
-        'ema_9': _get_indicator_list(df, 'EMA_9'),
-        'ema_20': _get_indicator_list(df, 'EMA_20'),
-        'ema_50': _get_indicator_list(df, 'EMA_50'),
-        'ema_100': _get_indicator_list(df, 'EMA_100'),
-        'ema_200': _get_indicator_list(df, 'EMA_200'),
-        'macd': _get_indicator_list(df, 'MACD'),
-        'macd_signal': _get_indicator_list(df, 'MACD_Signal'),
-        'macd_histogram': _get_indicator_list(df, 'MACD_Histogram'),
-        'bb_upper': _get_indicator_list(df, 'BB_Upper'),
-        'bb_middle': _get_indicator_list(df, 'BB_Middle'),
-        'bb_lower': _get_indicator_list(df, 'BB_Lower'),
-        'stoch_k': _get_indicator_list(df, 'Stoch_K'),
-        'stoch_d': _get_indicator_list(df, 'Stoch_D'),
-        'atr': _get_indicator_list(df, 'ATR'),
-        'signals': df['signal'].tolist(),
-        'buy_markers': buy_markers,
-        'sell_markers': sell_markers
     }
 
 
-def format_trades_for_display(trades):
+# Chart series key -> DataFrame column, in payload order
+CHART_INDICATORS = (
+    ('sma_20', 'SMA_20'),
+    ('sma_50', 'SMA_50'),
+    ('sma_100', 'SMA_100'),
+    ('sma_200', 'SMA_200'),
+    ('rsi', 'RSI'),
+    ('vwap', 'VWAP'),
+    ('ema_9', 'EMA_9'),
+    ('ema_20', 'EMA_20'),
+    ('ema_50', 'EMA_50'),
+    ('ema_100', 'EMA_100'),
+    ('ema_200', 'EMA_200'),
+    ('macd', 'MACD'),
+    ('macd_signal', 'MACD_Signal'),
+    ('macd_histogram', 'MACD_Histogram'),
+    ('bb_upper', 'BB_Upper'),
+    ('bb_middle', 'BB_Middle'),
+    ('bb_lower', 'BB_Lower'),
+    ('stoch_k', 'Stoch_K'),
+    ('stoch_d', 'Stoch_D'),
+    ('atr', 'ATR'),
+)
+# The line chart always draws these two, so they default to zeros rather than None
+ALWAYS_PRESENT_INDICATORS = ('sma_20', 'sma_50')
+
+
+def prepare_chart_data(df, buy_markers, sell_markers):
+    """Prepare chart data with strategy-specific indicators"""
+    data = prepare_price_data(df)
+    for key, column in CHART_INDICATORS:
+        values = _get_indicator_list(df, column)
+        if key in ALWAYS_PRESENT_INDICATORS:
+            values = values or [0] * len(df)
+        data[key] = values
+    data['signals'] = df['signal'].tolist()
+    data['buy_markers'] = buy_markers
+    data['sell_markers'] = sell_markers
+    return data
+
+
+def chunk_series(data, chunk_size):
+    """Split a dict of equal-length lists into dicts of at most chunk_size items, tagged with their offset"""
+    length = max((len(v) for v in data.values()), default=0)
+    for offset in range(0, length, chunk_size):
+        chunk = {key: values[offset:offset + chunk_size] for key, values in data.items()}
+        chunk['offset'] = offset
+        yield chunk
+
+
+def format_trades_for_display(trades, fmt=DATE_FORMAT):
     """Format trades list for frontend display"""
     return [
         {
             'action': trade[0],
-            'date': format_trade_date(trade[1]),
+            'date': format_trade_date(trade[1], fmt),
             'price': round(trade[2], 2),
-            'quantity': int(trade[3]) if len(trade) > 3 else 'N/A'
+            'quantity': int(trade[3]) if len(trade) > 3 else 'N/A',
+            **({'charges': round(trade[4], 2)} if len(trade) > 4 else {}),
         }
         for trade in trades
     ]
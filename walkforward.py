@@ -0,0 +1,180 @@
+"""
+Walk-Forward Evaluation
+Optimizes strategy parameters on rolling train windows and scores them on the following unseen test windows
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from config import (
+    INITIAL_CAPITAL,
+    STRATEGIES,
+    DEFAULT_STRATEGY,
+    DEFAULT_SYMBOL,
+    USE_MOCK_DATA,
+    STOP_LOSS_PCT,
+)
+from backtest import backtest_arrays, equity_from_fills
+from data_fetcher import fetch_historical_data
+from optimizer import DEFAULT_PARAM_SPACES, FeatureCache, evaluate_points, grid_points, strategy_positions
+
+DEFAULT_TRAIN_BARS = 250
+DEFAULT_TEST_BARS = 60
+
+
+def split_windows(n_bars, train_bars=DEFAULT_TRAIN_BARS, test_bars=DEFAULT_TEST_BARS, step=None,
+                  anchored=False):
+    """
+    Train/test windows over n_bars bars.
+
+    Test windows are consecutive and non-overlapping (step defaults to
+    test_bars); each train window ends where its test window starts.
+    Anchored windows always train from bar 0 (expanding), otherwise the
+    train window rolls forward with fixed length.
+
+    Returns:
+        list of (train slice, test slice)
+    """
+    step = step or test_bars
+    windows = []
+    test_start = train_bars
+    while test_start + test_bars <= n_bars:
+        train_start = 0 if anchored else test_start - train_bars
+        windows.append((slice(train_start, test_start), slice(test_start, test_start + test_bars)))
+        test_start += step
+    return windows
+
+
+# Per-process candles and indicator memo, set once by the pool initializer so
+# every window a worker handles shares the same FeatureCache
+_worker_features = None
+
+
+def _init_worker(df):
+    global _worker_features
+    _worker_features = FeatureCache(df)
+
+
+def _evaluate_window(strategy_id, points, train, test, capital, leverage, rank_by, features=None):
+    """Optimize on the train slice, then backtest the winner on the test slice."""
+    features = features or _worker_features
+    train_results = evaluate_points(
+        features.df, strategy_id, points, capital, leverage, features=features, bars=train
+    )
+    best = train_results.sort_values(rank_by, ascending=False, kind="stable").index[0]
+    params = {name: train_results.at[best, name].item() for name in points[0]}
+
+    close = features.close[test]
+    position = strategy_positions(features, strategy_id, [params])[0, test]
+    final_value, pnl, fills = backtest_arrays(
+        close, position, capital, STRATEGIES[strategy_id].get("exit_rules"), leverage, STOP_LOSS_PCT
+    )
+    equity, _ = equity_from_fills(close, fills, capital)
+    return {
+        "params": params,
+        "train_pnl": float(train_results.at[best, "pnl"]),
+        "train_trades": int(train_results.at[best, "total_trades"]),
+        "test_pnl": round(pnl, 2),
+        "test_trades": len(fills),
+        "test_equity": equity,
+    }
+
+
+def walk_forward(df, strategy_id=DEFAULT_STRATEGY, param_space=None, train_bars=DEFAULT_TRAIN_BARS,
+                 test_bars=DEFAULT_TEST_BARS, step=None, anchored=False, capital=INITIAL_CAPITAL,
+                 leverage=1, rank_by="pnl", max_workers=None):
+    """
+    Walk-forward optimization of one strategy over a candle frame.
+
+    Every window is optimized on its train bars with the optimizer's grid
+    and scored on the test bars that follow, starting flat. Indicators are
+    computed once over the whole history per worker process and sliced per
+    window, so overlapping windows never recompute them.
+
+    Args:
+        df: Candle DataFrame (use a longer fetch than the default 365 days)
+        param_space: Grid to search (default: optimizer.DEFAULT_PARAM_SPACES)
+        train_bars / test_bars / step / anchored: See split_windows
+        max_workers: Worker processes (1 runs in-process; default os.cpu_count())
+
+    Returns:
+        dict with:
+            windows: DataFrame of per-window dates, chosen params, train/test pnl and trades
+            equity: Series of stitched out-of-sample equity (each window's pnl added on)
+            oos_pnl, oos_pnl_percent, profitable_windows
+    """
+    if strategy_id not in DEFAULT_PARAM_SPACES:
+        raise ValueError(f"No optimizer support for strategy: {strategy_id}")
+    windows = split_windows(len(df), train_bars, test_bars, step, anchored)
+    if not windows:
+        raise ValueError(f"Need at least {train_bars + test_bars} bars, got {len(df)}")
+    points = grid_points(strategy_id, param_space)
+    args = [(strategy_id, points, train, test, capital, leverage, rank_by) for train, test in windows]
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(windows))
+    if max_workers == 1:
+        features = FeatureCache(df)
+        results = [_evaluate_window(*a, features=features) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(df,)) as pool:
+            results = list(pool.map(_evaluate_window, *zip(*args)))
+
+    timestamps = df["timestamp"]
+    rows, equity_parts = [], []
+    carried = 0.0
+    for (train, test), result in zip(windows, results):
+        rows.append({
+            "train_start": timestamps.iloc[train.start],
+            "train_end": timestamps.iloc[train.stop - 1],
+            "test_start": timestamps.iloc[test.start],
+            "test_end": timestamps.iloc[test.stop - 1],
+            **result["params"],
+            "train_pnl": result["train_pnl"],
+            "train_trades": result["train_trades"],
+            "test_pnl": result["test_pnl"],
+            "test_trades": result["test_trades"],
+        })
+        # Position sizes do not scale with capital, so window pnl adds up
+        equity_parts.append(pd.Series(
+            result["test_equity"] + carried, index=timestamps.iloc[test].to_numpy()
+        ))
+        carried += result["test_pnl"]
+
+    window_stats = pd.DataFrame(rows)
+    return {
+        "windows": window_stats,
+        "equity": pd.concat(equity_parts),
+        "oos_pnl": round(carried, 2),
+        "oos_pnl_percent": round(carried / capital * 100, 2),
+        "profitable_windows": int((window_stats["test_pnl"] > 0).sum()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward optimize a strategy")
+    parser.add_argument("--symbol", default=DEFAULT_SYMBOL)
+    parser.add_argument("--strategy", default=DEFAULT_STRATEGY, choices=list(DEFAULT_PARAM_SPACES))
+    parser.add_argument("--days", type=int, default=1825, help="History to fetch")
+    parser.add_argument("--train", type=int, default=DEFAULT_TRAIN_BARS, help="Bars per train window")
+    parser.add_argument("--test", type=int, default=DEFAULT_TEST_BARS, help="Bars per test window")
+    parser.add_argument("--anchored", action="store_true", help="Expanding train windows from the start")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    df = fetch_historical_data(args.symbol, use_mock=USE_MOCK_DATA, days=args.days)
+    result = walk_forward(
+        df, args.strategy, train_bars=args.train, test_bars=args.test,
+        anchored=args.anchored, max_workers=args.workers,
+    )
+    windows = result["windows"]
+    print(f"\n📊 Walk-forward: {args.strategy} on {args.symbol} | {len(windows)} windows")
+    with pd.option_context("display.width", 160, "display.max_columns", None):
+        print(windows.to_string(index=False))
+    print(f"\nOut-of-sample PnL: ₹{result['oos_pnl']:,.2f} ({result['oos_pnl_percent']}%)")
+    print(f"Profitable test windows: {result['profitable_windows']}/{len(windows)}")
+
+
+if __name__ == "__main__":
+    main()